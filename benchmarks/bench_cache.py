@@ -0,0 +1,57 @@
+# Regeneration time with the render cache after a one-line edit, compared
+# with a full render, on a synthetic 5,000-label job.
+#
+#   python benchmarks/bench_cache.py [labels]
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_cache import RenderCache, generate_label_pdf_cached
+from label_maker import LabelBlock, generate_label_pdf
+
+def synthetic_blocks(total_labels, copies=20):
+    blocks = []
+    for n in range(total_labels // copies):
+        blocks.append(LabelBlock((
+            f"MONT: Lincoln Co. #{n}",
+            "Scenery Mountain Trail",
+            "48.4160°N,115.7173°W",
+            "09 JULY 2024, 2101m",
+            "J.Vega,J.Vargas, net",
+        ), copies))
+    return blocks
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22} {elapsed:>8.2f}s")
+    return elapsed
+
+def main():
+    total_labels = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    max_width = 25
+    blocks = synthetic_blocks(total_labels)
+    edited = list(blocks)
+    middle = len(edited) // 2
+    edited[middle] = LabelBlock(("MONT: Lincoln Co. #edited",) + edited[middle].lines[1:], edited[middle].count)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "labels.pdf")
+        cache = RenderCache(os.path.join(tmp, "cache"))
+        full = timed("full render", generate_label_pdf, output_path, max_width, blocks)
+        timed("cold cache", generate_label_pdf_cached, output_path, max_width, blocks, cache)
+        timed("warm, no edit", generate_label_pdf_cached, output_path, max_width, blocks, cache)
+        hits, misses = cache.hits, cache.misses
+        edit = timed("warm, one-line edit", generate_label_pdf_cached, output_path, max_width, edited, cache)
+        print(f"edit pass: {cache.hits - hits} pages from cache, {cache.misses - misses} re-rendered, "
+              f"{edit / full:.0%} of a full render")
+        print(cache.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Labels/sec and file size with per-label serials and 2D codes (label_codes)
+# against plain labels, on the "Part 2 Summer Labels D.txt" blocks scaled to
+# `copies` labels (100k by default), streamed to a PDF. Also times encoding
+# one code with the cached symbols against ReportLab's own QR encoder, which
+# is what drawing codes without the cache would cost.
+#
+#   python benchmarks/bench_codes.py [copies]
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from reportlab.graphics.barcode import qrencoder
+
+from bench_forms import SAMPLE, scale_counts
+from label_codes import LabelSerials, code_symbol
+from label_maker import generate_label_pdf_stream, parse_label_file
+
+ENCODE_RUNS = 200
+# name, serials, generate_label_pdf_stream options; with binary streams the
+# code bits are not ASCII85-encoded, which is most of what is left of their cost
+CASES = [
+    ("plain", None, {}),
+    ("serial", LabelSerials("NHM-", 1), {}),
+    ("serial + datamatrix", LabelSerials("NHM-", 1, code="datamatrix"), {}),
+    ("serial + qr", LabelSerials("NHM-", 1, code="qr"), {}),
+    ("serial, binary", LabelSerials("NHM-", 1), {"binary_streams": True}),
+    ("datamatrix, binary", LabelSerials("NHM-", 1, code="datamatrix"), {"binary_streams": True}),
+]
+
+def time_encode(encode):
+    start = time.perf_counter()
+    for i in range(ENCODE_RUNS):
+        encode(f"NHM-{i:06d}")
+    return (time.perf_counter() - start) / ENCODE_RUNS
+
+def reportlab_qr(payload):
+    qr = qrencoder.QRCode(None, qrencoder.QRErrorCorrectLevel.M)
+    qr.addData(payload)
+    qr.make()
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    blocks = scale_counts(blocks, copies)
+
+    print("encoding one code:")
+    for code in ("datamatrix", "qr"):
+        symbol = code_symbol(code, "NHM-999999")
+        time_encode(symbol.image_data)  # fill the caches first
+        print(f"  {code + ', cached symbol':>24} {time_encode(symbol.image_data) * 1e6:>8.1f} us")
+    print(f"  {'qr, reportlab encoder':>24} {time_encode(reportlab_qr) * 1e6:>8.1f} us")
+
+    print(f"\n{copies} labels")
+    print(f"{'':>20} {'pages':>6} {'seconds':>8} {'labels/s':>9} {'bytes':>10} {'B/label':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, serials, options in CASES:
+            path = os.path.join(tmp, "out.pdf")
+            start = time.perf_counter()
+            pages = generate_label_pdf_stream(path, max_width, blocks, serials=serials, **options)
+            seconds = time.perf_counter() - start
+            size = os.path.getsize(path)
+            print(f"{name:>20} {pages:>6} {seconds:>8.2f} {copies / seconds:>9.0f} {size:>10} "
+                  f"{size / copies:>8.1f}", flush=True)
+
+if __name__ == "__main__":
+    main()
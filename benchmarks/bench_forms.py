@@ -0,0 +1,48 @@
+# File size and wall time of per-line drawing vs Form XObject placement on the
+# "Part 2 Summer Labels D.txt" blocks, with counts scaled up to a total copy
+# count (100k by default).
+#
+#   python benchmarks/bench_forms.py [total_copies]
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from label_maker import parse_label_file, generate_label_pdf
+
+SAMPLE = "Part 2 Summer Labels D.txt"
+
+def scale_counts(blocks, total_copies):
+    # Keep the relative block counts of the sample, scaled to total_copies
+    sample_total = sum(block["count"] for block in blocks)
+    scaled = [{"lines": block["lines"], "count": block["count"] * total_copies // sample_total}
+              for block in blocks]
+    scaled[0]["count"] += total_copies - sum(block["count"] for block in scaled)
+    return scaled
+
+def main():
+    total_copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    blocks = scale_counts(blocks, total_copies)
+    unique_blocks = len({tuple(block["lines"]) for block in blocks})
+    print(f"{len(blocks)} blocks ({unique_blocks} unique), {total_copies} copies")
+
+    print(f"{'mode':>10} {'seconds':>8} {'bytes':>12} {'bytes/label':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, use_forms in (("per-line", False), ("forms", True)):
+            output_path = os.path.join(tmp, name + ".pdf")
+            start = time.perf_counter()
+            generate_label_pdf(output_path, max_width, blocks, use_forms=use_forms)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(output_path)
+            print(f"{name:>10} {elapsed:>8.2f} {size:>12} {size / total_copies:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Labels from a large CSV export (label_import): rows/sec read through a
+# template, peak Python memory while reading (tracemalloc, in its own pass so
+# it does not slow the timed run), and rows/sec end to end into a PDF for the
+# first `render_rows` rows. The table is synthetic specimen data, about 5% of
+# rows with a locality too long for the label (truncated) and some runs of
+# identical rows (merged into one block).
+#
+#   python benchmarks/bench_import.py [rows] [render_rows]
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from label_import import LabelTemplate, TableImport, generate_label_pdf_from_table
+
+TEMPLATE = LabelTemplate(["{state}: {county} Co.", "{locality}", "{lat}N,{lon}W", "{date}, {elev}m", "{collector}"],
+                         max_width=25, count="copies")
+STATES = {"MONT": ["Lincoln", "Flathead", "Sanders"], "IDAH": ["Boundary", "Bonner"], "WASH": ["Pend Oreille"]}
+LOCALITIES = ["Long Canyon", "Scenery Mtn. Trail", "Ross Creek Cedars", "Bull Lake", "Pack River"]
+LONG_LOCALITY = "Kootenai River floodplain, 2 km below the falls"
+COLLECTORS = ["J.Vega", "K.Lee", "J.Vega,J.Vargas, net", "M.Ortiz, beating"]
+
+def write_table(path, rows, seed=1):
+    random.seed(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("state,county,locality,lat,lon,date,elev,collector,copies\n")
+        written = 0
+        while written < rows:
+            state = random.choice(list(STATES))
+            locality = LONG_LOCALITY if random.random() < 0.05 else random.choice(LOCALITIES)
+            row = (f"{state},{random.choice(STATES[state])},\"{locality}\",{random.uniform(45, 49):.3f},"
+                   f"{random.uniform(114, 117):.3f},{random.randint(1, 28):02d} JULY 2024,"
+                   f"{random.randint(500, 2500)},\"{random.choice(COLLECTORS)}\",{random.randint(1, 4)}\n")
+            repeat = min(rows - written, random.choice((1, 1, 1, 3)))
+            f.write(row * repeat)
+            written += repeat
+
+def read_all(path):
+    table = TableImport(path, TEMPLATE)
+    blocks = sum(1 for _ in table)
+    return table, blocks
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    render_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.csv")
+        write_table(path, rows)
+        print(f"{rows} rows, {os.path.getsize(path) / 2**20:.1f} MB")
+
+        start = time.perf_counter()
+        table, blocks = read_all(path)
+        seconds = time.perf_counter() - start
+        print(f"import: {seconds:.2f}s, {rows / seconds:.0f} rows/s, {blocks} blocks, {table.labels} labels, "
+              f"{table.truncated} lines truncated")
+
+        tracemalloc.start()
+        read_all(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"import peak memory: {peak / 2**20:.2f} MB")
+
+        subset = os.path.join(tmp, "subset.csv")
+        write_table(subset, min(rows, render_rows))
+        start = time.perf_counter()
+        pages, table = generate_label_pdf_from_table(os.path.join(tmp, "subset.pdf"), subset, TEMPLATE)
+        seconds = time.perf_counter() - start
+        print(f"render {table.rows} rows: {seconds:.2f}s, {table.rows / seconds:.0f} rows/s, "
+              f"{table.labels / seconds:.0f} labels/s, {pages} pages")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# File size and wall time of each output-size option on the
+# "Part 2 Summer Labels D.txt" blocks, with counts scaled up to a total copy
+# count (100k by default).
+#
+#   python benchmarks/bench_output_size.py [total_copies]
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_forms import SAMPLE, scale_counts
+from label_maker import parse_label_file, generate_label_pdf_stream, output_size_report
+
+MODES = (
+    ("default", {}),
+    ("subset", {"subset_glyphs": True}),
+    ("binary", {"binary_streams": True}),
+    ("objstm", {"object_streams": True}),
+    ("forms", {"use_forms": True}),
+    ("compact", {"use_forms": True, "subset_glyphs": True, "binary_streams": True, "object_streams": True}),
+)
+
+def main():
+    total_copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    blocks = scale_counts(blocks, total_copies)
+    print(f"{len(blocks)} blocks, {total_copies} copies")
+
+    print(f"{'mode':>10} {'seconds':>8} {'bytes':>12} {'bytes/page':>12} {'bytes/label':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, options in MODES:
+            output_path = os.path.join(tmp, name + ".pdf")
+            start = time.perf_counter()
+            pages = generate_label_pdf_stream(output_path, max_width, blocks, **options)
+            elapsed = time.perf_counter() - start
+            size = output_size_report(output_path, pages, total_copies)
+            print(f"{name:>10} {elapsed:>8.2f} {size['bytes']:>12} {size['bytes_per_page']:>12.0f} "
+                  f"{size['bytes_per_label']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
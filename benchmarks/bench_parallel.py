@@ -0,0 +1,51 @@
+# Speedup of generate_label_pdf_parallel over the serial renderer for one
+# large job (sample D blocks repeated), with 1, 2, 4, ... worker processes.
+#
+#   python benchmarks/bench_parallel.py [total_labels]
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_maker import parse_label_file, generate_label_pdf
+from label_parallel import generate_label_pdf_parallel
+
+SAMPLE = os.path.join(ROOT, "Part 2 Summer Labels D.txt")
+
+def main():
+    total_labels = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    sample_labels = sum(block["count"] for block in blocks)
+    blocks = blocks * max(1, total_labels // sample_labels)
+    total_labels = sum(block["count"] for block in blocks)
+
+    worker_counts = []
+    n = 1
+    while n <= (os.cpu_count() or 1):
+        worker_counts.append(n)
+        n *= 2
+
+    print(f"{total_labels} labels, {os.cpu_count()} CPUs")
+    print(f"{'mode':>12} {'seconds':>8} {'speedup':>8} {'bytes':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "serial.pdf")
+        start = time.perf_counter()
+        generate_label_pdf(output_path, max_width, blocks)
+        serial = time.perf_counter() - start
+        print(f"{'serial':>12} {serial:>8.2f} {1.0:>8.2f} {os.path.getsize(output_path):>10}")
+
+        for workers in worker_counts:
+            output_path = os.path.join(tmp, f"parallel-{workers}.pdf")
+            start = time.perf_counter()
+            generate_label_pdf_parallel(output_path, max_width, blocks, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{f'{workers} workers':>12} {elapsed:>8.2f} {serial / elapsed:>8.2f} {os.path.getsize(output_path):>10}")
+
+if __name__ == "__main__":
+    main()
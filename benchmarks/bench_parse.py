@@ -0,0 +1,91 @@
+# Memory and throughput of the label file parser on a large synthetic file:
+# the original list-of-dicts parser, parse_label_file (LabelBlock list) and
+# plain iteration over LabelFileReader (nothing kept).
+#
+#   python benchmarks/bench_parse.py [size_mb]
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_maker import LabelFileReader, parse_label_file
+
+# The parser as it was before LabelFileReader, kept here as the reference
+def legacy_parse_label_file(filepath):
+    with open(filepath, "r", encoding="utf-8") as file:
+        lines = [line.strip() for line in file if line.strip() != ""]
+
+    max_width = int(lines[0])
+    label_blocks = []
+    current_block = []
+    i = 1
+    count = -1
+
+    while i < len(lines):
+        if lines[i].isdigit():
+            if current_block:
+                label_blocks.append({"lines": current_block, "count": count})
+                current_block = []
+            count = int(lines[i])
+        else:
+            if count == -1:
+                return max_width, label_blocks, 1
+            if len(lines[i]) > max_width:
+                return max_width, label_blocks, i + 1
+            current_block.append(lines[i])
+        i += 1
+
+    if current_block:
+        label_blocks.append({"lines": current_block, "count": count})
+    return max_width, label_blocks, -1
+
+def stream_label_file(filepath):
+    reader = LabelFileReader(filepath)
+    blocks = 0
+    for block in reader:
+        blocks += 1
+    return reader.max_width, blocks, reader.error_line
+
+def write_synthetic_file(path, size_mb):
+    target = size_mb * 1024 * 1024
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("25\n")
+        n = 0
+        while file.tell() < target:
+            file.write(f"{n % 50 + 1}\n")
+            file.write(f"MONT: Lincoln Co. {n}\n")
+            file.write("Scenery Mountain Trail\n")
+            file.write("48.4160°N,115.7173°W\n")
+            file.write("09 JULY 2024, 2101m\n")
+            file.write("J.Vega,J.Vargas, net\n")
+            n += 1
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "labels.txt")
+        write_synthetic_file(path, size_mb)
+        size = os.path.getsize(path)
+        print(f"synthetic file: {size / (1024 * 1024):.1f} MB")
+        print(f"{'parser':>10} {'seconds':>8} {'MB/s':>8} {'peak MB':>8}")
+        for name, parse in (("legacy", legacy_parse_label_file),
+                            ("parse", parse_label_file),
+                            ("stream", stream_label_file)):
+            start = time.perf_counter()
+            result = parse(path)
+            elapsed = time.perf_counter() - start
+            del result
+            tracemalloc.start()
+            result = parse(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del result
+            print(f"{name:>10} {elapsed:>8.2f} {size / (1024 * 1024) / elapsed:>8.1f} {peak / (1024 * 1024):>8.1f}")
+
+if __name__ == "__main__":
+    main()
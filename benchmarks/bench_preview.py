@@ -0,0 +1,43 @@
+# Latency of the raster preview of the first page against job size: the
+# "Part 2 Summer Labels D.txt" blocks with counts scaled from 1k up to 200k
+# copies (or the given total). The time should stay flat.
+#
+#   python benchmarks/bench_preview.py [max_copies]
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_forms import SAMPLE, scale_counts
+from label_layout import LayoutPlan
+from label_maker import parse_label_file
+from label_preview import render_preview_page
+
+def main():
+    max_copies = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+
+    start = time.perf_counter()
+    plan = LayoutPlan(max_width, blocks)
+    render_preview_page(plan, 0)
+    print(f"cold start (font atlas): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'copies':>8} {'pages':>6} {'first page ms':>14} {'last page ms':>13}")
+    for copies in (1000, 10000, 100000, max_copies):
+        plan = LayoutPlan(max_width, scale_counts(blocks, copies))
+        start = time.perf_counter()
+        render_preview_page(plan, 0)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        render_preview_page(plan, plan.total_pages - 1)
+        last = time.perf_counter() - start
+        print(f"{copies:>8} {plan.total_pages:>6} {first * 1000:>14.1f} {last * 1000:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Time until the first page reaches a print backend, against the time for the
+# whole job, on the "Part 2 Summer Labels D.txt" blocks with counts scaled up
+# to a total copy count (50k by default). Uses the file stand-in printer and a
+# pipe into a process that reads and drops the stream, each with an empty
+# render cache so every page is drawn.
+#
+#   python benchmarks/bench_print.py [total_copies]
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_forms import SAMPLE, scale_counts
+from label_cache import RenderCache
+from label_maker import parse_label_file
+from label_print import FileBackend, PipeBackend, print_labels
+
+def main():
+    total_copies = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    blocks = scale_counts(blocks, total_copies)
+
+    print(f"{'backend':>8} {'pages':>6} {'first page s':>13} {'total s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = (FileBackend(os.path.join(tmp, "printer.pdf")),
+                    PipeBackend([sys.executable, "-c", "import sys; sys.stdin.buffer.read()"]))
+        for backend in backends:
+            cache = RenderCache(os.path.join(tmp, "cache_" + backend.name))
+            result = print_labels(backend, max_width, blocks, cache=cache)
+            print(f"{result['backend']:>8} {result['pages']:>6} {result['first_page_seconds']:>13.2f} "
+                  f"{result['seconds']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
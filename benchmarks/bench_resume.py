@@ -0,0 +1,80 @@
+# Checkpointed generation (label_checkpoint) on the "Part 2 Summer Labels D.txt"
+# blocks scaled to `copies` labels (100k by default): the time of a plain
+# streamed run, of a checkpointed run, of one interrupted halfway plus the
+# rerun that finishes it, and of a rerun after one segment file was damaged
+# (only that segment is hashed and drawn again). The overhead of checkpointing
+# is the segment files and the journal; the interrupted run should cost about
+# one uninterrupted run in total.
+#
+#   python benchmarks/bench_resume.py [copies] [pages_per_segment]
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_forms import SAMPLE, scale_counts
+from label_checkpoint import SEGMENT_PAGES, generate_label_pdf_resumable, work_dir_for
+from label_maker import generate_label_pdf_stream, parse_label_file
+from label_stats import RenderStats
+
+class Interrupted(Exception):
+    pass
+
+def stop_after(pages_done):
+    def progress(done, pages):
+        if done >= pages_done:
+            raise Interrupted
+    return progress
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pages_per_segment = int(sys.argv[2]) if len(sys.argv) > 2 else SEGMENT_PAGES
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    blocks = scale_counts(blocks, copies)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.pdf")
+        pages = generate_label_pdf_stream(path, max_width, blocks)
+        print(f"{copies} labels, {pages} pages, {pages_per_segment} pages per segment")
+
+        def resumable(**options):
+            return lambda: generate_label_pdf_resumable(path, max_width, blocks, pages_per_segment, **options)
+
+        def interrupted():
+            try:
+                resumable(progress=stop_after(pages // 2))()
+            except Interrupted:
+                pass
+
+        stream = timed(lambda: generate_label_pdf_stream(path, max_width, blocks))
+        checkpointed = timed(resumable())
+        first = timed(interrupted)
+        rest = timed(resumable())
+        print(f"{'streamed':>24} {stream:>8.2f}s")
+        print(f"{'checkpointed':>24} {checkpointed:>8.2f}s  {checkpointed / stream - 1:+.0%}")
+        print(f"{'interrupted + resumed':>24} {first + rest:>8.2f}s  ({first:.2f}s + {rest:.2f}s)")
+
+        interrupted()
+        segment = os.path.join(work_dir_for(path), "00000.seg")
+        with open(segment, "ab") as f:
+            f.write(b"damaged")
+        stats = RenderStats()
+        seconds = timed(resumable(stats=stats))
+        counters = stats.to_dict()["counters"]
+        print(f"{'resumed, 1 seg. damaged':>24} {seconds:>8.2f}s  ({counters.get('segments_resumed', 0)} resumed, "
+              f"{counters.get('segments_rehashed', 0)} rehashed, {counters.get('segments_drawn', 0)} drawn)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Load test for the render server (label_server): latency and throughput of
+# jobs submitted by several clients at once, against starting a fresh
+# pinlab_cli process per job (what separate GUI instances pay today).
+#
+# A server with an empty render cache is started in this process. The first
+# round sends one job per worker, so each worker loads the font (cold). Then
+# `clients` threads submit `jobs` jobs of the "Part 2 Summer Labels D.txt"
+# blocks scaled to `copies` labels, first all the same job (warm font and
+# render cache hits), then each with different counts (warm font, every page
+# drawn).
+#
+#   python benchmarks/bench_server.py [jobs] [clients] [workers] [copies]
+
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_forms import SAMPLE, scale_counts
+from label_maker import parse_label_file
+from label_server import RenderClient, RenderServer, label_file_bytes
+
+CLI_RUNS = 3
+
+def start_server(workers, cache_dir):
+    # Runs the server's event loop on a daemon thread; returns its address
+    started = threading.Event()
+    address = []
+
+    def run():
+        async def serve():
+            server = RenderServer(workers, cache_dir)
+            address.append(await server.start(port=0))
+            started.set()
+            await server.serve_forever()
+        asyncio.run(serve())
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return address[0]
+
+def submit_all(client, payloads, clients):
+    # (latency per job, wall time) with `clients` jobs in flight at once
+    def one(data):
+        start = time.perf_counter()
+        client.render(data, io.BytesIO())
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = list(pool.map(one, payloads))
+    return latencies, time.perf_counter() - start
+
+def report(name, latencies, wall, labels):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:>18} {len(latencies):>5} {statistics.median(latencies) * 1000:>9.0f} {p95 * 1000:>9.0f} "
+          f"{len(latencies) / wall:>7.1f} {labels / wall:>10.0f}")
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else min(4, os.cpu_count() or 1)
+    copies = int(sys.argv[4]) if len(sys.argv) > 4 else 5000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    same = label_file_bytes(max_width, scale_counts(blocks, copies))
+    distinct = [label_file_bytes(max_width, scale_counts(blocks, copies + i)) for i in range(1, jobs + 1)]
+
+    print(f"{jobs} jobs of {copies} labels, {clients} clients, {workers} workers")
+    print(f"{'':>18} {'jobs':>5} {'p50 ms':>9} {'p95 ms':>9} {'jobs/s':>7} {'labels/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        client = RenderClient(start_server(workers, os.path.join(tmp, "cache")))
+        latencies, wall = submit_all(client, [distinct[-1]] * workers, workers)
+        report("cold (1 per worker)", latencies, wall, workers * copies)
+        latencies, wall = submit_all(client, [same] * jobs, clients)
+        report("warm, same job", latencies, wall, jobs * copies)
+        latencies, wall = submit_all(client, distinct, clients)
+        report("warm, distinct", latencies, wall, jobs * copies)
+
+        path = os.path.join(tmp, "job.txt")
+        with open(path, "wb") as f:
+            f.write(distinct[0])
+        latencies = []
+        for _ in range(CLI_RUNS):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "pinlab_cli.py", path, "-j", "1", "-o", tmp],
+                           check=True, stdout=subprocess.DEVNULL)
+            latencies.append(time.perf_counter() - start)
+        report("cli process per job", latencies, sum(latencies), CLI_RUNS * copies)
+        print(client.status())
+
+if __name__ == "__main__":
+    main()
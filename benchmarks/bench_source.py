@@ -0,0 +1,77 @@
+# Opening a very large label file: reading it whole (what the editor does)
+# against LabelSource (label_source), which maps the file and indexes it.
+# Reports the time to open, the time to fetch a screenful of rows at random
+# places and the peak Python memory, for a UTF-8 file and a UTF-16 copy
+# (Excel's "Unicode Text" export) of the same labels. The file is made from
+# "Part 2 Summer Labels D.txt" repeated up to the given size (100 MB default).
+#
+#   python benchmarks/bench_source.py [megabytes]
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_forms import SAMPLE
+from label_source import LabelSource, text_encoding
+
+WINDOW_ROWS = 40
+WINDOWS = 200
+
+def write_big_file(path, megabytes, encoding, bom=b""):
+    with open(SAMPLE, encoding="utf-8") as f:
+        width, body = f.read().split("\n", 1)
+    body = body.rstrip("\n") + "\n"
+    with open(path, "wb") as f:
+        f.write(bom + (width + "\n").encode(encoding))
+        chunk = (body * 200).encode(encoding)
+        while f.tell() < megabytes * 2**20:
+            f.write(chunk)
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, result
+
+def read_whole(path):
+    with open(path, "r", encoding=text_encoding(path)) as f:
+        return f.read().split("\n")
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rng = random.Random(0)
+    print(f"{'file':>8} {'reader':>11} {'open s':>8} {'peak MB':>8} {'window ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, encoding, bom in (("utf-8", "utf-8", b""), ("utf-16", "utf-16-le", b"\xff\xfe")):
+            path = os.path.join(tmp, name + ".txt")
+            write_big_file(path, megabytes, encoding, bom)
+
+            elapsed, peak, rows = measure(lambda: read_whole(path))
+            starts = [rng.randrange(len(rows)) for _ in range(WINDOWS)]
+            start = time.perf_counter()
+            for row in starts:
+                rows[row:row + WINDOW_ROWS]
+            window = (time.perf_counter() - start) / WINDOWS
+            print(f"{name:>8} {'read whole':>11} {elapsed:>8.2f} {peak:>8.1f} {window * 1000:>10.3f}", flush=True)
+            del rows
+
+            elapsed, peak, source = measure(lambda: LabelSource(path))
+            start = time.perf_counter()
+            for row in starts:
+                source.lines(row, row + WINDOW_ROWS)
+            window = (time.perf_counter() - start) / WINDOWS
+            print(f"{name:>8} {'LabelSource':>11} {elapsed:>8.2f} {peak:>8.1f} {window * 1000:>10.3f}", flush=True)
+            source.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# Import and first-render latency of the engine in a fresh interpreter, and
+# the cost of later renders in the same process (the font is loaded once).
+# For the GUI itself run:  python pinlab_gui.py --measure-startup
+#
+#   python benchmarks/bench_startup.py [renders]
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import os, sys, tempfile, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from label_maker import LabelBlock, generate_label_pdf
+print(f"import label_maker   {(time.perf_counter() - t0) * 1000:8.1f} ms")
+sample = [LabelBlock(("MONT: Lincoln Co.", "Scenery Mountain Trail", "48.4160°N,115.7173°W"), 10)]
+with tempfile.TemporaryDirectory() as tmp:
+    for n in range(int(sys.argv[2])):
+        start = time.perf_counter()
+        generate_label_pdf(os.path.join(tmp, f"{n}.pdf"), 25, sample)
+        name = "first render" if n == 0 else f"render {n + 1}"
+        print(f"{name:<20} {(time.perf_counter() - start) * 1000:8.1f} ms")
+"""
+
+def main():
+    renders = sys.argv[1] if len(sys.argv) > 1 else "5"
+    subprocess.run([sys.executable, "-c", CHILD, ROOT, renders], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Peak memory of generate_label_pdf vs generate_label_pdf_stream as the number
+# of labels grows. The streaming path should stay flat per 10k labels.
+#
+#   python benchmarks/bench_streaming.py [max_labels]
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # the font is loaded relative to the repo root
+
+from label_maker import parse_label_file, generate_label_pdf, generate_label_pdf_stream
+
+SAMPLE = "Part 2 Summer Labels D.txt"
+
+def repeated_blocks(blocks, total_labels):
+    # Cycle through the sample blocks until total_labels copies are produced
+    produced = 0
+    while produced < total_labels:
+        for block in blocks:
+            count = min(block["count"], total_labels - produced)
+            if count <= 0:
+                return
+            yield {"lines": block["lines"], "count": count}
+            produced += count
+
+def measure(generate, output_path, max_width, blocks, total_labels, lines_per_label):
+    source = repeated_blocks(blocks, total_labels)
+    tracemalloc.start()
+    start = time.perf_counter()
+    if generate is generate_label_pdf:
+        generate(output_path, max_width, list(source))
+    else:
+        generate(output_path, max_width, source, lines_per_label)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    max_labels = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    lines_per_label = max(len(block["lines"]) for block in blocks)
+
+    sizes = []
+    n = 10000
+    while n <= max_labels:
+        sizes.append(n)
+        n *= 2
+
+    print(f"{'labels':>8} {'mode':>8} {'seconds':>8} {'peak MB':>8} {'MB/10k':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "bench.pdf")
+        for total in sizes:
+            for name, generate in (("canvas", generate_label_pdf), ("stream", generate_label_pdf_stream)):
+                elapsed, peak = measure(generate, output_path, max_width, blocks, total, lines_per_label)
+                peak_mb = peak / (1024 * 1024)
+                print(f"{total:>8} {name:>8} {elapsed:>8.2f} {peak_mb:>8.1f} {peak_mb * 10000 / total:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# Regression suite for the parse and render hot paths.
+#
+# Writes synthetic label files of different shapes, then times
+# parse_label_file and generate_label_pdf separately on each and records
+# input lines/sec (parse), labels/sec (render), bytes/label and peak memory
+# (tracemalloc, in its own pass so it does not slow the timed runs). The
+# results are compared with benchmarks/baseline.json and the run exits with
+# status 1 on a regression.
+#
+#   python benchmarks/bench_suite.py                    # compare with the baseline
+#   python benchmarks/bench_suite.py --update-baseline  # record a new baseline
+#   python benchmarks/bench_suite.py --shapes few_huge,tall_12 --json results.json
+#
+# Each measurement repeats the call until it runs for at least MIN_SECONDS,
+# so the quick parses (few_huge is 21 lines) are not timer noise. Rates depend
+# on the machine, so every run also times a fixed calibration workload, stored
+# in the baseline under "_machine"; the baseline's rates are scaled by how
+# much faster or slower this machine ran it before they are compared. That
+# only evens out raw speed: a baseline recorded on the machine that runs the
+# comparison is still the one to gate on.
+
+import argparse
+import json
+import os
+import math
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from label_maker import parse_label_file, generate_label_pdf
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+MIN_SECONDS = 0.2
+MACHINE_KEY = "_machine"
+
+# name: (blocks, copies per block, lines per label, max width)
+SHAPES = {
+    "many_small": (1000, 4, 5, 25),
+    "few_huge": (4, 1000, 5, 25),
+    "tall_12": (200, 15, 12, 40),
+    "wide_60": (200, 15, 5, 60),
+    "narrow_20": (400, 10, 5, 20),
+    "tall_wide": (10, 200, 12, 60),
+}
+
+# metric: (direction, allowed change) -- "higher" metrics may not drop by more
+# than the allowed fraction, "lower" metrics may not grow by more than it.
+# The "higher" ones are rates, scaled by the machine calibration.
+THRESHOLDS = {
+    "parse_lines_per_sec": ("higher", 0.25),
+    "render_labels_per_sec": ("higher", 0.25),
+    "bytes_per_label": ("lower", 0.02),
+    "peak_mb": ("lower", 0.25),
+}
+
+CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 .,:;'-()/°´"
+
+def write_label_file(path, blocks, copies, lines_per_label, max_width, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{max_width}\n")
+        for _ in range(blocks):
+            f.write(f"{copies}\n")
+            for _ in range(lines_per_label):
+                length = rng.randint(max_width // 2, max_width)
+                f.write("".join(rng.choice(CHARS) for _ in range(length)).strip() or "x")
+                f.write("\n")
+
+def best_time(function, repeat, min_seconds=MIN_SECONDS):
+    # Best seconds per call, each timed run calling function often enough to
+    # last min_seconds
+    start = time.perf_counter()
+    result = function()
+    number = max(1, math.ceil(min_seconds / max(time.perf_counter() - start, 1e-9)))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            result = function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def calibration_work():
+    # Fixed string formatting and compression, like drawing a page
+    parts = [f"1 0 0 1 {i * 0.731:.4f} {i % 97 * 8.5:.4f} Tm ({i:06d}) Tj" for i in range(20000)]
+    return zlib.compress("\n".join(parts).encode("ascii"))
+
+def calibrate(repeat):
+    return {"calibration_seconds": best_time(calibration_work, max(repeat, 3))[0]}
+
+def run_shape(name, tmp, repeat):
+    blocks, copies, lines_per_label, max_width = SHAPES[name]
+    input_path = os.path.join(tmp, name + ".txt")
+    output_path = os.path.join(tmp, name + ".pdf")
+    write_label_file(input_path, blocks, copies, lines_per_label, max_width)
+    labels = blocks * copies
+    input_lines = 1 + blocks * (1 + lines_per_label)
+
+    parse_seconds, (width, label_blocks, error_line) = best_time(lambda: parse_label_file(input_path), repeat)
+    if error_line != -1:
+        raise RuntimeError(f"{name}: synthetic file has an error at line {error_line}")
+    render_seconds, pages = best_time(lambda: generate_label_pdf(output_path, width, label_blocks), repeat)
+    size = os.path.getsize(output_path)
+
+    tracemalloc.start()
+    generate_label_pdf(output_path, width, parse_label_file(input_path)[1])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "labels": labels,
+        "pages": pages,
+        "parse_seconds": parse_seconds,
+        "render_seconds": render_seconds,
+        "parse_lines_per_sec": input_lines / parse_seconds,
+        "render_labels_per_sec": labels / render_seconds,
+        "bytes_per_label": size / labels,
+        "peak_mb": peak / 2**20,
+    }
+
+def compare(results, baseline, machine):
+    # Returns a list of regression messages
+    regressions = []
+    base_machine = baseline.get(MACHINE_KEY)
+    # > 1 when this machine is faster than the baseline's
+    speed = base_machine["calibration_seconds"] / machine["calibration_seconds"] if base_machine else 1.0
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, (direction, allowed) in THRESHOLDS.items():
+            old, new = base[metric], result[metric]
+            if direction == "higher":
+                old *= speed
+            change = (new - old) / old if old else 0.0
+            if (direction == "higher" and change < -allowed) or (direction == "lower" and change > allowed):
+                regressions.append(f"{name}: {metric} {old:.4g} -> {new:.4g} ({change:+.1%}, allowed {allowed:.0%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parse and render on synthetic label files.")
+    parser.add_argument("--shapes", help="comma-separated shape names (default: all)")
+    parser.add_argument("--repeat", type=int, default=2, help="timed runs per measurement, best is kept")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    names = args.shapes.split(",") if args.shapes else list(SHAPES)
+    unknown = [name for name in names if name not in SHAPES]
+    if unknown:
+        parser.error(f"unknown shapes: {', '.join(unknown)}")
+
+    machine = calibrate(args.repeat)
+    results = {}
+    print(f"calibration: {machine['calibration_seconds'] * 1000:.1f} ms\n")
+    print(f"{'shape':>11} {'labels':>7} {'pages':>6} {'parse line/s':>13} {'render lab/s':>13} "
+          f"{'B/label':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            r = results[name] = run_shape(name, tmp, args.repeat)
+            print(f"{name:>11} {r['labels']:>7} {r['pages']:>6} {r['parse_lines_per_sec']:>13.0f} "
+                  f"{r['render_labels_per_sec']:>13.0f} {r['bytes_per_label']:>8.1f} {r['peak_mb']:>8.1f}", flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        baseline[MACHINE_KEY] = machine
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline first.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), machine)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for message in regressions:
+            print("  " + message)
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# Content-stream operators per label and wall time of the old per-line drawing
+# (q / cm / BT ... ET / Q for every line) against one text object per page
+# (draw_label_blocks), on the "Part 2 Summer Labels D.txt" blocks scaled up to
+# a total copy count (20k by default). Streams are written uncompressed so the
+# operators can be counted.
+#
+#   python benchmarks/bench_text_objects.py [total_copies]
+
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+
+from bench_forms import SAMPLE, scale_counts
+from label_layout import compute_layout, label_position
+from label_maker import FONT_NAME, parse_label_file, register_label_font, draw_label_blocks
+
+# Strings first, so their contents are not counted as operators
+TOKEN = re.compile(rb"\((?:\\.|[^\\)])*\)|T\*|[A-Za-z]+")
+
+def draw_per_line(c, max_width, label_blocks):
+    # The drawing code before text objects, kept here for comparison
+    layout = compute_layout(max_width, max(len(block["lines"]) for block in label_blocks))
+    line_spacing = layout["line_spacing"]
+    register_label_font()
+    c.setFont(FONT_NAME, layout["font_size"] + 0.5)
+    page = 0
+    index = 0
+    for block in label_blocks:
+        for _ in range(block["count"]):
+            label_page, x, y = label_position(layout, index)
+            if label_page != page:
+                c.showPage()
+                c.setFont(FONT_NAME, layout["font_size"] + 0.5)
+                page = label_page
+            for i, line in enumerate(block["lines"]):
+                c.saveState()
+                c.translate(x, y - i * line_spacing)
+                c.scale(1.0, layout["stretch"])
+                c.drawString(0, 0, line)
+                c.restoreState()
+            index += 1
+
+def run(draw, output_path, max_width, blocks):
+    c = canvas.Canvas(output_path, pagesize=A4, pageCompression=0)
+    start = time.perf_counter()
+    draw(c, max_width, blocks)
+    c.save()
+    return time.perf_counter() - start, os.path.getsize(output_path)
+
+def operators_in_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    total = 0
+    for stream in re.findall(rb"stream\r?\n(.*?)endstream", data, re.S):
+        total += sum(1 for token in TOKEN.findall(stream) if not token.startswith(b"("))
+    return total
+
+def main():
+    total_copies = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    max_width, blocks, error_line = parse_label_file(SAMPLE)
+    if error_line != -1:
+        sys.exit(f"ERROR: error is at line {error_line} in {SAMPLE}")
+    blocks = scale_counts(blocks, total_copies)
+    print(f"{len(blocks)} blocks, {total_copies} copies")
+
+    print(f"{'mode':>12} {'seconds':>8} {'labels/s':>9} {'bytes/label':>12} {'ops/label':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, draw in (("per-line", draw_per_line), ("text-object", draw_label_blocks)):
+            output_path = os.path.join(tmp, name + ".pdf")
+            elapsed, size = run(draw, output_path, max_width, blocks)
+            operators = operators_in_file(output_path)
+            print(f"{name:>12} {elapsed:>8.2f} {total_copies / elapsed:>9.0f} "
+                  f"{size / total_copies:>12.1f} {operators / total_copies:>10.1f}")
+
+if __name__ == "__main__":
+    main()
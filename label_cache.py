@@ -0,0 +1,188 @@
+# On-disk render cache for the edit -> regenerate loop.
+#
+# Each page of a job is keyed by a hash of everything that decides its drawing
+# operators: the layout, and the runs of label copies on it with their lines
+# as encoded for the job's font subsets. Regenerating after an edit only draws
+# the pages whose key changed; the others are read back from the cache. Files
+# are evicted least-recently-used first once the cache grows past max_bytes.
+
+import hashlib
+import os
+import time
+import zlib
+
+from reportlab.pdfbase import pdfmetrics
+
+from label_layout import LayoutPlan
+from label_parallel import (
+    FONT_NAME, PageCaptureCanvas, font_seed_text, render_page_range, seed_font_state,
+    slice_label_blocks, write_captured_pages,
+)
+
+# Bump when a change to the drawing code changes what a cached page contains
+RENDER_VERSION = 2
+
+DEFAULT_CACHE_BYTES = 200 * 1024 * 1024
+
+def default_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "PinLab", "render_cache")
+
+class RenderCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".page")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                page_code = zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, zlib.error, UnicodeDecodeError):
+            # Truncated or damaged (e.g. by a power loss): drop it and redraw
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return page_code
+
+    def put(self, key, page_code):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(zlib.compress(page_code.encode("utf-8")))
+        os.replace(temp_path, path)
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(".page"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+# Hash key of one page of a plan. encode(line) gives the line's glyph codes.
+def page_key(plan, page, encode):
+    h = hashlib.sha256()
+    h.update(repr((RENDER_VERSION, sorted(plan.layout.items()), plan.max_width)).encode("utf-8"))
+    for i, copies in plan.page_runs(page):
+        lines = plan.label_blocks[i]["lines"]
+        h.update(repr((copies, [encode(line) for line in lines])).encode("utf-8"))
+    return h.hexdigest()
+
+def line_encoder(seed_text):
+    c = PageCaptureCanvas(os.devnull)
+    seed_font_state(c, seed_text)
+    font = pdfmetrics.getFont(FONT_NAME)
+    encoded = {}
+
+    def encode(line):
+        if line not in encoded:
+            encoded[line] = font.splitString(line, c._doc)
+        return encoded[line]
+    return encode
+
+# output_path may also be a binary file object; progress(pages_written) is
+# called after each page. See write_captured_pages. stats (a RenderStats)
+# gets the cache lookup, render and write times, hit/miss counts and the
+# time to produce each page. profile is the label_stock.StockProfile.
+def generate_label_pdf_cached(output_path, max_width, label_blocks, cache=None, progress=None, stats=None,
+                              profile=None):
+    start = time.perf_counter()
+    if cache is None:
+        cache = RenderCache()
+    plan = LayoutPlan(max_width, list(label_blocks), profile=profile)
+    seed_text = font_seed_text(plan.label_blocks)
+    encode = line_encoder(seed_text)
+    if stats is not None:
+        stats.add_time("plan", time.perf_counter() - start)
+
+    def page_codes():
+        for page in range(plan.total_pages):
+            page_start = time.perf_counter()
+            key = page_key(plan, page, encode)
+            page_code = cache.get(key)
+            if stats is not None:
+                lookup_done = time.perf_counter()
+                stats.add_time("cache_lookup", lookup_done - page_start)
+                stats.count("cache_hits" if page_code is not None else "cache_misses")
+            if page_code is None:
+                start, stop = plan.page_label_range(page)
+                page_blocks = list(slice_label_blocks(plan.label_blocks, start, stop))
+                page_code = render_page_range(max_width, page_blocks, plan.lines_per_label, seed_text, plan.profile)[0]
+                cache.put(key, page_code)
+                if stats is not None:
+                    stats.add_time("render", time.perf_counter() - lookup_done)
+            if stats is not None:
+                start, stop = plan.page_label_range(page)
+                stats.count("labels", stop - start)
+                stats.page_done(page + 1, time.perf_counter() - page_start, stop - start)
+            yield page_code
+
+    def produced():
+        return sum(stats.phases.get(name, 0.0) for name in ("cache_lookup", "render"))
+
+    write_start = time.perf_counter()
+    produced_before = produced() if stats is not None else 0.0
+    write_captured_pages(output_path, seed_text, page_codes(), progress, plan.profile.pagesize)
+    if stats is not None:
+        # Time spent producing pages is counted above, the rest is the writer
+        stats.add_time("write", time.perf_counter() - write_start - (produced() - produced_before))
+    cache.evict()
+    return plan.total_pages
@@ -0,0 +1,185 @@
+# Resumable generation for very long jobs.
+#
+# A streamed PDF is only usable once save() has written the fonts and the
+# xref, so a 300k-label run that dies halfway leaves nothing to keep. Here
+# the job is drawn in segments of whole pages instead; each finished segment
+# (the page operators, as label_parallel captures them) is written to
+# <output>.partial/ and recorded in a small journal, and only when every
+# segment is there are they written out as the one output PDF:
+#
+#   <output>.partial/journal.json    job key, layout, pages, finished segments
+#   <output>.partial/00000.seg ...   zlib-compressed page operators
+#
+# Running the same job again picks up the journal and draws only the
+# segments it lacks. The job key hashes everything that decides the pages
+# (label text and counts, max width, layout, serials, segment size); if it
+# does not match, the old segments are thrown away. A recorded segment whose
+# file size and time are unchanged is taken as it is; only a segment file
+# that changed is hashed again and redrawn if its hash no longer matches.
+#
+#   pages = generate_label_pdf_resumable(output_path, max_width, blocks)
+
+import hashlib
+import json
+import os
+import shutil
+import zlib
+
+from label_cache import RENDER_VERSION
+from label_layout import LayoutPlan
+from label_parallel import font_seed_text, render_page_range, slice_label_blocks, write_captured_pages
+
+JOURNAL_VERSION = 1
+SEGMENT_PAGES = 25
+JOURNAL_NAME = "journal.json"
+
+def work_dir_for(output_path):
+    return output_path + ".partial"
+
+def _write_durably(path, data):
+    # Replace path with data, on disk before it is journaled
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def job_key(plan, pages_per_segment, serials=None):
+    # Hash of everything that decides the segments' contents
+    h = hashlib.sha256()
+    h.update(repr((JOURNAL_VERSION, RENDER_VERSION, plan.max_width, plan.lines_per_label,
+                   sorted(plan.layout.items()), pages_per_segment)).encode("utf-8"))
+    if serials is not None:
+        h.update(repr((serials.prefix, serials.start, serials.digits, serials.code)).encode("utf-8"))
+    for block in plan.label_blocks:
+        h.update(repr((block["count"], block["lines"])).encode("utf-8"))
+    return h.hexdigest()
+
+class Journal:
+    # The journal of one job's work directory. segments maps the segment
+    # number to {"sha256", "size", "mtime_ns"} of its finished file.
+    def __init__(self, directory, key, pages, pages_per_segment):
+        self.directory = directory
+        self.path = os.path.join(directory, JOURNAL_NAME)
+        self.key = key
+        self.pages = pages
+        self.pages_per_segment = pages_per_segment
+        self.segments = {}
+        self.rehashed = 0  # segment files hashed again because they changed
+
+    @property
+    def segment_count(self):
+        return -(-self.pages // self.pages_per_segment)
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"{segment:05d}.seg")
+
+    def load(self):
+        # Takes over the finished segments of an earlier run of the same job;
+        # returns how many there are
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if saved.get("version") != JOURNAL_VERSION or saved.get("job") != self.key:
+            return 0
+        for segment, record in saved.get("segments", {}).items():
+            if self.verify(int(segment), record):
+                self.segments[int(segment)] = record
+        return len(self.segments)
+
+    def verify(self, segment, record):
+        path = self.segment_path(segment)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size == record["size"] and st.st_mtime_ns == record["mtime_ns"]:
+            return True
+        self.rehashed += 1
+        with open(path, "rb") as f:
+            if hashlib.sha256(f.read()).hexdigest() != record["sha256"]:
+                return False
+        record["size"], record["mtime_ns"] = st.st_size, st.st_mtime_ns
+        return True
+
+    def save(self):
+        done = sorted(self.segments)
+        _write_durably(self.path, json.dumps({
+            "version": JOURNAL_VERSION,
+            "job": self.key,
+            "pages": self.pages,
+            "pages_per_segment": self.pages_per_segment,
+            # the end of the run of segments finished from the start
+            "pages_done": min(self.pages, next((i for i, s in enumerate(done) if s != i), len(done))
+                              * self.pages_per_segment),
+            "segments": {str(segment): self.segments[segment] for segment in done},
+        }, indent=1).encode("utf-8"))
+
+    def store(self, segment, page_codes):
+        data = zlib.compress(json.dumps(page_codes).encode("utf-8"))
+        path = self.segment_path(segment)
+        _write_durably(path, data)
+        st = os.stat(path)
+        self.segments[segment] = {"sha256": hashlib.sha256(data).hexdigest(), "size": st.st_size,
+                                  "mtime_ns": st.st_mtime_ns}
+        self.save()
+
+    def page_codes(self, segment):
+        with open(self.segment_path(segment), "rb") as f:
+            return json.loads(zlib.decompress(f.read()).decode("utf-8"))
+
+# Draws the job segment by segment into work_dir (default <output>.partial),
+# resuming from its journal, then writes the output PDF and removes work_dir.
+# Returns the number of pages. progress(pages_done, pages) is called once the
+# journal is read and after every segment; stats (a RenderStats) counts
+# segments resumed, rehashed and drawn. serials: as for draw_label_blocks.
+def generate_label_pdf_resumable(output_path, max_width, label_blocks, pages_per_segment=SEGMENT_PAGES,
+                                 profile=None, serials=None, progress=None, stats=None, work_dir=None):
+    plan = LayoutPlan(max_width, list(label_blocks), profile=profile, serials=serials)
+    if pages_per_segment < 1:
+        raise ValueError(f"Segments must have 1 page or more, not {pages_per_segment}")
+    work_dir = work_dir or work_dir_for(output_path)
+    journal = Journal(work_dir, job_key(plan, pages_per_segment, serials), plan.total_pages, pages_per_segment)
+    if not journal.load() and os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)  # another job's segments, or none worth keeping
+    os.makedirs(work_dir, exist_ok=True)
+    if stats is not None:
+        stats.count("segments_resumed", len(journal.segments))
+        stats.count("segments_rehashed", journal.rehashed)
+
+    seed_text = font_seed_text(plan.label_blocks) + (serials.seed_text() if serials is not None else "")
+    segment_labels = pages_per_segment * plan.labels_per_page
+
+    def pages_done():
+        return sum(min(pages_per_segment, plan.total_pages - segment * pages_per_segment)
+                   for segment in journal.segments)
+
+    if progress is not None:
+        progress(pages_done(), plan.total_pages)
+    for segment in range(journal.segment_count):
+        if segment in journal.segments:
+            continue
+        first = segment * segment_labels
+        blocks = list(slice_label_blocks(plan.label_blocks, first, first + segment_labels))
+        page_codes = render_page_range(max_width, blocks, plan.lines_per_label, seed_text, plan.profile,
+                                       serials.after(first) if serials is not None else None)
+        journal.store(segment, page_codes)
+        if stats is not None:
+            stats.count("segments_drawn")
+        if progress is not None:
+            progress(pages_done(), plan.total_pages)
+
+    def page_codes():
+        for segment in range(journal.segment_count):
+            yield from journal.page_codes(segment)
+
+    # Written beside the output and moved over it, so an interrupted write
+    # leaves the segments (and any earlier output) as they were
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    write_captured_pages(temp_path, seed_text, page_codes(), pagesize=plan.profile.pagesize)
+    os.replace(temp_path, output_path)
+    shutil.rmtree(work_dir)
+    return plan.total_pages
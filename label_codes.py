@@ -0,0 +1,445 @@
+# Per-label serial numbers and 2D codes (QR, DataMatrix).
+#
+# With LabelSerials every label copy gets the next number of a running serial
+# (prefix plus a zero-padded number, e.g. "NHM-000123") as an extra line
+# under its text, and optionally a QR or DataMatrix code of that serial left
+# of the text (label_layout makes room for it). The codes are encoded here,
+# with no network.
+#
+#   serials = LabelSerials("NHM-", start=1201, digits=6, code="datamatrix")
+#   generate_label_pdf_stream(path, max_width, blocks, serials=serials)
+#
+# Encoding a code from scratch is slow in Python (ReportLab's QR encoder takes
+# 3-7 ms a code, several minutes for 100k labels). But within one symbol size
+# every module is an XOR of constant patterns (finders, timing, format, mask)
+# and of the bits of the data codewords: Reed-Solomon is linear over GF(2^8)
+# and placement is a fixed permutation. So a CodeSymbol encodes the empty
+# symbol once, then the module pattern of each (codeword position, value) it
+# meets, as rows of bits in one int; a code is the XOR of one cached pattern
+# per data codeword, already laid out as the rows of a 1-bit image. Each copy
+# is drawn as a small inline image mask, so the page carries only its bits.
+
+import re
+
+from reportlab.graphics.barcode import qrencoder
+from reportlab.lib.rl_accel import fp_str
+
+from label_layout import compute_layout
+from label_metrics import get_metrics
+
+CODE_TYPES = ("qr", "datamatrix")
+QR_LEVELS = {"L": qrencoder.QRErrorCorrectLevel.L, "M": qrencoder.QRErrorCorrectLevel.M,
+             "Q": qrencoder.QRErrorCorrectLevel.Q, "H": qrencoder.QRErrorCorrectLevel.H}
+QR_MAX_VERSION = 10
+MIN_MODULE = 0.425  # points (0.15 mm); smaller modules do not print reliably
+
+class CodeSymbol:
+    # One symbol size of a 2D code. Subclasses give the data codewords of a
+    # payload (codewords) and the module rows of a set of data codewords
+    # (_reference, the slow full encoding; used only to fill the caches).
+    quiet_zone = 0  # light modules needed around the symbol
+
+    def __init__(self, size, capacity):
+        self.size = size          # modules per side
+        self.capacity = capacity  # data codewords
+        self._row_bits = (size + 7) // 8 * 8
+        self._bytes = self._row_bits // 8 * size
+        self._base = None
+        self._bit_patterns = [None] * capacity
+        self._patterns = [{} for _ in range(capacity)]
+
+    def _pack(self, rows):
+        value = 0
+        for row in rows:
+            bits = 0
+            for dark in row:
+                bits = bits << 1 | bool(dark)
+            value = value << self._row_bits | bits << (self._row_bits - self.size)
+        return value
+
+    def _pattern(self, position, value):
+        # The modules that codeword `value` at `position` turns over
+        bits = self._bit_patterns[position]
+        if bits is None:
+            codewords = bytearray(self.capacity)
+            bits = []
+            for bit in range(8):
+                codewords[position] = 0x80 >> bit
+                bits.append(self._pack(self._reference(bytes(codewords))) ^ self._base)
+            self._bit_patterns[position] = bits
+        pattern = 0
+        for bit in range(8):
+            if value & (0x80 >> bit):
+                pattern ^= bits[bit]
+        self._patterns[position][value] = pattern
+        return pattern
+
+    def matrix(self, payload):
+        # The symbol as one int: rows top first, each padded to whole bytes,
+        # dark modules 1
+        if self._base is None:
+            self._base = self._pack(self._reference(bytes(self.capacity)))
+        matrix = self._base
+        patterns = self._patterns
+        for position, value in enumerate(self.codewords(payload)):
+            pattern = patterns[position].get(value)
+            if pattern is None:
+                pattern = self._pattern(position, value)
+            matrix ^= pattern
+        return matrix
+
+    def image_data(self, payload):
+        # The rows of a 1-bit image of the symbol, as for an image mask
+        return self.matrix(payload).to_bytes(self._bytes, "big")
+
+    def rows(self, payload):
+        # The symbol as rows of booleans (dark), top first
+        data = self.image_data(payload)
+        step = self._row_bits // 8
+        return [[bool(data[r * step + c // 8] & (0x80 >> c % 8)) for c in range(self.size)]
+                for r in range(self.size)]
+
+# ---------- QR ----------
+class _BitBuffer:
+    # Just enough of qrencoder.QRBitBuffer for the QR data classes to write
+    # into, collected in an int instead of bit by bit in a list
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def put(self, num, length):
+        self.value = self.value << length | num & ((1 << length) - 1)
+        self.length += length
+
+    def putBit(self, bit):
+        self.put(int(bool(bit)), 1)
+
+    def getLengthInBits(self):
+        return self.length
+
+def _qr_segment(payload):
+    # The densest QR mode that holds the payload
+    for mode in (qrencoder.QRNumber, qrencoder.QRAlphaNum):
+        if mode.valid(payload):
+            return mode(payload)
+    return qrencoder.QR8bitByte(payload)
+
+class QRSymbol(CodeSymbol):
+    quiet_zone = 4
+
+    def __init__(self, version, level="M", mask=0):
+        self.version = version
+        self.level = level
+        self.mask = mask
+        self._blocks = qrencoder.QRRSBlock.getRSBlocks(version, QR_LEVELS[level])
+        super().__init__(version * 4 + 17, sum(block.dataCount for block in self._blocks))
+
+    @classmethod
+    def for_payload(cls, payload, level="M"):
+        # The smallest version that holds payload, with the mask that suits it
+        # best (the mask is fixed per symbol, any mask reads the same)
+        if level not in QR_LEVELS:
+            raise ValueError(f"QR error correction must be one of {', '.join(QR_LEVELS)}, not {level!r}")
+        for version in range(1, QR_MAX_VERSION + 1):
+            symbol = cls(version, level)
+            try:
+                symbol.codewords(payload)
+            except ValueError:
+                continue
+            qr = qrencoder.QRCode(version, QR_LEVELS[level])
+            qr.addData(_qr_segment(payload))
+            return cls(version, level, qr.getBestMaskPattern())
+        raise ValueError(f"{payload!r} is too long for a QR code on a label")
+
+    def codewords(self, payload):
+        buffer = _BitBuffer()
+        _qr_segment(payload).write(buffer, self.version)
+        bits = self.capacity * 8
+        if buffer.length > bits:
+            raise ValueError(f"{payload!r} does not fit a version {self.version} QR code")
+        value = buffer.value << min(4, bits - buffer.length)  # terminator
+        length = min(bits, buffer.length + 4)
+        value <<= -length % 8
+        length += -length % 8
+        data = value.to_bytes(length // 8, "big")
+        pads = self.capacity - len(data)
+        return data + bytes((qrencoder.QRCode.PAD0, qrencoder.QRCode.PAD1)) * (pads // 2) + \
+            bytes((qrencoder.QRCode.PAD0,)) * (pads % 2)
+
+    def _reference(self, codewords):
+        buffer = qrencoder.QRBitBuffer()
+        buffer.buffer = list(codewords)
+        qr = qrencoder.QRCode(self.version, QR_LEVELS[self.level])
+        qr.dataCache = qrencoder.QRCode.createBytes(buffer, self._blocks)
+        qr.makeImpl(False, self.mask)
+        return qr.modules
+
+# ---------- DataMatrix (ECC 200, square) ----------
+# size: (data codewords, error correction codewords); one Reed-Solomon block
+DATAMATRIX_SIZES = {10: (3, 5), 12: (5, 7), 14: (8, 10), 16: (12, 12), 18: (18, 14), 20: (22, 18),
+                    22: (30, 20), 24: (36, 24), 26: (44, 28), 32: (62, 36), 36: (86, 42),
+                    40: (114, 48), 44: (144, 56)}
+_ASCII_TOKENS = re.compile(r"\d\d|[\s\S]")  # digit pairs, else single characters
+
+def _gf_tables(polynomial):
+    exp = [0] * 510
+    log = [0] * 256
+    value = 1
+    for i in range(255):
+        exp[i] = exp[i + 255] = value
+        log[value] = i
+        value <<= 1
+        if value & 0x100:
+            value ^= polynomial
+    return exp, log
+
+_DM_EXP, _DM_LOG = _gf_tables(0x12D)
+
+def _dm_error_codewords(data, count):
+    # Reed-Solomon over GF(256)/0x12D with generator roots a^1 .. a^count
+    generator = [1]
+    for i in range(1, count + 1):
+        root = _DM_EXP[i]
+        product = generator + [0]
+        for j, coefficient in enumerate(generator):
+            if coefficient:
+                product[j + 1] ^= _DM_EXP[_DM_LOG[coefficient] + _DM_LOG[root]]
+        generator = product
+    remainder = [0] * count
+    for value in data:
+        factor = value ^ remainder[0]
+        remainder = remainder[1:] + [0]
+        if factor:
+            for j in range(count):
+                if generator[j + 1]:
+                    remainder[j] ^= _DM_EXP[_DM_LOG[generator[j + 1]] + _DM_LOG[factor]]
+    return remainder
+
+def _dm_placement(nrow, ncol):
+    # ECC 200 module placement: for each module of the nrow x ncol mapping
+    # matrix, (codeword index, bit mask), or True/False for the fixed corner
+    array = [[None] * ncol for _ in range(nrow)]
+
+    def module(row, col, index, bit):
+        if row < 0:
+            row += nrow
+            col += 4 - (nrow + 4) % 8
+        if col < 0:
+            col += ncol
+            row += 4 - (ncol + 4) % 8
+        array[row][col] = (index, 0x80 >> (bit - 1))
+
+    def shape(index, places):
+        for bit, (row, col) in enumerate(places, 1):
+            module(row, col, index, bit)
+
+    def utah(row, col, index):
+        shape(index, [(row - 2, col - 2), (row - 2, col - 1), (row - 1, col - 2), (row - 1, col - 1),
+                      (row - 1, col), (row, col - 2), (row, col - 1), (row, col)])
+
+    corners = {
+        1: lambda: [(nrow - 1, 0), (nrow - 1, 1), (nrow - 1, 2), (0, ncol - 2), (0, ncol - 1), (1, ncol - 1),
+                    (2, ncol - 1), (3, ncol - 1)],
+        2: lambda: [(nrow - 3, 0), (nrow - 2, 0), (nrow - 1, 0), (0, ncol - 4), (0, ncol - 3), (0, ncol - 2),
+                    (0, ncol - 1), (1, ncol - 1)],
+        3: lambda: [(nrow - 3, 0), (nrow - 2, 0), (nrow - 1, 0), (0, ncol - 2), (0, ncol - 1), (1, ncol - 1),
+                    (2, ncol - 1), (3, ncol - 1)],
+        4: lambda: [(nrow - 1, 0), (nrow - 1, ncol - 1), (0, ncol - 3), (0, ncol - 2), (0, ncol - 1),
+                    (1, ncol - 3), (1, ncol - 2), (1, ncol - 1)],
+    }
+    index = 0
+    row, col = 4, 0
+    while True:
+        if row == nrow and col == 0:
+            shape(index, corners[1]())
+            index += 1
+        if row == nrow - 2 and col == 0 and ncol % 4:
+            shape(index, corners[2]())
+            index += 1
+        if row == nrow - 2 and col == 0 and ncol % 8 == 4:
+            shape(index, corners[3]())
+            index += 1
+        if row == nrow + 4 and col == 2 and not ncol % 8:
+            shape(index, corners[4]())
+            index += 1
+        while True:  # up and to the right
+            if row < nrow and col >= 0 and array[row][col] is None:
+                utah(row, col, index)
+                index += 1
+            row -= 2
+            col += 2
+            if not (row >= 0 and col < ncol):
+                break
+        row += 1
+        col += 3
+        while True:  # down and to the left
+            if row >= 0 and col < ncol and array[row][col] is None:
+                utah(row, col, index)
+                index += 1
+            row += 2
+            col -= 2
+            if not (row < nrow and col >= 0):
+                break
+        row += 3
+        col += 1
+        if not (row < nrow or col < ncol):
+            break
+    if array[nrow - 1][ncol - 1] is None:
+        array[nrow - 1][ncol - 1] = array[nrow - 2][ncol - 2] = True
+        array[nrow - 1][ncol - 2] = array[nrow - 2][ncol - 1] = False
+    return array
+
+class DataMatrixSymbol(CodeSymbol):
+    quiet_zone = 1
+
+    def __init__(self, size):
+        if size not in DATAMATRIX_SIZES:
+            raise ValueError(f"DataMatrix size must be one of {', '.join(map(str, DATAMATRIX_SIZES))}, not {size}")
+        data, self.error_count = DATAMATRIX_SIZES[size]
+        super().__init__(size, data)
+        self.regions = 1 if size < 32 else 2  # data regions per side
+        self.region_size = size // self.regions - 2
+        mapping = self.region_size * self.regions
+        self._placement = _dm_placement(mapping, mapping)
+
+    @classmethod
+    def for_payload(cls, payload):
+        length = len(cls.encode_ascii(payload))
+        for size, (data, _) in DATAMATRIX_SIZES.items():
+            if length <= data:
+                return cls(size)
+        raise ValueError(f"{payload!r} is too long for a DataMatrix code on a label")
+
+    @staticmethod
+    def encode_ascii(payload):
+        # ASCII encodation: digit pairs take one codeword, Latin-1 above 127
+        # two (Upper Shift)
+        codewords = bytearray()
+        for token in _ASCII_TOKENS.findall(payload):
+            if len(token) == 2:
+                codewords.append(130 + int(token))
+                continue
+            code = ord(token)
+            if code < 128:
+                codewords.append(code + 1)
+            elif code < 256:
+                codewords += bytes((235, code - 127))
+            else:
+                raise ValueError(f"{token!r} cannot be put in a DataMatrix code (Latin-1 only)")
+        return codewords
+
+    def codewords(self, payload):
+        codewords = self.encode_ascii(payload)
+        if len(codewords) > self.capacity:
+            raise ValueError(f"{payload!r} does not fit a {self.size}x{self.size} DataMatrix code")
+        if len(codewords) < self.capacity:
+            codewords.append(129)
+        while len(codewords) < self.capacity:
+            pad = 129 + (149 * (len(codewords) + 1)) % 253 + 1
+            codewords.append(pad - 254 if pad > 254 else pad)
+        return bytes(codewords)
+
+    def _reference(self, codewords):
+        codewords = list(codewords) + _dm_error_codewords(codewords, self.error_count)
+        block = self.region_size + 2
+        rows = []
+        for row in range(self.size):
+            region_row, r = divmod(row, block)
+            line = []
+            for col in range(self.size):
+                region_col, c = divmod(col, block)
+                if c == 0 or r == block - 1:
+                    dark = True                     # solid finder edges
+                elif r == 0 or c == block - 1:
+                    dark = (c if r == 0 else r) % 2 == (0 if r == 0 else 1)  # clock track
+                else:
+                    place = self._placement[region_row * self.region_size + r - 1][
+                        region_col * self.region_size + c - 1]
+                    if isinstance(place, bool):
+                        dark = place
+                    else:
+                        dark = bool(codewords[place[0]] & place[1])
+                line.append(dark)
+            rows.append(line)
+        return rows
+
+# ---------- Serials ----------
+_symbols = {}
+
+def code_symbol(code, payload):
+    # The symbol for payloads like this one, shared by every job in the
+    # process, so the patterns it has cached carry over. Payloads of one
+    # length and QR mode (number, alphanumeric or byte) fit the same version.
+    if code == "qr":
+        key = ("qr", len(payload), type(_qr_segment(payload)))
+        make = lambda: QRSymbol.for_payload(payload)
+    else:
+        key = ("datamatrix", len(DataMatrixSymbol.encode_ascii(payload)))
+        make = lambda: DataMatrixSymbol.for_payload(payload)
+    if key not in _symbols:
+        _symbols[key] = make()
+    return _symbols[key]
+
+class LabelSerials:
+    def __init__(self, prefix="", start=1, digits=6, code=None):
+        if code is not None and code not in CODE_TYPES:
+            raise ValueError(f"Code must be one of {', '.join(CODE_TYPES)}, not {code!r}")
+        if int(start) < 0:
+            raise ValueError(f"Serials must start at 0 or more, not {start}")
+        if not 1 <= int(digits) <= 18:
+            raise ValueError(f"Serial digits must be from 1 to 18, not {digits}")
+        self.prefix = prefix
+        self.start = int(start)
+        self.digits = int(digits)
+        self.code = code
+
+    def serial(self, index):
+        # The serial of label copy `index` (0-based) of the job
+        return f"{self.prefix}{self.start + index:0{self.digits}d}"
+
+    def after(self, labels):
+        # The same serials, starting `labels` numbers later (for a job drawn
+        # in pieces)
+        return LabelSerials(self.prefix, self.start + labels, self.digits, self.code)
+
+    def seed_text(self):
+        # Every character the serial lines can use
+        return self.prefix + "0123456789"
+
+    def layout(self, max_width, lines_per_label, profile=None):
+        # The job's layout with the serial line (and code) added
+        return compute_layout(max_width, lines_per_label + 1, profile, with_code=self.code is not None)
+
+    def check_width(self, max_width, labels=None):
+        # ValueError if the serials (up to `labels` of them) are wider than
+        # the label lines
+        widest = self.serial(max(0, (labels or 1) - 1))
+        if len(widest) > max_width and get_metrics().cells(widest) > max_width:
+            raise ValueError(f"Serial {widest!r} is wider than the labels ({max_width} characters)")
+
+    def code_drawer(self, layout):
+        # A function (serial, x, y) -> the content stream operators that draw
+        # the code of serial for the label at x, y, or None without codes.
+        # The symbol is sized for serials of this many digits; one that
+        # outgrows it raises ValueError.
+        if self.code is None:
+            return None
+        symbol = code_symbol(self.code, self.prefix + "9" * self.digits)
+        module = layout["code_size"] / (symbol.size + 2 * symbol.quiet_zone)
+        if module < MIN_MODULE:
+            raise ValueError(f"A {symbol.size}x{symbol.size} {self.code} code is too small on labels this short "
+                             f"({module / 72 * 25.4:.2f} mm modules); use taller labels or a shorter serial")
+        side = symbol.size * module
+        dx = layout["code_x"] + symbol.quiet_zone * module
+        dy = layout["code_top"] - symbol.quiet_zone * module - side
+        image = f"cm BI /W {symbol.size} /H {symbol.size} /IM true /BPC 1 /D [1 0] /F /AHx ID "
+        image_data = symbol.image_data
+        starts = {}  # the operators up to the image data, per label slot
+
+        def draw(serial, x, y):
+            start = starts.get((x, y))
+            if start is None:
+                start = starts[x, y] = f"q {fp_str(side, 0, 0, side, x + dx, y + dy)} {image}"
+            return start + image_data(serial).hex() + "> EI Q"
+
+        return draw
@@ -0,0 +1,219 @@
+# Labels straight from tabular exports (CSV, TSV) through a label template.
+#
+# A template says which columns go on which label line, where the copy count
+# comes from and what happens to a line wider than max_width. It is a JSON
+# file:
+#
+#   {
+#     "max_width": 25,
+#     "count": "copies",                       # a column, or a fixed number (default 1)
+#     "lines": ["{state}: {county} Co.", "{locality}", "{lat}N,{lon}W",
+#               "{date}, {elevation}m", "{collector}"],
+#     "overflow": "truncate",                  # or "error"
+#     "delimiter": ","                         # default: tab for .tsv/.tab, else sniffed
+#   }
+#
+# Lines are str.format templates over the column names of the header row; a
+# blank count cell means one copy.
+# A line that comes out empty is left off the label, like a blank line in a
+# label file; widths are measured as printed (label_metrics). "truncate"
+# cuts a line that is too wide to fit, "error" stops at its row.
+#
+# TableImport reads the file row by row with the csv module and yields
+# LabelBlocks, so it can go straight into generate_label_pdf_stream without
+# a .txt in between and memory stays flat however many rows there are. Rows
+# that give the same lines as the row before are merged into one block.
+#
+#   template = load_template("specimens.json")
+#   pages, table = generate_label_pdf_from_table(output_path, "export.csv", template)
+#   table.rows, table.labels, table.truncated
+
+import csv
+import json
+import os
+import string
+from operator import itemgetter
+
+from label_layout import compute_layout
+from label_maker import LabelBlock, generate_label_pdf_stream
+from label_metrics import get_metrics
+from label_source import SNIFF_BYTES, text_encoding
+
+OVERFLOW_RULES = ("truncate", "error")
+TAB_EXTENSIONS = (".tsv", ".tab")
+TABLE_EXTENSIONS = (".csv",) + TAB_EXTENSIONS
+SNIFF_DELIMITERS = ",\t;|"
+LINE_SEPARATOR = "\x1f"  # ASCII unit separator, never in label text
+
+class LabelTemplate:
+    def __init__(self, lines, max_width, count=1, overflow="truncate", delimiter=None):
+        if not lines:
+            raise ValueError("Template has no lines")
+        if overflow not in OVERFLOW_RULES:
+            raise ValueError(f"Template overflow must be one of {', '.join(OVERFLOW_RULES)}, not {overflow!r}")
+        self.lines = list(lines)
+        self.max_width = int(max_width)
+        self.count = count
+        self.overflow = overflow
+        self.delimiter = delimiter
+        self._parsed = [list(string.Formatter().parse(line)) for line in self.lines]
+
+    @classmethod
+    def from_config(cls, config):
+        unknown = set(config) - {"lines", "max_width", "count", "overflow", "delimiter"}
+        if unknown:
+            raise ValueError(f"Template: unknown keys {', '.join(sorted(unknown))}")
+        if "max_width" not in config:
+            raise ValueError("Template needs max_width")
+        return cls(config.get("lines"), config["max_width"], config.get("count", 1),
+                   config.get("overflow", "truncate"), config.get("delimiter"))
+
+    @property
+    def lines_per_label(self):
+        return len(self.lines)
+
+    def fields(self):
+        # Column names the template uses, in order of first use
+        names = [name for parsed in self._parsed for _, name, _, _ in parsed if name is not None]
+        if isinstance(self.count, str):
+            names.append(self.count)
+        return list(dict.fromkeys(names))
+
+    def bind(self, header):
+        # (row -> list of label lines, {column name: index}) for this header.
+        # All lines are one format pattern, split again on LINE_SEPARATOR, so
+        # a row costs one format call however many lines the label has.
+        columns = {name.strip(): i for i, name in enumerate(header)}
+        missing = [name for name in self.fields() if name not in columns]
+        if missing:
+            raise ValueError(f"Template columns not in the file: {', '.join(missing)} "
+                             f"(have: {', '.join(columns)})")
+        names = []
+        patterns = []
+        for parsed in self._parsed:
+            pattern = ""
+            for literal, name, spec, conversion in parsed:
+                pattern += literal.replace("{", "{{").replace("}", "}}")
+                if name is not None:
+                    names.append(name)
+                    pattern += "{" + ("!" + conversion if conversion else "") + (":" + spec if spec else "") + "}"
+            patterns.append(pattern)
+        fill = LINE_SEPARATOR.join(patterns).format
+        if not names:
+            lines = fill().split(LINE_SEPARATOR)
+            return lambda row: list(lines), columns
+        if len(names) == 1:
+            index = columns[names[0]]
+            return lambda row: fill(row[index]).split(LINE_SEPARATOR), columns
+        get = itemgetter(*(columns[name] for name in names))
+        return lambda row: fill(*get(row)).split(LINE_SEPARATOR), columns
+
+def load_template(path):
+    with open(path, encoding="utf-8") as f:
+        return LabelTemplate.from_config(json.load(f))
+
+def table_delimiter(path, sample, template):
+    if template.delimiter:
+        return template.delimiter
+    if os.path.splitext(path)[1].lower() in TAB_EXTENSIONS:
+        return "\t"
+    try:
+        return csv.Sniffer().sniff(sample, SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+class TableImport:
+    def __init__(self, path, template):
+        self.path = path
+        self.template = template
+        self.max_width = template.max_width
+        self.lines_per_label = template.lines_per_label
+        self.rows = 0        # data rows read
+        self.skipped = 0     # rows with a count of 0
+        self.truncated = 0   # lines cut to max_width
+        self.labels = 0
+
+    def __iter__(self):
+        template = self.template
+        max_width = self.max_width
+        metrics = get_metrics()
+        cells = metrics.cells
+        truncate = template.overflow == "truncate"
+        with open(self.path, encoding=text_encoding(self.path), newline="") as f:
+            sample = f.read(SNIFF_BYTES)
+            f.seek(0)
+            reader = csv.reader(f, delimiter=table_delimiter(self.path, sample, template))
+            header = next(reader, None)
+            if header is None:
+                return
+            make_lines, columns = template.bind(header)
+            width = len(header)
+            count = template.count
+            count_column = columns[count] if isinstance(count, str) else None
+            if count_column is None and int(count) < 0:
+                raise ValueError(f"Template count must be 0 or more, not {count!r}")
+            pending, pending_count = None, 0
+            for number, row in enumerate(reader, 2):
+                if not row:
+                    continue  # blank line
+                if len(row) < width:
+                    row += [""] * (width - len(row))
+                self.rows += 1
+                if count_column is not None:
+                    value = row[count_column].strip()
+                    if not value:
+                        copies = 1  # blank cell
+                    elif value.isdigit():
+                        copies = int(value)
+                    else:
+                        raise ValueError(f"Row {number}: count {value!r} is not a whole number")
+                else:
+                    copies = int(count)
+                if not copies:
+                    self.skipped += 1
+                    continue
+                lines = [line.strip() for line in make_lines(row)]
+                if "" in lines:
+                    lines = [line for line in lines if line]
+                    if not lines:
+                        self.skipped += 1
+                        continue
+                if max(map(len, lines)) > max_width:
+                    for i, line in enumerate(lines):
+                        if len(line) > max_width and cells(line) > max_width:
+                            if not truncate:
+                                raise ValueError(f"Row {number}: {line!r} is {cells(line):g} characters wide, "
+                                                 f"the maximum is {max_width}")
+                            lines[i] = metrics.truncate(line, max_width).rstrip()
+                            self.truncated += 1
+                lines = tuple(lines)
+                self.labels += copies
+                if lines == pending:
+                    pending_count += copies
+                    continue
+                if pending is not None:
+                    yield LabelBlock(pending, pending_count)
+                pending, pending_count = lines, copies
+            if pending is not None:
+                yield LabelBlock(pending, pending_count)
+
+# Renders a table in one streaming pass; returns (pages, the TableImport
+# with its row, label and truncation counts). pdf_options as for
+# generate_label_pdf_stream.
+def generate_label_pdf_from_table(output_path, table_path, template, profile=None, **pdf_options):
+    table = TableImport(table_path, template)
+    pages = generate_label_pdf_stream(output_path, table.max_width, table, lines_per_label=table.lines_per_label,
+                                      profile=profile, **pdf_options)
+    return pages, table
+
+# Pages the table would print on, from one pass over it without drawing;
+# returns (pages, the TableImport). serials: as for generate_label_pdf_stream
+def estimate_table_pages(table_path, template, profile=None, serials=None):
+    table = TableImport(table_path, template)
+    for _ in table:
+        pass
+    if serials is not None:
+        layout = serials.layout(table.max_width, table.lines_per_label, profile)
+    else:
+        layout = compute_layout(table.max_width, table.lines_per_label, profile)
+    return -(-table.labels // layout["labels_per_page"]), table
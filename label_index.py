@@ -0,0 +1,128 @@
+# Index of the distinct label blocks in a job.
+#
+# Collector files often repeat a block with separate counts (the same
+# locality and date typed in again further down). BlockIndex keys every block
+# on its lines and keeps one entry per distinct block, in order of first
+# appearance, with the total copies and the source line of each occurrence.
+# merged_blocks() is the job with every distinct block once, so the work
+# downstream (layout, forms, the render cache) is done per unique block and
+# the copies of a block print together. report() tells the user what would
+# be merged, and can also group the distinct blocks by one of their lines
+# (e.g. the locality line) to show how the labels are spread.
+#
+#   max_width, label_blocks, index, error_line = index_label_file(path)
+#   print(index.report(group_line=1))
+#   generate_label_pdf(output_path, max_width, index.merged_blocks())
+
+from label_maker import LabelBlock, LabelFileReader
+
+class IndexEntry:
+    __slots__ = ("lines", "count", "source_lines")
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.count = 0
+        self.source_lines = []  # count line of each occurrence, None if unknown
+
+    def occurrences(self):
+        return len(self.source_lines)
+
+class BlockIndex:
+    def __init__(self, label_blocks=(), source_lines=None):
+        self._entries = {}
+        self.blocks = 0
+        self.labels = 0
+        if source_lines is None:
+            for block in label_blocks:
+                self.add(block)
+        else:
+            for block, line in zip(label_blocks, source_lines):
+                self.add(block, line)
+
+    def add(self, block, source_line=None):
+        lines = tuple(block["lines"])
+        entry = self._entries.get(lines)
+        if entry is None:
+            entry = self._entries[lines] = IndexEntry(lines)
+        entry.count += block["count"]
+        entry.source_lines.append(source_line)
+        self.blocks += 1
+        self.labels += block["count"]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def duplicates(self):
+        # Entries that occur more than once in the file
+        return [entry for entry in self if entry.occurrences() > 1]
+
+    def merged_blocks(self):
+        return [LabelBlock(entry.lines, entry.count) for entry in self]
+
+    def groups(self, group_line):
+        # {key: [entries]} by line group_line (1-based) of each block, in
+        # order of first appearance; see group_key
+        groups = {}
+        for entry in self:
+            key = group_key(entry.lines, group_line)
+            groups.setdefault(key, []).append(entry)
+        return groups
+
+    def summary(self):
+        duplicates = self.duplicates()
+        return {
+            "blocks": self.blocks,
+            "unique_blocks": len(self),
+            "labels": self.labels,
+            "repeated_blocks": len(duplicates),
+            "merged_blocks": self.blocks - len(self),
+        }
+
+    def report(self, group_line=None, limit=20):
+        # Plain-text report: what merging would do, the repeated blocks with
+        # their source lines, and optionally the per-group totals
+        summary = self.summary()
+        out = [f"{summary['blocks']} blocks, {summary['unique_blocks']} unique, {summary['labels']} labels"]
+        duplicates = self.duplicates()
+        if duplicates:
+            out.append(f"{summary['merged_blocks']} blocks repeat an earlier block with the same lines:")
+            for entry in duplicates[:limit]:
+                lines = ", ".join(str(line) for line in entry.source_lines if line is not None)
+                where = f" (lines {lines})" if lines else ""
+                out.append(f"  {entry.occurrences()}x {entry.lines[0]}{where} -> {entry.count} copies")
+            if len(duplicates) > limit:
+                out.append(f"  ... and {len(duplicates) - limit} more")
+        else:
+            out.append("No repeated blocks.")
+        if group_line is not None:
+            out.append(f"By line {group_line}:")
+            groups = sorted(self.groups(group_line).items(), key=lambda item: -sum(e.count for e in item[1]))
+            for key, entries in groups[:limit]:
+                copies = sum(entry.count for entry in entries)
+                out.append(f"  {copies:>7} labels  {len(entries):>4} blocks  {key or '(none)'}")
+            if len(groups) > limit:
+                out.append(f"  ... and {len(groups) - limit} more")
+        return "\n".join(out)
+
+def group_key(lines, group_line):
+    # Line group_line (1-based) with runs of spaces collapsed and trailing
+    # dot padding cut to one dot, so "MONT: Lincoln Co....." and
+    # "MONT: Lincoln Co." group together; "" if the block is shorter
+    if group_line > len(lines):
+        return ""
+    key = " ".join(lines[group_line - 1].split())
+    trimmed = key.rstrip(". ")
+    return trimmed + "." if "." in key[len(trimmed):] else trimmed
+
+def index_label_file(filepath):
+    # parse_label_file plus a BlockIndex of the blocks with their file lines
+    reader = LabelFileReader(filepath)
+    label_blocks = []
+    index = BlockIndex()
+    for block in reader:
+        label_blocks.append(block)
+        index.add(block, reader.block_line)
+    return reader.max_width, label_blocks, index, reader.error_line
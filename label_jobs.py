@@ -0,0 +1,81 @@
+# Runs one render (or other long task) at a time on a worker thread for the GUI.
+#
+# Tk may only be used from the main thread, so the worker never calls into
+# the UI: it puts progress and the outcome on a queue that the UI drains with
+# poll() from an `after` timer. cancel() sets an event that is checked at
+# every progress call (after every page of a render), so a cancelled job
+# stops cleanly at the next page boundary.
+
+import queue
+import threading
+import time
+
+class JobCancelled(Exception):
+    pass
+
+class BackgroundJob:
+    def __init__(self, work):
+        # work(progress) does the job, calling progress(value) now and then,
+        # and returns the job's result
+        self.work = work
+        self.events = queue.Queue()
+        self.started = None
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, value):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.events.put(("progress", value))
+
+    def _run(self):
+        try:
+            result = self.work(self._progress)
+        except JobCancelled:
+            self.events.put(("cancelled", None))
+        except Exception as e:
+            self.events.put(("error", e))
+        else:
+            self.events.put(("done", result))
+
+    def poll(self):
+        # Events queued since the last call, oldest first
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+# A render: work(progress) calls progress(pages_written) after every page and
+# the progress events carry the page and label counts, rate and ETA
+class RenderJob(BackgroundJob):
+    def __init__(self, work, total_labels, labels_per_page):
+        super().__init__(work)
+        self.total_labels = total_labels
+        self.labels_per_page = labels_per_page
+        self.total_pages = -(-total_labels // labels_per_page)
+
+    def _progress(self, pages_done):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        labels_done = min(pages_done * self.labels_per_page, self.total_labels)
+        elapsed = time.perf_counter() - self.started
+        rate = labels_done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total_labels - labels_done) / rate if rate else None
+        self.events.put(("progress", {
+            "pages": pages_done,
+            "total_pages": self.total_pages,
+            "labels": labels_done,
+            "total_labels": self.total_labels,
+            "labels_per_second": rate,
+            "eta_seconds": eta,
+        }))
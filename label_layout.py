@@ -0,0 +1,187 @@
+# Label layout: where every label copy goes, separated from drawing.
+#
+# Labels fill a page column by column, top to bottom, so the page, x and y of
+# copy number k of a job follow from k alone. A LayoutPlan only stores where
+# each block's run of copies starts, which is enough to answer page counts,
+# per-page contents and positions without rendering anything.
+#
+# The page and type settings come from a stock profile (label_stock); the
+# layout of a profile, max width and label height is computed once and then
+# served from a cache. Columns are wide enough for max_width cells of the
+# font's real advance at the size the type is drawn (label_metrics). With a
+# 2D code (label_codes) each column also holds a square as tall as the label
+# text, left of it: the text moves right by its size, so label x and y stay
+# the first baseline.
+
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+from label_metrics import get_metrics
+from label_stock import DEFAULT_PROFILE
+
+TYPE_SIZE_BOOST = 0.5  # the type is drawn this much larger than the profile's font size
+LABEL_GUTTER = 1.0     # least space between the widest line and the next column
+CODE_RISE = 0.7        # a code's top edge is this many ems (of the stretched type) above the first baseline
+
+# Page geometry for a job, shared by every renderer. The dict is shared by
+# every caller with the same arguments, so it must not be modified.
+def compute_layout(max_width, lines_per_label, profile=None, with_code=False):
+    return _compute_layout(max_width, lines_per_label, profile or DEFAULT_PROFILE, with_code)
+
+@lru_cache(maxsize=256)
+def _compute_layout(max_width, lines_per_label, profile, with_code=False):
+    font_size = profile.font_size
+    type_size = font_size + TYPE_SIZE_BOOST
+    line_spacing = font_size + profile.line_gap
+    # The old 0.6 em of the undrawn font size plus 10 pt, unless a full line
+    # at the drawn size would reach into the next column (widths over ~30)
+    column_width = max(max_width * (font_size * 0.6) + 10,
+                       max_width * get_metrics().cell_width(type_size) + LABEL_GUTTER)
+    # The code box: left of the text, from the top of the first line down
+    # one line spacing per line
+    code_size = lines_per_label * line_spacing if with_code else 0.0
+    column_width += code_size
+
+    page_width, page_height = profile.pagesize
+    top_margin = profile.top_margin
+    bottom_margin = profile.bottom_margin
+    left_margin = profile.left_margin
+
+    usable_height = page_height - top_margin - bottom_margin
+    height_per_label = lines_per_label * line_spacing + profile.label_gap
+
+    labels_per_column = int(usable_height // height_per_label)
+    num_columns = int((page_width - left_margin) // column_width)
+    if labels_per_column < 1 or num_columns < 1:
+        raise ValueError(f"A {lines_per_label}-line label of width {max_width} does not fit on the page")
+
+    return {
+        "font_size": font_size,
+        "type_size": type_size,
+        "line_spacing": line_spacing,
+        "stretch": profile.stretch,
+        "column_width": column_width,
+        "code_x": -code_size,
+        "code_top": type_size * profile.stretch * CODE_RISE,
+        "code_size": code_size,
+        "page_width": page_width,
+        "page_height": page_height,
+        "top_margin": top_margin,
+        "left_margin": left_margin + code_size,  # where the text of the first column starts
+        "height_per_label": height_per_label,
+        "labels_per_column": labels_per_column,
+        "num_columns": num_columns,
+        "labels_per_page": labels_per_column * num_columns,
+    }
+
+# Tallest block of a job, in lines: the label height the layout is made for
+def max_lines_per_label(label_blocks):
+    return max((len(block["lines"]) for block in label_blocks), default=1)
+
+# (page, x, y) of label copy number `index` (0-based, across the whole job)
+def label_position(layout, index):
+    page, slot = divmod(index, layout["labels_per_page"])
+    column, row = divmod(slot, layout["labels_per_column"])
+    x = layout["left_margin"] + column * layout["column_width"]
+    y = layout["page_height"] - layout["top_margin"] - row * layout["height_per_label"]
+    return page, x, y
+
+class LayoutPlan:
+    # With serials (label_codes.LabelSerials) the labels have its serial line
+    # and code
+    def __init__(self, max_width, label_blocks, lines_per_label=None, profile=None, serials=None):
+        self.max_width = max_width
+        self.label_blocks = label_blocks
+        if lines_per_label is None:
+            lines_per_label = max_lines_per_label(label_blocks)
+        self.lines_per_label = lines_per_label
+        self.profile = profile or DEFAULT_PROFILE
+        if serials is not None:
+            self.layout = serials.layout(max_width, lines_per_label, self.profile)
+        else:
+            self.layout = compute_layout(max_width, lines_per_label, self.profile)
+
+        # Index of the first copy of each block; copies are run-length encoded
+        self.block_starts = array("q")
+        total = 0
+        for block in label_blocks:
+            self.block_starts.append(total)
+            total += block["count"]
+        self.total_labels = total
+
+    @property
+    def labels_per_page(self):
+        return self.layout["labels_per_page"]
+
+    @property
+    def total_pages(self):
+        return -(-self.total_labels // self.labels_per_page)
+
+    def position(self, index):
+        return label_position(self.layout, index)
+
+    def block_index(self, index):
+        # Block that label copy `index` belongs to
+        return bisect_right(self.block_starts, index) - 1
+
+    def block_pages(self, block_index):
+        # First and last page (inclusive) holding copies of a block
+        start = self.block_starts[block_index]
+        count = self.label_blocks[block_index]["count"]
+        if count <= 0:
+            return None
+        return start // self.labels_per_page, (start + count - 1) // self.labels_per_page
+
+    def page_label_range(self, page):
+        start = page * self.labels_per_page
+        return start, min(start + self.labels_per_page, self.total_labels)
+
+    def page_runs(self, page):
+        # (block index, copies) for each run of copies on one page, in order
+        start, stop = self.page_label_range(page)
+        runs = []
+        if start >= stop:
+            return runs
+        i = self.block_index(start)
+        while start < stop:
+            block_stop = self.block_starts[i] + self.label_blocks[i]["count"]
+            copies = min(block_stop, stop) - start
+            if copies > 0:
+                runs.append((i, copies))
+                start += copies
+            i += 1
+        return runs
+
+    def iter_page(self, page):
+        # (block, x, y) for every label on one page, without walking earlier pages
+        index = self.page_label_range(page)[0]
+        for i, copies in self.page_runs(page):
+            for _ in range(copies):
+                _, x, y = label_position(self.layout, index)
+                yield self.label_blocks[i], x, y
+                index += 1
+
+    def iter_placements(self):
+        # (block index, page, x, y) for every label copy, in drawing order
+        index = 0
+        for i, block in enumerate(self.label_blocks):
+            for _ in range(block["count"]):
+                page, x, y = label_position(self.layout, index)
+                yield i, page, x, y
+                index += 1
+
+    def summary(self):
+        # Paper usage for the job, computed from the block counts only
+        pages = self.total_pages
+        empty_slots = pages * self.labels_per_page - self.total_labels
+        return {
+            "blocks": len(self.label_blocks),
+            "labels": self.total_labels,
+            "pages": pages,
+            "labels_per_page": self.labels_per_page,
+            "lines_per_label": self.lines_per_label,
+            "labels_per_column": self.layout["labels_per_column"],
+            "columns": self.layout["num_columns"],
+            "empty_slots": empty_slots,
+        }
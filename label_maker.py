@@ -1,101 +1,470 @@
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfdoc
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+import io
+import struct
+import sys
 import os
+import time
+import zlib
 
-def parse_label_file(filepath): # this function is perfect
-    with open(filepath, "r", encoding="utf-8") as file:
-        lines = [line.strip() for line in file if line.strip() != ""]
-
-    max_width = int(lines[0])
-    label_blocks = []
-    current_block = []
-    i = 1  # start after max width
-    count = -1
-    ERROR = False
-
-    while i < len(lines):
-        if lines[i].isdigit():
-            if current_block:
-                label_blocks.append({
-                    "lines": current_block,
-                    "count": count
-                })
-                current_block = []
-            count = int(lines[i])
-        else:
-            if count == -1:
-                return max_width, label_blocks, 1
-            if len(lines[i]) > max_width:
-                return max_width, label_blocks, i + 1
-            current_block.append(lines[i])
-        i += 1
-
-    if current_block:
-        label_blocks.append({
-            "lines": current_block,
-            "count": count
-        })
-        current_block = []
-    return max_width, label_blocks, -1
+from label_layout import compute_layout, label_position, max_lines_per_label
+from label_metrics import get_metrics
+from label_source import SNIFF_BYTES, text_codec
+from label_stock import DEFAULT_PROFILE
+
+# Helper to support PyInstaller font packaging
+def resource_path(relative_path):
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, relative_path)
+
+FONT_NAME = "LiberationMonoRegular"
+_font_registered = False
+
+def register_label_font():
+    global _font_registered
+    if not _font_registered:
+        pdfmetrics.registerFont(TTFont(FONT_NAME, resource_path("LiberationMono-Regular.ttf")))
+        _font_registered = True
 
-def generate_label_pdf(output_path, max_width, label_blocks):
-    font_size = 2.9
-    line_spacing = font_size + 0.6
-    column_width = max_width * (font_size * 0.6) + 10
+# One parsed label block: the text lines and how many copies to print.
+# Blocks also answer block["lines"] / block["count"] like the dicts the
+# parser used to return.
+class LabelBlock:
+    __slots__ = ("lines", "count")
 
-    page_width, page_height = A4
-    top_margin = 10.3 * mm
-    bottom_margin = 11.3 * mm
-    left_margin = 0 * mm
+    def __init__(self, lines, count):
+        self.lines = lines
+        self.count = count
 
-    usable_height = page_height - top_margin - bottom_margin
-    lines_per_label = max(len(block["lines"]) for block in label_blocks)
-    height_per_label = lines_per_label * line_spacing + 2.5  # or +1, or +0
+    def __getitem__(self, key):
+        if key not in LabelBlock.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
 
-    labels_per_column = int(usable_height // height_per_label)
-    num_columns = int((page_width - left_margin) // column_width)
+    def __eq__(self, other):
+        return isinstance(other, LabelBlock) and self.lines == other.lines and self.count == other.count
+
+    def __repr__(self):
+        return f"LabelBlock(lines={self.lines!r}, count={self.count})"
+
+# Reads a label file one line at a time and yields LabelBlock records as each
+# block ends, so the whole file is never held in memory. Line numbers count
+# non-blank lines, the first line being the max width. If iteration stops on
+# a bad line, error_line is set (1 for a label line before any count).
+# file_line is the last line read, counted in the file itself (blank lines
+# included), so after an error it points at the bad line; while a block is
+# being yielded, block_line is the file line of its count. The encoding
+# (UTF-8, or UTF-16 as exported by Excel) is detected from the first bytes.
+# Line width is measured in printed cells (label_metrics), so an accent
+# typed as a separate combining mark does not count.
+class LabelFileReader:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.error_line = -1
+        self.block_line = None
+        self.file_line = 0
+        self.encoding = None  # detected on the first read
+        self.max_width = int(next(self._lines(), ""))
+
+    def _lines(self):
+        with open(self.filepath, "rb") as raw:
+            if self.encoding is None:
+                self.encoding = text_codec(raw.peek(SNIFF_BYTES)[:SNIFF_BYTES])
+            file = io.TextIOWrapper(raw, encoding=self.encoding)
+            for number, line in enumerate(file, 1):
+                line = line.strip()
+                if line:
+                    self.file_line = number
+                    yield line
+
+    def __iter__(self):
+        self.error_line = -1
+        max_width = self.max_width
+        cells = get_metrics().cells
+        current_block = []
+        count = -1
+        count_line = None
+        lines = self._lines()
+        next(lines)  # skip max width
+        for i, line in enumerate(lines, 2):
+            if line.isdigit():
+                if current_block:
+                    self.block_line = count_line
+                    yield LabelBlock(tuple(current_block), count)
+                    current_block = []
+                count = int(line)
+                count_line = self.file_line
+            else:
+                if count == -1:
+                    self.error_line = 1
+                    return
+                if len(line) > max_width and cells(line) > max_width:
+                    self.error_line = i
+                    return
+                current_block.append(line)
 
-    c = canvas.Canvas(output_path, pagesize=A4)
+        if current_block:
+            self.block_line = count_line
+            yield LabelBlock(tuple(current_block), count)
+
+def parse_label_file(filepath): # this function is perfect
+    reader = LabelFileReader(filepath)
+    label_blocks = list(reader)
+    return reader.max_width, label_blocks, reader.error_line
+
+# stats: optional label_stats.RenderStats, filled with the font setup and
+# draw/showPage times, per-page timings and label/line/state push/text object counts
+# profile: the label_stock.StockProfile to lay out on (default: a4); the
+# canvas must have its page size
+# serials: optional label_codes.LabelSerials; each copy then gets the next
+# serial as a line under its text, and its code if the serials have one
+def draw_label_blocks(c, max_width, label_blocks, lines_per_label=None, use_forms=False, stats=None,
+                      profile=None, serials=None):
+    if lines_per_label is None:
+        lines_per_label = max_lines_per_label(label_blocks)
+    if serials is not None:
+        layout = serials.layout(max_width, lines_per_label, profile)
+        serials.check_width(max_width)
+        draw_code = serials.code_drawer(layout)
+        next_width = 10 ** serials.digits  # first serial number with another digit
+    else:
+        layout = compute_layout(max_width, lines_per_label, profile)
+    type_size = layout["type_size"]
+    line_spacing = layout["line_spacing"]
+    stretch = layout["stretch"]
+    column_width = layout["column_width"]
+    height_per_label = layout["height_per_label"]
 
     # Register and set FreeMono-Bold font
-    pdfmetrics.registerFont(TTFont("LiberationMonoRegular", "LiberationMono-Regular.ttf"))
-    c.setFont("LiberationMonoRegular", font_size + 0.5)
+    start = time.perf_counter()
+    register_label_font()
+    c.setFont(FONT_NAME, type_size)
+
+    page = 0
+    index = 0
+    if stats is not None:
+        page_start = time.perf_counter()
+        stats.add_time("font_setup", page_start - start)
+        page_labels = page_lines = 0
 
-    current_x = left_margin
-    current_y = page_height - top_margin
-    column = 0
-    label_counter = 0
+        def finish_page():
+            now = time.perf_counter()
+            stats.add_time("draw", now - page_start)
+            stats.count("labels", page_labels)
+            stats.count("lines", page_lines)
+            # saveState per placed form; plain labels and serials share the
+            # page's text object
+            stats.count("state_pushes", page_labels if use_forms else 0)
+            stats.count("text_objects", 0 if use_forms and serials is None else 1)
+            stats.page_done(page + 1, now - page_start, page_labels)
+            return now
+
+    # All labels of a page go into one text object. Each label sets the text
+    # matrix once (position plus the vertical stretch) and its lines follow
+    # with T*; the leading is in text space, so it is divided by the stretch.
+    def new_text():
+        text = c.beginText()
+        text.setFont(FONT_NAME, type_size, line_spacing / stretch)
+        return text
+
+    def write_label(text, label_lines, x, y):
+        text.setTextTransform(1.0, 0.0, 0.0, stretch, x, y)
+        for line in label_lines:
+            text.textLine(line)
+
+    page_text = new_text()
 
     def draw_label(label_lines, x, y):
-        for i, line in enumerate(label_lines):
-            c.saveState()
-            c.translate(x, y - i * line_spacing)
-            c.scale(1.0, 1.3)  # Stretch vertically by 1.3x
-            c.drawString(0, 0, line)
-            c.restoreState()
+        write_label(page_text, label_lines, x, y)
+
+    # With use_forms, each distinct block is drawn once into a Form XObject
+    # and every copy just places that form, so the content streams grow with
+    # the number of unique blocks instead of the number of copies.
+    form_names = {}
+
+    def place_label_form(label_lines, x, y):
+        key = tuple(label_lines)
+        name = form_names.get(key)
+        if name is None:
+            name = "Label%d" % len(form_names)
+            form_names[key] = name
+            if stats is not None:
+                stats.count("forms")
+                stats.count("text_objects")
+            c.beginForm(name, lowerx=0, lowery=-height_per_label,
+                        upperx=column_width, uppery=line_spacing * stretch)
+            c.setFont(FONT_NAME, type_size)
+            form_text = new_text()
+            write_label(form_text, label_lines, 0, 0)
+            c.drawText(form_text)
+            c.endForm()
+        c.saveState()
+        c.translate(x, y)
+        c.doForm(name)
+        c.restoreState()
+
+    place_label = place_label_form if use_forms else draw_label
+    page_text_used = not use_forms or serials is not None
 
     for block in label_blocks:
         for _ in range(block["count"]):
-            if label_counter >= labels_per_column:
-                column += 1
-                current_x = left_margin + column * column_width
-                current_y = page_height - top_margin
-                label_counter = 0
-
-                if column >= num_columns:
-                    c.showPage()
-                    c.setFont("LiberationMonoRegular", font_size + 0.5)
-                    column = 0
-                    current_x = left_margin
-                    current_y = page_height - top_margin
-
-            draw_label(block["lines"], current_x, current_y - label_counter * height_per_label)
-            label_counter += 1
+            label_page, x, y = label_position(layout, index)
+            if label_page != page:
+                if page_text_used:
+                    c.drawText(page_text)
+                    page_text = new_text()
+                if stats is not None:
+                    show_start = finish_page()
+                    page_labels = page_lines = 0
+                c.showPage()
+                c.setFont(FONT_NAME, type_size)
+                page = label_page
+                if stats is not None:
+                    page_start = time.perf_counter()
+                    stats.add_time("show_page", page_start - show_start)
+
+            place_label(block["lines"], x, y)
+            if serials is not None:
+                # The serial goes on the line after the block's own lines,
+                # the code is drawn outside the text object
+                serial = serials.serial(index)
+                if serials.start + index >= next_width:
+                    serials.check_width(max_width, index + 1)
+                    next_width *= 10
+                if use_forms:
+                    page_text.setTextTransform(1.0, 0.0, 0.0, stretch, x, y - len(block["lines"]) * line_spacing)
+                page_text.textLine(serial)
+                if draw_code is not None:
+                    c.addLiteral(draw_code(serial, x, y))
+                    if stats is not None:
+                        stats.count("codes")
+            index += 1
+            if stats is not None:
+                page_labels += 1
+                page_lines += len(block["lines"])
+
+    if index and page_text_used:
+        c.drawText(page_text)
+    if stats is not None and index:
+        finish_page()  # its showPage happens in the caller's save()
+
+    # Number of pages used
+    return page + 1 if index else 0
 
+def generate_label_pdf(output_path, max_width, label_blocks, use_forms=False, stats=None, profile=None,
+                       serials=None):
+    profile = profile or DEFAULT_PROFILE
+    c = canvas.Canvas(output_path, pagesize=profile.pagesize)
+    pages = draw_label_blocks(c, max_width, label_blocks, use_forms=use_forms, stats=stats, profile=profile,
+                              serials=serials)
+    start = time.perf_counter()
     c.save()
+    if stats is not None:
+        stats.add_time("save", time.perf_counter() - start)
+    return pages
+
+# ---------- Streaming output ----------
+# ReportLab keeps every page of a document in memory until save(). The
+# streaming document below writes each page (and its content stream) to the
+# output file the moment the canvas finishes it, so only the page being drawn
+# is ever held in memory. Fonts, the page tree and the xref are written at the
+# end, exactly as ReportLab would; only the object order in the file differs.
+#
+# Output size options:
+#   binary_streams  Flate-compressed streams without ReportLab's ASCII85
+#                   wrapper (ASCII85 makes every stream 25% larger)
+#   object_streams  pack all non-stream objects (page dictionaries, font
+#                   dictionaries, ...) into compressed PDF 1.5 object streams
+#                   and write a compressed xref stream instead of the table
+OBJECTS_PER_STREAM = 100
+
+class _ObjectStreamMarker(pdfdoc.PDFObject):
+    pass
+
+class StreamingPDFDocument(pdfdoc.PDFDocument):
+    def start_stream(self, out, binary_streams=False, object_streams=False):
+        self._out = out
+        self._offset = 0
+        self._binary_streams = binary_streams
+        self._object_streams = object_streams
+        self._pending_objects = []
+        self._in_object_stream = {}  # oid -> (object stream number, index)
+        if object_streams:
+            self._pdfVersion = max(self._pdfVersion, (1, 5))
+        self._write(pdfdoc.PDFFile(self._pdfVersion).format(self))
+
+    def _write(self, data):
+        self._out.write(data)
+        self._offset += len(data)
+
+    def _format_body(self, obj):
+        if not self._binary_streams:
+            return pdfdoc.format(obj, self, toplevel=1)
+        # ReportLab picks its stream filters from this global while formatting
+        use_a85 = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            return pdfdoc.format(obj, self, toplevel=1)
+        finally:
+            rl_config.useA85 = use_a85
+
+    def _flush_object(self, oid):
+        number, version = self.idToObjectNumberAndVersion[oid]
+        body = self._format_body(self.idToObject[oid])
+        self.idToObject[oid] = None  # the bytes are on disk, drop the object
+        if self._object_streams and not body.rstrip().endswith(b"endstream"):
+            self._in_object_stream[oid] = None
+            self._pending_objects.append((oid, number, body))
+            if len(self._pending_objects) >= OBJECTS_PER_STREAM:
+                self._flush_object_stream()
+            return
+        self.idToOffset[oid] = self._offset
+        self._write(pdfdoc.pdfdocEnc("%s %s obj\n" % (number, version)) + body
+                    + (b"" if body.endswith(b"\n") else b"\n") + b"endobj\n")
+
+    def _flush_object_stream(self):
+        if not self._pending_objects:
+            return
+        name = self.Reference(_ObjectStreamMarker()).name
+        number = self.idToObjectNumberAndVersion[name][0]
+        header = []
+        bodies = []
+        position = 0
+        for index, (oid, object_number, body) in enumerate(self._pending_objects):
+            header.append(f"{object_number} {position}")
+            bodies.append(body)
+            position += len(body) + 1
+            self._in_object_stream[oid] = (number, index)
+        header = (" ".join(header) + "\n").encode("ascii")
+        data = zlib.compress(header + b"\n".join(bodies) + b"\n")
+        self.idToOffset[name] = self._offset
+        self._write(pdfdoc.pdfdocEnc(
+            "%s 0 obj\n<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n"
+            % (number, len(self._pending_objects), len(header), len(data))) + data + b"\nendstream\nendobj\n")
+        self._pending_objects = []
+
+    def addPage(self, page):
+        name = self.thisPageName()
+        super().addPage(page)
+        self._flush_object(name)  # formatting the page registers its content stream
+        self._flush_object(page.Contents.__InternalName__)
+        self.Pages.pages[-1] = pdfdoc.PDFObjectReference(name)
+        self._out.flush()
+
+    def format(self):
+        self.Reference(self.Catalog)
+        self.Reference(self.info)
+        ids = []
+        counter = 1
+        while counter in self.numberToId:
+            oid = self.numberToId[counter]
+            if oid not in self.idToOffset and oid not in self._in_object_stream:
+                self._flush_object(oid)
+            ids.append(oid)
+            counter += 1
+        if self._object_streams:
+            self._flush_object_stream()
+            self._write_xref_stream()
+            return b""
+        xref = pdfdoc.PDFCrossReferenceTable()
+        xref.addsection(0, ids)
+        xref_offset = self._offset
+        self._write(xref.format(self))
+        trailer = pdfdoc.PDFTrailer(
+            startxref=xref_offset,
+            Size=len(ids) + 1,
+            Root=self.Reference(self.Catalog),
+            Info=self.Reference(self.info),
+            ID=self.ID(),
+        )
+        self._write(trailer.format(self))
+        return b""
+
+    def _write_xref_stream(self):
+        name = self.Reference(_ObjectStreamMarker()).name
+        number = self.idToObjectNumberAndVersion[name][0]
+        xref_offset = self._offset
+        self.idToOffset[name] = xref_offset
+        rows = [struct.pack(">BIH", 0, 0, 65535)]
+        for n in range(1, number + 1):
+            oid = self.numberToId[n]
+            if oid in self._in_object_stream:
+                rows.append(struct.pack(">BIH", 2, *self._in_object_stream[oid]))
+            else:
+                rows.append(struct.pack(">BIH", 1, self.idToOffset[oid], 0))
+        data = zlib.compress(b"".join(rows))
+        root = pdfdoc.format(self.Reference(self.Catalog), self)
+        info = pdfdoc.format(self.Reference(self.info), self)
+        self._write(pdfdoc.pdfdocEnc(
+            "%s 0 obj\n<< /Type /XRef /Size %d /W [ 1 4 2 ] /Root %s /Info %s /Filter /FlateDecode /Length %d\n/ID "
+            % (number, number + 1, root.decode("ascii"), info.decode("ascii"), len(data)))
+            + self.ID() + b">>\nstream\n" + data + b"\nendstream\nendobj\n")
+        self._write(pdfdoc.pdfdocEnc("startxref\n%d\n%%%%EOF\n" % xref_offset))
+
+    def SaveToFile(self, filename, canvas):
+        self.GetPDFData(canvas)
+        self._out.flush()
+
+class StreamingCanvas(canvas.Canvas):
+    def __init__(self, out, binary_streams=False, object_streams=False, **kwargs):
+        super().__init__(out, **kwargs)
+        # Keep the state the canvas already set up (base font, preamble) and
+        # switch the document over to streaming mode before any page exists.
+        self._doc.__class__ = StreamingPDFDocument
+        self._doc.start_stream(out, binary_streams, object_streams)
+
+def generate_label_pdf_stream(output_path, max_width, label_blocks, lines_per_label=None, use_forms=False,
+                              subset_glyphs=False, binary_streams=False, object_streams=False, stats=None,
+                              profile=None, serials=None):
+    # label_blocks may be any iterable (e.g. a generator). The label height
+    # depends on the tallest block, so pass lines_per_label to keep the input
+    # fully streamed; otherwise the blocks are collected first to measure it.
+    # subset_glyphs embeds only the glyphs actually used; by default ReportLab
+    # also embeds every printable ASCII glyph so the text stays readable. The
+    # page streams then hold escaped glyph codes instead of plain ASCII, so it
+    # pays off for short jobs and together with use_forms, not on its own.
+    if lines_per_label is None:
+        label_blocks = list(label_blocks)
+        lines_per_label = max_lines_per_label(label_blocks)
+    profile = profile or DEFAULT_PROFILE
+    start = time.perf_counter()
+    register_label_font()
+    if stats is not None:
+        stats.add_time("font_setup", time.perf_counter() - start)
+    font = pdfmetrics.getFont(FONT_NAME)
+    ascii_readable = font._asciiReadable
+    with open(output_path, "wb") as out:
+        c = StreamingCanvas(out, binary_streams, object_streams, pagesize=profile.pagesize, pageCompression=1)
+        try:
+            if subset_glyphs:
+                # splitString reads the flag from the font, so it is switched
+                # for this document only and restored once it is saved
+                font._asciiReadable = False
+                font._assignState(c._doc, asciiReadable=False)
+            pages = draw_label_blocks(c, max_width, label_blocks, lines_per_label, use_forms, stats, profile,
+                                      serials)
+            start = time.perf_counter()
+            c.save()
+            if stats is not None:
+                stats.add_time("save", time.perf_counter() - start)
+        finally:
+            font._asciiReadable = ascii_readable
+    return pages
+
+# Size of a generated PDF per page and per label
+def output_size_report(output_path, pages, labels):
+    size = os.path.getsize(output_path)
+    return {
+        "bytes": size,
+        "bytes_per_page": size / pages if pages else 0.0,
+        "bytes_per_label": size / labels if labels else 0.0,
+    }
 
 if __name__ == "__main__":
     filepath = "Part 2 Summer Labels D.txt"  # Replace with your real input file name
@@ -0,0 +1,120 @@
+# Merging many label files into one continuously paginated job.
+#
+# Every file rendered on its own ends on a part-filled page. A MergeGroup
+# lays the labels of several files out one after the other instead, so only
+# the last page of the whole group is part-filled. Files can share pages
+# only if they get the same layout, i.e. the same max width and label
+# height; group_label_files puts each file into the group for its layout.
+# A group keeps the files' own block lists (nothing is copied, so memory is
+# O(total blocks)) and hands them to the streaming writer as one chain.
+#
+# The manifest maps every source file to the labels, pages and columns it
+# ended up on, so a sheet can be traced back to its file:
+#
+#   groups, failed = group_label_files(parsed_files)
+#   for group in groups:
+#       pages = generate_merged_pdf(output_path, group)
+#       write_manifest(output_path + ".manifest.json", group.manifest(output_path))
+
+import json
+from itertools import chain
+
+from label_layout import compute_layout, max_lines_per_label
+from label_maker import generate_label_pdf_stream
+from label_stock import DEFAULT_PROFILE
+
+class MergeSource:
+    __slots__ = ("path", "label_blocks", "labels", "first_label")
+
+    def __init__(self, path, label_blocks, first_label):
+        self.path = path
+        self.label_blocks = label_blocks
+        self.labels = sum(block["count"] for block in label_blocks)
+        self.first_label = first_label  # index of its first label in the merged job
+
+class MergeGroup:
+    def __init__(self, max_width, lines_per_label, profile=None):
+        self.max_width = max_width
+        self.lines_per_label = lines_per_label
+        self.profile = profile or DEFAULT_PROFILE
+        self.layout = compute_layout(max_width, lines_per_label, self.profile)
+        self.sources = []
+        self.total_labels = 0
+
+    def add(self, path, label_blocks):
+        source = MergeSource(path, label_blocks, self.total_labels)
+        self.sources.append(source)
+        self.total_labels += source.labels
+        return source
+
+    def iter_blocks(self):
+        return chain.from_iterable(source.label_blocks for source in self.sources)
+
+    @property
+    def total_pages(self):
+        return -(-self.total_labels // self.layout["labels_per_page"])
+
+    def separate_pages(self):
+        # Pages the files would take rendered one by one
+        labels_per_page = self.layout["labels_per_page"]
+        return sum(-(-source.labels // labels_per_page) for source in self.sources)
+
+    def slot(self, index):
+        # 1-based page, column and row of label number `index` of the job
+        page, slot = divmod(index, self.layout["labels_per_page"])
+        column, row = divmod(slot, self.layout["labels_per_column"])
+        return {"page": page + 1, "column": column + 1, "row": row + 1}
+
+    def manifest(self, output_path=None):
+        sources = []
+        for source in self.sources:
+            entry = {"file": source.path, "blocks": len(source.label_blocks), "labels": source.labels,
+                     "first_label": source.first_label + 1}
+            if source.labels:
+                entry["first"] = self.slot(source.first_label)
+                entry["last"] = self.slot(source.first_label + source.labels - 1)
+            sources.append(entry)
+        separate = self.separate_pages()
+        return {
+            "output": output_path,
+            "stock": self.profile.name,
+            "max_width": self.max_width,
+            "lines_per_label": self.lines_per_label,
+            "labels_per_page": self.layout["labels_per_page"],
+            "labels_per_column": self.layout["labels_per_column"],
+            "labels": self.total_labels,
+            "pages": self.total_pages,
+            "separate_pages": separate,
+            "pages_saved": separate - self.total_pages,
+            "sources": sources,
+        }
+
+# parsed_files: (path, max_width, label_blocks) for each valid file, in the
+# order they should print. Returns the MergeGroups in order of first file,
+# and (path, error) for each file whose layout does not fit the stock.
+def group_label_files(parsed_files, profile=None):
+    groups = {}
+    errors = {}
+    failed = []
+    for path, max_width, label_blocks in parsed_files:
+        key = (max_width, max_lines_per_label(label_blocks))
+        group = groups.get(key)
+        if group is None and key not in errors:
+            try:
+                group = groups[key] = MergeGroup(max_width, key[1], profile)
+            except ValueError as e:
+                errors[key] = str(e)
+        if group is None:
+            failed.append((path, errors[key]))
+        else:
+            group.add(path, label_blocks)
+    return list(groups.values()), failed
+
+def generate_merged_pdf(output_path, group, **pdf_options):
+    # pdf_options: as generate_label_pdf_stream (use_forms, subset_glyphs, ...)
+    return generate_label_pdf_stream(output_path, group.max_width, group.iter_blocks(),
+                                     lines_per_label=group.lines_per_label, profile=group.profile, **pdf_options)
+
+def write_manifest(path, manifest):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
@@ -0,0 +1,205 @@
+# Glyph advances of the label font, for measuring lines as they will print.
+#
+# Counting characters is not the same as measuring: LiberationMono gives
+# every glyph it has the same advance (0.6 em) except the combining marks
+# (an accent typed as its own character after the letter), which take no
+# space, and characters it does not have at all (fullwidth letters, CJK,
+# tabs, zero-width spaces) print as an empty box. GlyphMetrics holds the
+# advance of every character the font covers, so a line can be measured in
+# character cells (one cell = the common advance) and checked for glyphs
+# that will come out as boxes.
+#
+# The table is read from the TTF once and kept as JSON in the metrics cache
+# directory (default_metrics_dir), keyed
+# on the font file's size and time, so checks while typing neither parse
+# the font nor load ReportLab.
+#
+#   metrics = get_metrics()
+#   metrics.cells("Jose\u0301")        # 4: the accent takes no space
+#   metrics.missing("\uff34okyo")      # "\uff34": fullwidth T is not in the font
+#   metrics.cell_width(3.4)                 # points per cell at 3.4 pt
+#   for i, cells, missing in metrics.check_lines(lines, max_width): ...
+#
+# Lines are measured with translate() against a table of the common-width
+# characters, which drops them in one C-level pass; only what is left (marks,
+# missing glyphs) is looked at one character at a time, and a whole block or
+# file is checked with one translate of its joined lines. Plain ASCII text
+# (nearly every label file) takes a bytes translate, faster still.
+
+import json
+import os
+import sys
+
+METRICS_VERSION = 1
+FONT_FILE = "LiberationMono-Regular.ttf"
+PRINTABLE_ASCII = bytes(range(0x20, 0x7f))
+
+def default_metrics_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "PinLab", "metrics")
+
+def font_path():
+    # The label font, next to the program (inside the bundle when packaged)
+    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, FONT_FILE)
+
+def _ranges(codes):
+    # Sorted code points as [first, last] runs
+    runs = []
+    for code in sorted(codes):
+        if runs and code == runs[-1][1] + 1:
+            runs[-1][1] = code
+        else:
+            runs.append([code, code])
+    return runs
+
+class GlyphMetrics:
+    def __init__(self, table):
+        # table: the JSON form, advances in 1/1000 em as ReportLab gives them
+        self.table = table
+        self.advance = table["advance"]           # the common advance
+        self.notdef = table["notdef"]             # what a missing glyph takes
+        self.zero = frozenset(table["zero"])      # code points with no advance
+        self.other = {int(code): width for code, width in table["other"].items()}
+        covered = set()
+        for first, last in table["ranges"]:
+            covered.update(range(first, last + 1))
+        self.covered = frozenset(covered)
+        # translate() table that deletes every common-width character; "\n"
+        # is kept so joined lines can be split again
+        self._common = dict.fromkeys(covered - self.zero - set(self.other))
+        self._common.pop(ord("\n"), None)
+        # Fast paths for ASCII, if the font has all of it at the common advance
+        self._ascii_common = all(code in self._common for code in PRINTABLE_ASCII)
+
+    @classmethod
+    def from_font(cls, path):
+        from reportlab.pdfbase.ttfonts import TTFontFile
+
+        face = TTFontFile(path)
+        widths = face.charWidths
+        advance = max(set(widths.values()), key=list(widths.values()).count)
+        return cls({
+            "version": METRICS_VERSION,
+            "font": os.path.basename(path),
+            "advance": advance,
+            "notdef": face.defaultWidth,
+            "zero": sorted(code for code, width in widths.items() if width == 0),
+            "other": {str(code): width for code, width in widths.items() if width not in (0, advance)},
+            "ranges": _ranges(widths),
+        })
+
+    def cell_width(self, font_size):
+        # Points per cell at font_size
+        return font_size * self.advance / 1000
+
+    def _char_cells(self, code):
+        if code in self.zero:
+            return 0
+        if code in self.other:
+            return self.other[code] / self.advance
+        if code in self.covered:
+            return 1
+        return self.notdef / self.advance
+
+    def _odd_cells(self, rest):
+        # Cells taken by characters left after translate (not common-width)
+        return sum(self._char_cells(ord(char)) for char in rest)
+
+    def _plain(self, line):
+        return self._ascii_common and line.isascii() and line.isprintable()
+
+    def cells(self, line):
+        # Printed width of line in cells
+        if self._plain(line):
+            return len(line)
+        rest = line.translate(self._common)
+        cells = len(line) - len(rest) + self._odd_cells(rest)
+        return int(cells) if cells == int(cells) else cells
+
+    def truncate(self, line, max_cells):
+        # The longest start of line that is at most max_cells wide; marks
+        # stay with the character before them
+        if self._plain(line):
+            return line[:max_cells]
+        cells = 0
+        for i, char in enumerate(line):
+            cells += self._char_cells(ord(char))
+            if cells > max_cells:
+                return line[:i]
+        return line
+
+    def width(self, line, font_size):
+        return self.cells(line) * self.cell_width(font_size)
+
+    def missing(self, line):
+        # The characters of line the font has no glyph for, in order
+        if self._plain(line):
+            return ""
+        return "".join(char for char in line.translate(self._common) if ord(char) not in self.covered)
+
+    def check_lines(self, lines, max_width=None):
+        # (index, cells, missing characters) for each line wider than
+        # max_width cells or with glyphs the font lacks, in order
+        if not lines:
+            return
+        text = "\n".join(lines)
+        if self._ascii_common:
+            # Deleting printable ASCII from the UTF-8 bytes leaves the
+            # newlines and the other characters' byte sequences, which never
+            # contain a newline byte, so the rest still splits into lines
+            rest = text.encode("utf-8", "surrogatepass").translate(None, PRINTABLE_ASCII)
+            if len(rest) > len(lines) - 1:
+                rest = [odd.decode("utf-8", "surrogatepass").translate(self._common) if odd else ""
+                        for odd in rest.split(b"\n")]
+        else:
+            rest = text.translate(self._common)
+        if len(rest) == len(lines) - 1:
+            # Nothing but common-width characters: cells are lengths
+            if max_width is not None and max(map(len, lines)) > max_width:
+                for i, line in enumerate(lines):
+                    if len(line) > max_width:
+                        yield i, len(line), ""
+            return
+        if isinstance(rest, str):
+            rest = rest.split("\n")
+        for i, (line, odd) in enumerate(zip(lines, rest)):
+            cells = len(line)
+            missing = ""
+            if odd:
+                cells += self._odd_cells(odd) - len(odd)
+                missing = "".join(char for char in odd if ord(char) not in self.covered)
+            if missing or (max_width is not None and cells > max_width):
+                yield i, int(cells) if cells == int(cells) else cells, missing
+
+_metrics = None
+
+def load_metrics(path=None, cache_dir=None):
+    # The GlyphMetrics of a font file, from the JSON cache if it is current
+    path = path or font_path()
+    stat = os.stat(path)
+    cache_dir = cache_dir or default_metrics_dir()
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(cache_dir, f"{name}-{stat.st_size}-{int(stat.st_mtime)}.json")
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            table = json.load(f)
+        if table.get("version") == METRICS_VERSION:
+            return GlyphMetrics(table)
+    except (OSError, ValueError):
+        pass
+    metrics = GlyphMetrics.from_font(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(metrics.table, f)
+    except OSError:
+        pass  # read-only profile: measure from the font each run
+    return metrics
+
+def get_metrics():
+    # The label font's metrics, loaded once per process
+    global _metrics
+    if _metrics is None:
+        _metrics = load_metrics()
+    return _metrics
@@ -0,0 +1,116 @@
+# Parallel rendering of a single large label job.
+#
+# The page a label lands on is fixed by the layout (labels_per_page), so the
+# label sequence can be cut at page boundaries and each piece drawn in its own
+# process. Workers only return the drawing operators of their pages; the parent
+# writes them in page order into one streaming document that embeds the font
+# once for the whole file.
+#
+# TrueType text is encoded through per-document glyph subsets that ReportLab
+# assigns in order of first use. Every worker (and the parent) seeds its font
+# state with the job's characters in the order the serial renderer meets
+# them, so all pieces agree on the encoding and the merged page streams are
+# the same as generate_label_pdf's.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+from label_layout import LayoutPlan
+from label_maker import FONT_NAME, LabelBlock, StreamingCanvas, draw_label_blocks, register_label_font
+from label_stock import DEFAULT_PROFILE
+
+# Yields the blocks covering label copies start..stop-1 of the whole job
+def slice_label_blocks(label_blocks, start, stop):
+    position = 0
+    for block in label_blocks:
+        block_start = position
+        position += block["count"]
+        if position <= start:
+            continue
+        if block_start >= stop:
+            break
+        count = min(position, stop) - max(block_start, start)
+        yield LabelBlock(block["lines"], count)
+
+# Every character of the job, in the order the serial renderer first draws it
+def font_seed_text(label_blocks):
+    seen = dict.fromkeys(ch for block in label_blocks if block["count"] > 0
+                         for line in block["lines"] for ch in line)
+    return "".join(seen)
+
+def seed_font_state(c, seed_text):
+    register_label_font()
+    font = pdfmetrics.getFont(FONT_NAME)
+    font.splitString(seed_text, c._doc)
+    font.getSubsetInternalName(0, c._doc)
+
+# Collects the operators of each finished page instead of building a document
+class PageCaptureCanvas(canvas.Canvas):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.captured_pages = []
+
+    def showPage(self):
+        self.captured_pages.append("\n".join(self._code))
+        self._startPage()
+
+    def save(self):
+        if len(self._code):
+            self.showPage()
+
+# Worker: draw one slice of the job and return its page operators. serials
+# (label_codes.LabelSerials) must start at the slice's first label, and the
+# seed text must hold the serials' characters too.
+def render_page_range(max_width, label_blocks, lines_per_label, seed_text, profile=None, serials=None):
+    profile = profile or DEFAULT_PROFILE
+    c = PageCaptureCanvas(os.devnull, pagesize=profile.pagesize)
+    seed_font_state(c, seed_text)
+    draw_label_blocks(c, max_width, label_blocks, lines_per_label, profile=profile, serials=serials)
+    c.save()
+    return c.captured_pages
+
+# Writes pages captured by render_page_range, in order, into one document.
+# output is a path or a binary file object (e.g. a pipe to a print spooler);
+# progress(pages_written) is called after each page has been written to it.
+def write_captured_pages(output, seed_text, page_codes, progress=None, pagesize=DEFAULT_PROFILE.pagesize):
+    if not hasattr(output, "write"):
+        with open(output, "wb") as out:
+            return write_captured_pages(out, seed_text, page_codes, progress, pagesize)
+    c = StreamingCanvas(output, pagesize=pagesize)
+    seed_font_state(c, seed_text)
+    for page_number, page_code in enumerate(page_codes, 1):
+        c._code.append(page_code)
+        c.showPage()
+        if progress is not None:
+            progress(page_number)
+    c.save()
+
+def generate_label_pdf_parallel(output_path, max_width, label_blocks, workers=None, pages_per_chunk=None,
+                                profile=None):
+    plan = LayoutPlan(max_width, list(label_blocks), profile=profile)
+    label_blocks = plan.label_blocks
+    lines_per_label = plan.lines_per_label
+    labels_per_page = plan.labels_per_page
+    total_labels = plan.total_labels
+    total_pages = plan.total_pages
+
+    workers = workers or os.cpu_count() or 1
+    if pages_per_chunk is None:
+        # A few chunks per worker keeps the pool busy when chunks finish unevenly
+        pages_per_chunk = max(1, -(-total_pages // (workers * 4)))
+    chunk_labels = pages_per_chunk * labels_per_page
+    seed_text = font_seed_text(label_blocks)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(render_page_range, max_width,
+                        list(slice_label_blocks(label_blocks, start, start + chunk_labels)),
+                        lines_per_label, seed_text, plan.profile)
+            for start in range(0, total_labels, chunk_labels)
+        ]
+        page_codes = (page_code for future in futures for page_code in future.result())
+        write_captured_pages(output_path, seed_text, page_codes, pagesize=plan.profile.pagesize)
+    return total_pages
@@ -0,0 +1,82 @@
+# Low-resolution raster preview of single pages, straight from the layout.
+#
+# A page is drawn from LayoutPlan.iter_page, so the cost depends on the labels
+# on that page only, never on the size of the whole job. Glyphs come from a
+# bitmap atlas of the label font at the label size (stretched like the PDF,
+# by the stock profile's factor), built once per resolution. Copies of a block look the same, so each
+# distinct block is composed once and then pasted at every position.
+
+import math
+
+from PIL import Image, ImageDraw, ImageFont
+
+from label_layout import LayoutPlan
+from label_maker import resource_path
+
+PREVIEW_DPI = 110
+
+class GlyphAtlas:
+    def __init__(self, font_size, dpi, stretch):
+        self.scale = dpi / 72.0
+        self.font = ImageFont.truetype(resource_path("LiberationMono-Regular.ttf"), font_size * self.scale)
+        ascent, descent = self.font.getmetrics()
+        self.advance = self.font.getlength("M")  # monospaced
+        self.height = round((ascent + descent) * stretch)
+        self.baseline = round(ascent * stretch)
+        self._ascent = ascent
+        self._cell = (int(self.advance) + 2, ascent + descent)
+        self._glyphs = {}
+
+    def glyph(self, ch):
+        # Coverage mask of one character, baseline at row self.baseline
+        mask = self._glyphs.get(ch)
+        if mask is None:
+            cell = Image.new("L", self._cell, 0)
+            ImageDraw.Draw(cell).text((0, self._ascent), ch, font=self.font, fill=255, anchor="ls")
+            mask = cell.resize((cell.width, self.height), Image.BILINEAR)
+            self._glyphs[ch] = mask
+        return mask
+
+    def label_mask(self, lines, line_spacing):
+        # Coverage mask of a whole label, origin at the first line's baseline
+        step = line_spacing * self.scale
+        width = int(max(len(line) for line in lines) * self.advance) + 2
+        mask = Image.new("L", (width, int((len(lines) - 1) * step) + self.height), 0)
+        for i, line in enumerate(lines):
+            top = round(i * step)
+            for j, ch in enumerate(line):
+                if not ch.isspace():
+                    glyph = self.glyph(ch)
+                    mask.paste(255, (round(j * self.advance), top), glyph)
+        return mask
+
+_atlases = {}
+
+def get_atlas(font_size, dpi, stretch):
+    key = (font_size, dpi, stretch)
+    if key not in _atlases:
+        _atlases[key] = GlyphAtlas(font_size, dpi, stretch)
+    return _atlases[key]
+
+# Grayscale image of one page of a LayoutPlan (0-based page number)
+def render_preview_page(plan, page, dpi=PREVIEW_DPI):
+    layout = plan.layout
+    atlas = get_atlas(layout["type_size"], dpi, layout["stretch"])
+    scale = atlas.scale
+    size = (math.ceil(layout["page_width"] * scale), math.ceil(layout["page_height"] * scale))
+    image = Image.new("L", size, 255)
+    masks = {}
+    for block, x, y in plan.iter_page(page):
+        lines = tuple(block["lines"])
+        mask = masks.get(lines)
+        if mask is None:
+            mask = masks[lines] = atlas.label_mask(lines, layout["line_spacing"])
+        left = round(x * scale)
+        top = round((layout["page_height"] - y) * scale) - atlas.baseline
+        image.paste(0, (left, top), mask)
+    return image
+
+def render_preview(max_width, label_blocks, pages=1, dpi=PREVIEW_DPI, profile=None):
+    # The first `pages` pages of a job
+    plan = LayoutPlan(max_width, label_blocks, profile=profile)
+    return [render_preview_page(plan, page, dpi) for page in range(min(pages, plan.total_pages))]
@@ -0,0 +1,201 @@
+# Print backends: where a rendered job goes, page by page.
+#
+# The streaming writer hands each page to its output as soon as the page is
+# drawn, so a backend only has to supply a binary stream to write into:
+#
+#   FileBackend     writes the PDF to a file (stand-in printer for testing)
+#   PipeBackend     pipes the PDF into a command's stdin as it is rendered
+#   LpBackend       PipeBackend for CUPS `lp` (Linux/macOS)
+#   AcrobatBackend  Windows: spools to a temp file, prints it with Acrobat
+#                   Reader (/p /h) and deletes the file afterwards
+#
+# print_labels() drives a backend and reports how long the first page took,
+# next to the total time. For a backend that streams (streams = True) that is
+# when the page reached the printer; AcrobatBackend only prints once the whole
+# file is written, so for it that is only when the first page was drawn. With
+# a label_server client the job is rendered there and the PDF streamed into
+# the backend as it arrives.
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from label_cache import generate_label_pdf_cached
+
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), "PinLab", "spool")
+STALE_SPOOL_SECONDS = 24 * 60 * 60
+
+class FileBackend:
+    name = "file"
+    streams = True
+
+    def __init__(self, path):
+        self.path = path
+        self._out = None
+
+    def open(self, title):
+        self._out = open(self.path, "wb")
+        return self._out
+
+    def finish(self):
+        self._out.close()
+        return f"Written to {self.path}"
+
+    def abort(self):
+        self._out.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class PipeBackend:
+    name = "pipe"
+    streams = True
+
+    def __init__(self, command):
+        self.command = command
+        self._process = None
+        self._stdout = None
+        self._stderr = None
+
+    def build_command(self, title):
+        return list(self.command)
+
+    def open(self, title):
+        # The command's output goes to files: a full stdout pipe would block
+        # it, and with it our writes to its stdin
+        self._stdout = tempfile.TemporaryFile()
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(self.build_command(title), stdin=subprocess.PIPE,
+                                         stdout=self._stdout, stderr=self._stderr)
+        return self._process.stdin
+
+    def _output(self, f):
+        f.seek(0)
+        text = f.read().decode("utf-8", "replace").strip()
+        f.close()
+        return text
+
+    def finish(self):
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass  # the command exited early; its status says why
+        returncode = self._process.wait()
+        stdout, stderr = self._output(self._stdout), self._output(self._stderr)
+        if returncode != 0:
+            raise RuntimeError(f"{self.command[0]} failed: {stderr or f'exit status {returncode}'}")
+        return stdout or f"Sent to {self.command[0]}"
+
+    def abort(self):
+        self._process.kill()
+        self._process.wait()
+        self._output(self._stdout)
+        self._output(self._stderr)
+
+class LpBackend(PipeBackend):
+    name = "lp"
+
+    def __init__(self, printer=None, lp="lp"):
+        super().__init__([lp])
+        self.printer = printer
+
+    def build_command(self, title):
+        command = [self.command[0], "-t", title]
+        if self.printer:
+            command += ["-d", self.printer]
+        return command + ["-"]
+
+class AcrobatBackend:
+    name = "acrobat"
+    streams = False
+
+    def __init__(self, adobe_path):
+        self.adobe_path = adobe_path
+        self.path = None
+        self._out = None
+
+    def open(self, title):
+        remove_stale_spool_files()
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix="pinlab_", suffix=".pdf", dir=SPOOL_DIR)
+        self._out = os.fdopen(fd, "wb")
+        return self._out
+
+    def finish(self):
+        self._out.close()
+        try:
+            subprocess.run([self.adobe_path, "/p", "/h", self.path], check=False)
+        finally:
+            self._remove()
+        return "Print command sent to Acrobat"
+
+    def abort(self):
+        self._out.close()
+        self._remove()
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass  # still open in the viewer; removed on a later run
+
+# Spool files a previous run could not delete (viewer still had them open)
+def remove_stale_spool_files(max_age=STALE_SPOOL_SECONDS):
+    try:
+        names = os.listdir(SPOOL_DIR)
+    except FileNotFoundError:
+        return
+    now = time.time()
+    for name in names:
+        path = os.path.join(SPOOL_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
+
+# The backend for this machine's default printer, or None
+def default_backend(adobe_path=None):
+    if os.name == "nt":
+        return AcrobatBackend(adobe_path) if adobe_path else None
+    if shutil.which("lp"):
+        return LpBackend()
+    return None
+
+def print_labels(backend, max_width, label_blocks, title="PinLab labels", cache=None, progress=None, stats=None,
+                 profile=None, client=None):
+    start = time.perf_counter()
+    first_page = []
+
+    def page_done(pages_written):
+        if not first_page:
+            first_page.append(time.perf_counter() - start)
+        if progress is not None:
+            progress(pages_written)
+
+    out = backend.open(title)
+    try:
+        if client is not None:
+            pages = client.render_blocks(max_width, label_blocks, out, profile=profile, progress=page_done)["pages"]
+        else:
+            pages = generate_label_pdf_cached(out, max_width, label_blocks, cache, page_done, stats, profile)
+        out.flush()
+    except BrokenPipeError:
+        backend.finish()  # raises with the spooler's own error message
+        raise
+    except BaseException:
+        backend.abort()
+        raise
+    # Not in the try: a backend whose finish() fails has already cleaned up
+    message = backend.finish()
+    return {
+        "backend": backend.name,
+        "streamed": backend.streams,
+        "pages": pages,
+        "first_page_seconds": first_page[0] if first_page else None,
+        "seconds": time.perf_counter() - start,
+        "message": message,
+    }
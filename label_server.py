@@ -0,0 +1,418 @@
+# Local render service for workstations shared by several benches.
+#
+# Instead of every GUI and batch run loading the font, parsing and rendering
+# on its own, one RenderServer takes label files over a localhost (or Unix)
+# socket, queues them by priority and renders them on a fixed pool of worker
+# processes. The workers stay up between jobs, so the registered font, the
+# layout cache and the on-disk render cache stay warm; only the first job of
+# each worker pays for loading them.
+#
+#   python label_server.py [-j 4] [--port 8765 | --unix /tmp/pinlab.sock]
+#
+# Clients (RenderClient) are plain blocking sockets, so the GUI runs them on
+# its job thread and the CLI on a thread pool. LocalRenderClient has the same
+# interface but renders in the calling process, for tests and benchmarks.
+#
+#   client = RenderClient("127.0.0.1:8765")
+#   with open(output_path, "wb") as out:
+#       result = client.render_file(path, out, priority=1, progress=print)
+#
+# Protocol: every message is one line of JSON, followed by "length" raw bytes
+# if it has that key. A client sends {"op": "render", "priority", "stock",
+# "options", "length"} plus the label file, or {"op": "status"}. For a
+# render the server answers "queued", "started", "progress" (pages written)
+# and finally "done" (with the PDF as payload) or "error". A client that
+# disconnects cancels its job if it has not started yet.
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from label_cache import RenderCache, generate_label_pdf_cached
+from label_index import BlockIndex
+from label_maker import LabelFileReader, generate_label_pdf_stream, register_label_font
+from label_stock import DEFAULT_PROFILE, StockProfile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_ADDRESS = f"{DEFAULT_HOST}:{DEFAULT_PORT}"
+MAX_QUEUE = 100
+MAX_UPLOAD_BYTES = 256 * 2**20
+CHUNK_BYTES = 256 * 1024
+
+# Render options a client may set; any but merge_repeated bypass the render
+# cache and go through generate_label_pdf_stream
+RENDER_OPTIONS = ("use_forms", "subset_glyphs", "binary_streams", "object_streams", "merge_repeated")
+
+class RenderError(Exception):
+    # A job the server could not render; result has error/error_line like
+    # pinlab_cli's per-file results
+    def __init__(self, result):
+        super().__init__(result.get("error") or f"error at line {result.get('error_line')}")
+        self.result = result
+
+# ---------- Rendering (in the worker processes) ----------
+
+def label_file_bytes(max_width, label_blocks):
+    # The blocks written back out as a label file, for submitting edited text
+    out = [str(max_width)]
+    for block in label_blocks:
+        out.append(str(block["count"]))
+        out.extend(block["lines"])
+        out.append("")
+    return ("\n".join(out) + "\n").encode("utf-8")
+
+def profile_message(profile):
+    profile = profile or DEFAULT_PROFILE
+    return {"name": profile.name, "values": profile.values()}
+
+def render_label_data(data, stock=None, options=None, progress=None, cache=None):
+    # Parses and renders one submitted label file; returns (result, pdf bytes)
+    options = options or {}
+    unknown = set(options) - set(RENDER_OPTIONS)
+    if unknown:
+        raise ValueError(f"unknown render options: {', '.join(sorted(unknown))}")
+    profile = StockProfile(stock["name"], **stock["values"]) if stock else DEFAULT_PROFILE
+    result = {"blocks": 0, "labels": 0, "pages": 0, "error_line": -1, "error": None}
+    fd, path = tempfile.mkstemp(prefix="pinlab_job_", suffix=".txt")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        reader = LabelFileReader(path)
+        label_blocks = list(reader)
+        result["error_line"] = reader.error_line
+        if reader.error_line != -1:
+            return result, b""
+        if options.get("merge_repeated"):
+            label_blocks = BlockIndex(label_blocks).merged_blocks()
+        result["blocks"] = len(label_blocks)
+        result["labels"] = sum(block["count"] for block in label_blocks)
+        if not label_blocks:
+            result["error"] = "no label blocks found"
+            return result, b""
+        pdf_options = {key: value for key, value in options.items() if key != "merge_repeated" and value}
+        if pdf_options:
+            output_path = path[:-4] + ".pdf"
+            try:
+                result["pages"] = generate_label_pdf_stream(output_path, reader.max_width, label_blocks,
+                                                            profile=profile, **pdf_options)
+                with open(output_path, "rb") as f:
+                    return result, f.read()
+            finally:
+                os.remove(output_path)
+        out = io.BytesIO()
+        result["pages"] = generate_label_pdf_cached(out, reader.max_width, label_blocks, cache, progress,
+                                                    profile=profile)
+        return result, out.getvalue()
+    finally:
+        os.remove(path)
+
+# Per worker process: the render cache and the queue progress goes back on
+_worker_cache = None
+_worker_progress = None
+
+def _init_worker(progress_queue, cache_dir):
+    global _worker_cache, _worker_progress
+    register_label_font()
+    _worker_cache = RenderCache(cache_dir)
+    _worker_progress = progress_queue
+
+def _render_job(job_id, data, stock, options):
+    return render_label_data(data, stock, options, lambda pages: _worker_progress.put((job_id, pages)),
+                             _worker_cache)
+
+# ---------- Server ----------
+
+class ServerJob:
+    __slots__ = ("id", "priority", "data", "stock", "options", "events", "submitted", "started", "cancelled")
+
+    def __init__(self, job_id, priority, data, stock, options):
+        self.id = job_id
+        self.priority = priority
+        self.data = data
+        self.stock = stock
+        self.options = options
+        self.events = asyncio.Queue()  # (kind, message, payload) for the connection
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.cancelled = False
+
+async def send_message(writer, message, payload=b""):
+    if payload:
+        message = dict(message, length=len(payload))
+    writer.write(json.dumps(message).encode("utf-8") + b"\n")
+    if payload:
+        writer.write(payload)
+    await writer.drain()
+
+class RenderServer:
+    def __init__(self, workers=None, cache_dir=None, max_queue=MAX_QUEUE):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.max_queue = max_queue
+        self.counts = {"submitted": 0, "done": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self.render_seconds = 0.0
+        self._ids = itertools.count(1)
+        self._running = {}
+        self._server = None
+        self._pool = None
+        self._tasks = []
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        # Returns the address clients connect to (with the real port if port=0)
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._progress = multiprocessing.Queue()
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                         initargs=(self._progress, self.cache_dir))
+        self._progress_thread = threading.Thread(target=self._forward_progress, daemon=True)
+        self._progress_thread.start()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._started = time.perf_counter()
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, unix_path)
+            return "unix:" + unix_path
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return "%s:%d" % self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        self._progress.put(None)
+        self._pool.shutdown(cancel_futures=True)
+
+    def status(self):
+        done = self.counts["done"]
+        return dict(self.counts, workers=self.workers, queued=self._queue.qsize(), running=len(self._running),
+                    uptime_seconds=time.perf_counter() - self._started,
+                    mean_render_seconds=self.render_seconds / done if done else None)
+
+    def _forward_progress(self):
+        # Worker processes put (job id, pages written) on a process queue
+        while True:
+            item = self._progress.get()
+            if item is None:
+                return
+            self._loop.call_soon_threadsafe(self._job_progress, *item)
+
+    def _job_progress(self, job_id, pages):
+        job = self._running.get(job_id)
+        if job is not None:
+            job.events.put_nowait(("progress", {"pages": pages}, b""))
+
+    async def _work(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.cancelled:
+                continue
+            job.started = time.perf_counter()
+            job.events.put_nowait(("started", {"queue_seconds": job.started - job.submitted}, b""))
+            self._running[job.id] = job
+            try:
+                result, pdf = await self._loop.run_in_executor(self._pool, _render_job, job.id, job.data,
+                                                               job.stock, job.options)
+            except Exception as e:
+                result, pdf = {"error": str(e)}, b""
+            finally:
+                del self._running[job.id]
+            seconds = time.perf_counter() - job.started
+            result.update(queue_seconds=job.started - job.submitted, render_seconds=seconds)
+            if pdf:
+                self.counts["done"] += 1
+                self.render_seconds += seconds
+                job.events.put_nowait(("done", result, pdf))
+            else:
+                self.counts["failed"] += 1
+                job.events.put_nowait(("error", result, b""))
+
+    async def _handle(self, reader, writer):
+        try:
+            request = json.loads(await reader.readline() or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            op = request.get("op")
+            if op == "status":
+                await send_message(writer, dict(self.status(), event="status"))
+            elif op == "render":
+                await self._handle_render(request, reader, writer)
+            else:
+                await send_message(writer, {"event": "error", "error": f"unknown op {op!r}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            await send_message(writer, {"event": "error", "error": str(e)})
+        finally:
+            writer.close()
+
+    async def _handle_render(self, request, reader, writer):
+        length = request_int(request, "length")
+        if not 0 < length <= MAX_UPLOAD_BYTES:
+            raise ValueError(f"label file must be 1 to {MAX_UPLOAD_BYTES} bytes")
+        data = await reader.readexactly(length)
+        if self._queue.qsize() >= self.max_queue:
+            self.counts["rejected"] += 1
+            await send_message(writer, {"event": "error", "error": "render queue is full, try again later"})
+            return
+        priority = request_int(request, "priority")
+        job = ServerJob(next(self._ids), priority, data, request.get("stock"), request.get("options") or {})
+        self.counts["submitted"] += 1
+        # Highest priority first, then first come first served
+        self._queue.put_nowait((-priority, job.id, job))
+        await send_message(writer, {"event": "queued", "job": job.id, "position": self._queue.qsize()})
+
+        # Anything the client sends now (or closing the socket) ends the wait
+        disconnected = asyncio.ensure_future(reader.read(1))
+        try:
+            while True:
+                next_event = asyncio.ensure_future(job.events.get())
+                await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_event.done():
+                    next_event.cancel()
+                    if job.started is None:
+                        job.cancelled = True
+                        self.counts["cancelled"] += 1
+                    return
+                kind, message, payload = next_event.result()
+                await send_message(writer, dict(message, event=kind), payload)
+                if kind in ("done", "error"):
+                    return
+        finally:
+            disconnected.cancel()
+
+def request_int(request, key):
+    value = request.get(key, 0)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"{key} must be an integer, not {value!r}")
+    return value
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, workers=None, cache_dir=None,
+                max_queue=MAX_QUEUE):
+    server = RenderServer(workers, cache_dir, max_queue)
+    address = await server.start(host, port, unix_path)
+    print(f"PinLab render server on {address} with {server.workers} workers", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+# ---------- Clients ----------
+
+def parse_address(address):
+    # "host:port", ":port" or "unix:/path" -> (socket family, address)
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[5:]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or DEFAULT_HOST, int(port))
+
+class RenderClient:
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=None, priority=0):
+        self.address = address
+        self.timeout = timeout
+        self.priority = priority  # for jobs submitted without one
+
+    def _connect(self):
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def status(self):
+        with self._connect() as sock, sock.makefile("rb") as f:
+            sock.sendall(json.dumps({"op": "status"}).encode("utf-8") + b"\n")
+            return json.loads(f.readline())
+
+    def render(self, data, out, priority=None, profile=None, options=None, progress=None):
+        # Submits label file bytes and writes the PDF to the binary file out.
+        # progress(pages_written) as the server reports pages; if it raises,
+        # the connection is closed, which cancels a job still in the queue.
+        request = {"op": "render", "priority": self.priority if priority is None else priority,
+                   "stock": profile_message(profile), "options": options or {}, "length": len(data)}
+        with self._connect() as sock, sock.makefile("rb") as f:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n" + data)
+            while True:
+                line = f.readline()
+                if not line:
+                    raise ConnectionError("the render server closed the connection")
+                message = json.loads(line)
+                event = message.pop("event")
+                if event == "progress" and progress is not None:
+                    progress(message["pages"])
+                elif event == "error":
+                    raise RenderError(message)
+                elif event == "done":
+                    remaining = message.pop("length")
+                    while remaining:
+                        chunk = f.read(min(remaining, CHUNK_BYTES))
+                        if not chunk:
+                            raise ConnectionError("the render server closed the connection")
+                        out.write(chunk)
+                        remaining -= len(chunk)
+                    return message
+
+    def render_file(self, path, out, **kwargs):
+        with open(path, "rb") as f:
+            data = f.read()
+        return self.render(data, out, **kwargs)
+
+    def render_blocks(self, max_width, label_blocks, out, **kwargs):
+        return self.render(label_file_bytes(max_width, label_blocks), out, **kwargs)
+
+class LocalRenderClient(RenderClient):
+    # Same interface, rendered in this process with its own render cache
+    def __init__(self, cache=None):
+        super().__init__("local")
+        self.cache = cache
+        self.counts = {"done": 0, "failed": 0}
+
+    def status(self):
+        return dict(self.counts, workers=1, queued=0, running=0)
+
+    def render(self, data, out, priority=None, profile=None, options=None, progress=None):
+        start = time.perf_counter()
+        result, pdf = render_label_data(data, profile_message(profile), options, progress, self.cache)
+        result.update(queue_seconds=0.0, render_seconds=time.perf_counter() - start)
+        if not pdf:
+            self.counts["failed"] += 1
+            raise RenderError(result)
+        self.counts["done"] += 1
+        out.write(pdf)
+        return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the PinLab render server for this workstation.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default {DEFAULT_PORT})")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="number of render processes")
+    parser.add_argument("--cache-dir", help="render cache directory (default: the GUI's)")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="jobs waiting before new ones are refused")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, max(1, args.workers), args.cache_dir, args.max_queue))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
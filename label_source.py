@@ -0,0 +1,152 @@
+# Random access to the lines of a label file of any size.
+#
+# LabelSource maps the file into memory and indexes it once: for every
+# INDEX_CHUNK bytes it stores how many newlines come before that point, so
+# the index is a few thousand integers even for a 100 MB file, and building
+# it is a byte count per chunk. lines(start, stop) jumps to the nearest
+# index point and walks forward to the wanted lines, decoding only those.
+#
+# The encoding is detected from the first bytes, without decoding the file:
+# a UTF-8 or UTF-16 byte order mark, or for UTF-16 without one (Excel's
+# "Unicode Text" export) the zero bytes of ASCII text, else UTF-8.
+#
+#   source = LabelSource(path)
+#   source.line_count, source.encoding
+#   source.lines(1000, 1040)  # rows 1000..1039, without line endings
+#   source.close()
+
+import mmap
+from bisect import bisect_left
+
+INDEX_CHUNK = 64 * 1024  # bytes per index point; lines() scans at most this far
+SNIFF_BYTES = 4096
+
+BOMS = (
+    (b"\xef\xbb\xbf", "utf-8"),
+    (b"\xff\xfe", "utf-16-le"),
+    (b"\xfe\xff", "utf-16-be"),
+)
+
+# Byte maps for counting UTF-16 newlines: 0 for 0x0A (resp. 0x00), 1 otherwise
+_NOT_LF = bytes(int(b != 0x0A) for b in range(256))
+_NOT_ZERO = bytes(int(b != 0) for b in range(256))
+
+NEWLINES = {"utf-8": b"\n", "utf-16-le": b"\n\x00", "utf-16-be": b"\x00\n"}
+
+def detect_encoding(head):
+    # (encoding, BOM length) from the first bytes of a file
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    sample = head[:SNIFF_BYTES - SNIFF_BYTES % 2]
+    if len(sample) >= 2 and 0 in sample:
+        half = len(sample) // 2
+        even_zeros = sample[0::2].count(0)
+        odd_zeros = sample[1::2].count(0)
+        # Mostly-ASCII UTF-16 has a zero in every other byte
+        if odd_zeros > half * 0.4 and even_zeros < half * 0.1:
+            return "utf-16-le", 0
+        if even_zeros > half * 0.4 and odd_zeros < half * 0.1:
+            return "utf-16-be", 0
+    return "utf-8", 0
+
+def text_codec(head):
+    # Codec name for decoding a file starting with head; it also skips the BOM
+    encoding, bom = detect_encoding(head)
+    if bom:
+        return "utf-8-sig" if encoding == "utf-8" else "utf-16"
+    return encoding
+
+def text_encoding(path):
+    # text_codec of a file, for open(path, encoding=...)
+    with open(path, "rb") as f:
+        return text_codec(f.read(SNIFF_BYTES))
+
+class LabelSource:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = self.size = self._file.seek(0, 2)
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.encoding, self._start = detect_encoding(self._data[:SNIFF_BYTES])
+        self._newline = NEWLINES[self.encoding]
+        self._width = len(self._newline)  # bytes per code unit
+        self._build_index()
+
+    def _build_index(self):
+        # _index_lines[i] newlines come before byte _index_offsets[i]
+        self._index_lines = [0]
+        self._index_offsets = [self._start]
+        newlines = 0
+        for offset in range(self._start, self.size, INDEX_CHUNK):
+            newlines += self._count_newlines(self._data[offset:offset + INDEX_CHUNK])
+            end = min(offset + INDEX_CHUNK, self.size)
+            self._index_lines.append(newlines)
+            self._index_offsets.append(end)
+        self.line_count = newlines + 1  # like str.split("\n"): a final newline ends in an empty row
+
+    def _count_newlines(self, chunk):
+        if self._width == 1:
+            return chunk.count(b"\n")  # 0x0A is never part of a longer UTF-8 sequence
+        # A UTF-16 byte search can also match across two code units, but
+        # only with a 0x0A in the other byte of a unit than a newline has it
+        # (U+0A00-U+0AFF). Chunks start on a code unit, so without one every
+        # match is a newline.
+        chunk = chunk[:len(chunk) - len(chunk) % 2]
+        lf = self._newline.index(b"\n")
+        if b"\n" not in chunk[1 - lf::2]:
+            return chunk.count(self._newline)
+        # Otherwise count the units that are a newline: 0x0A where the
+        # newline has it, 0x00 in the other byte. Each test gives 0 for a
+        # match in its byte of a unit; OR-ing them leaves 0 for newlines only.
+        not_lf = int.from_bytes(chunk[lf::2].translate(_NOT_LF), "big")
+        not_zero = int.from_bytes(chunk[1 - lf::2].translate(_NOT_ZERO), "big")
+        return (not_lf | not_zero).to_bytes(len(chunk) // 2, "big").count(0)
+
+    def _find_newline(self, offset):
+        # Offset of the next newline at or after offset, or -1
+        while True:
+            found = self._data.find(self._newline, offset)
+            if found == -1 or (found - self._start) % self._width == 0:
+                return found
+            offset = found + 1
+
+    def _line_offset(self, row):
+        # Byte offset where row starts (row 0 starts after the BOM)
+        if row == 0:
+            return self._start
+        # The last index point with fewer than `row` newlines before it
+        point = bisect_left(self._index_lines, row) - 1
+        offset = self._index_offsets[point]
+        skip = row - self._index_lines[point]
+        if self._width == 1:
+            # Skip the newlines in one split; the next index point has at
+            # least `row` newlines before it, so they are all in this chunk
+            chunk = self._data[offset:offset + INDEX_CHUNK]
+            rest = chunk.split(b"\n", skip)[-1]
+            return offset + len(chunk) - len(rest)
+        for _ in range(skip):
+            offset = self._find_newline(offset) + self._width
+        return offset
+
+    def lines(self, start, stop):
+        # Rows start..stop-1 as text, without line endings
+        start = max(0, start)
+        stop = min(stop, self.line_count)
+        if start >= stop:
+            return []
+        offset = self._line_offset(start)
+        rows = []
+        for _ in range(start, stop):
+            end = self._find_newline(offset)
+            if end == -1:
+                end = self.size
+            rows.append(self._data[offset:end].decode(self.encoding, "replace").rstrip("\r"))
+            offset = end + self._width
+        return rows
+
+    def close(self):
+        if self.size:
+            self._data.close()
+        self._file.close()
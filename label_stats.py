@@ -0,0 +1,46 @@
+# Optional instrumentation for a render.
+#
+# Pass a RenderStats as `stats` to the generators to collect phase timings,
+# counters and per-page timings. Without one the drawing code only does an
+# `is not None` test per label, so there is no cost when it is not wanted.
+#
+#   stats = RenderStats(on_page=lambda page, seconds, labels: ...)
+#   generate_label_pdf(path, max_width, blocks, stats=stats)
+#   print(stats.to_json())
+
+import json
+
+class RenderStats:
+    def __init__(self, on_page=None):
+        self.on_page = on_page  # on_page(page_number, seconds, labels) after each page is drawn
+        self.phases = {}
+        self.counters = {}
+        self.page_seconds = []
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def page_done(self, page_number, seconds, labels):
+        self.page_seconds.append(seconds)
+        self.count("pages")
+        if self.on_page is not None:
+            self.on_page(page_number, seconds, labels)
+
+    def to_dict(self):
+        pages = self.page_seconds
+        return {
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+            "page_seconds": {
+                "min": round(min(pages), 6) if pages else 0.0,
+                "max": round(max(pages), 6) if pages else 0.0,
+                "mean": round(sum(pages) / len(pages), 6) if pages else 0.0,
+                "all": [round(seconds, 6) for seconds in pages],
+            },
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
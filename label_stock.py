@@ -0,0 +1,147 @@
+# Paper stock profiles: the page and type settings a job is laid out with.
+#
+# A profile holds everything compute_layout needs besides the label text:
+# page size, margins, font size, the gaps between lines and labels, and the
+# vertical stretch of the type. "a4" is the stock PinLab has always printed
+# on and the default. More profiles come from a JSON file, STOCK_FILE next to
+# the program unless another path is given:
+#
+#   {
+#     "default": "letter",
+#     "profiles": {
+#       "avery-l7651": {"page": "A4", "top_margin_mm": 10.7, "bottom_margin_mm": 10.7,
+#                       "left_margin_mm": 4.7},
+#       "wide-card": {"page": [150, 100], "font_size": 3.4, "stretch": 1.2}
+#     }
+#   }
+#
+# Fields that are left out keep the a4 values. "page" is one of PAGE_SIZES or
+# [width_mm, height_mm]; margins are in mm, font_size, line_gap (added to the
+# font size between lines) and label_gap (between labels) in points.
+
+import json
+import os
+import sys
+
+from reportlab.lib.pagesizes import A4, LEGAL, LETTER
+from reportlab.lib.units import mm
+
+STOCK_FILE = "pinlab_stock.json"
+DEFAULT_PROFILE_NAME = "a4"
+
+PAGE_SIZES = {"A4": A4, "Letter": LETTER, "Legal": LEGAL}
+
+# field: default; lengths in points
+PROFILE_FIELDS = {
+    "page_width": A4[0],
+    "page_height": A4[1],
+    "top_margin": 10.3 * mm,
+    "bottom_margin": 11.3 * mm,
+    "left_margin": 0 * mm,
+    "font_size": 2.9,
+    "line_gap": 0.6,
+    "label_gap": 2.5,  # or +1, or +0
+    "stretch": 1.3,    # labels are drawn 1.3x taller than the font
+}
+
+class StockProfile:
+    __slots__ = ("name",) + tuple(PROFILE_FIELDS)
+
+    def __init__(self, name, **values):
+        unknown = set(values) - set(PROFILE_FIELDS)
+        if unknown:
+            raise ValueError(f"Stock profile {name!r}: unknown fields {', '.join(sorted(unknown))}")
+        self.name = name
+        for field, default in PROFILE_FIELDS.items():
+            setattr(self, field, float(values.get(field, default)))
+
+    @property
+    def pagesize(self):
+        return self.page_width, self.page_height
+
+    def values(self):
+        # {field: value}; StockProfile(name, **profile.values()) is a copy
+        return {field: getattr(self, field) for field in PROFILE_FIELDS}
+
+    def key(self):
+        # Everything that changes the layout; profiles with the same key lay
+        # out the same whatever they are called
+        return tuple(getattr(self, field) for field in PROFILE_FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, StockProfile) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"StockProfile({self.name!r})"
+
+BUILTIN_PROFILES = {
+    "a4": StockProfile("a4"),
+    "letter": StockProfile("letter", page_width=LETTER[0], page_height=LETTER[1]),
+}
+DEFAULT_PROFILE = BUILTIN_PROFILES[DEFAULT_PROFILE_NAME]
+
+def profile_from_config(name, config):
+    # A StockProfile from one "profiles" entry of the JSON file
+    values = {}
+    for key, value in config.items():
+        if key == "page":
+            if isinstance(value, str):
+                if value not in PAGE_SIZES:
+                    raise ValueError(f"Stock profile {name!r}: unknown page {value!r}, "
+                                     f"use one of {', '.join(PAGE_SIZES)} or [width_mm, height_mm]")
+                values["page_width"], values["page_height"] = PAGE_SIZES[value]
+            else:
+                values["page_width"], values["page_height"] = (float(v) * mm for v in value)
+        elif key.endswith("_mm"):
+            values[key[:-3]] = float(value) * mm
+        else:
+            values[key] = value
+    return StockProfile(name, **values)
+
+def default_stock_path():
+    # Next to the program (the .exe when packaged with PyInstaller)
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, STOCK_FILE)
+
+def load_profiles(path=None):
+    # (profiles by name, default name): the built-in profiles plus the ones
+    # in the JSON file, if it exists
+    profiles = dict(BUILTIN_PROFILES)
+    default = DEFAULT_PROFILE_NAME
+    path = path or default_stock_path()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        for name, values in config.get("profiles", {}).items():
+            profiles[name] = profile_from_config(name, values)
+        default = config.get("default", default)
+        if default not in profiles:
+            raise ValueError(f"{path}: default stock {default!r} is not a profile")
+    return profiles, default
+
+def get_profile(name=None, path=None):
+    profiles, default = load_profiles(path)
+    name = name or default
+    if name not in profiles:
+        raise ValueError(f"Unknown stock profile {name!r} (have: {', '.join(profiles)})")
+    return profiles[name]
+
+def rank_profiles(max_width, lines_per_label, profiles):
+    # (labels per page, name) for every profile the labels fit on, most first
+    from label_layout import compute_layout
+
+    ranking = []
+    for name, profile in profiles.items():
+        try:
+            layout = compute_layout(max_width, lines_per_label, profile)
+        except ValueError:
+            continue
+        ranking.append((layout["labels_per_page"], name))
+    ranking.sort(key=lambda item: -item[0])
+    return ranking
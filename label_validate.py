@@ -0,0 +1,281 @@
+# Incremental validation of a label file being edited.
+#
+# The buffer is cut into segments at count lines: segment 0 is the header
+# (the max width line and anything before the first count), every other
+# segment is one count line and the label lines under it. An edit only
+# re-reads the segments it touched (plus the one before, which absorbs the
+# lines if a count line was deleted), and the block/label totals are kept as
+# running sums, so a keystroke costs the size of one block, not the file.
+# Only changing the max width re-checks every line.
+#
+# Rules are the same as LabelFileReader: blank lines are ignored, the first
+# non-blank line is the max width, a digit line starts a block, label lines
+# may not be wider than the max width (in printed cells, see label_metrics)
+# or come before the first count.
+
+from bisect import bisect_right
+from collections import Counter
+
+from label_layout import compute_layout
+from label_maker import LabelBlock, LabelFileReader
+from label_metrics import get_metrics
+from label_source import text_encoding
+
+class _Segment:
+    __slots__ = ("count", "lines", "offsets", "longest", "width_offset")
+
+    def __init__(self, count):
+        self.count = count        # None for the header segment
+        self.lines = []           # stripped label lines
+        self.offsets = []         # row of each label line, from the segment start
+        self.longest = 0          # width of the widest label line, in cells
+        self.width_offset = None  # header only: row of the max width line
+
+    def is_block(self):
+        return self.count is not None and bool(self.lines)
+
+class LabelBuffer:
+    def __init__(self, lines=()):
+        self.rows = 0
+        self.max_width = None
+        self.width_error = None
+        self._starts = []
+        self._segments = []
+        self._text = []
+        self.blocks = 0
+        self.labels = 0
+        self._heights = Counter()  # lines per block -> number of blocks
+        self.replace_lines(0, 0, list(lines))
+
+    # ---------- Editing ----------
+    def replace_lines(self, start, stop, new_lines):
+        # Replace rows start..stop-1 with new_lines. Returns the (first, last)
+        # rows, last exclusive, whose error marks may have changed, or None
+        # when every row has to be re-marked (the max width changed).
+        self._text[start:stop] = new_lines
+        if not self._segments:
+            self._rebuild()
+            return None
+
+        delta = len(new_lines) - (stop - start)
+        first = max(0, self._segment_at(start) - 1)
+        last = self._segment_at(max(start, stop - 1))
+        region_start = self._starts[first]
+        region_stop = self._segment_end(last) + delta
+
+        if delta:
+            self.rows += delta
+            for i in range(last + 1, len(self._starts)):
+                self._starts[i] += delta
+        starts, segments = self._scan(region_start, region_stop)
+        if first == 0 and segments[0].width_offset is None and last + 1 < len(self._starts):
+            # The width line is gone, so the next count line becomes the width
+            self._rebuild()
+            return None
+
+        for segment in self._segments[first:last + 1]:
+            self._count(segment, -1)
+        for segment in segments:
+            self._count(segment, 1)
+        self._starts[first:last + 1] = starts
+        self._segments[first:last + 1] = segments
+        if first == 0:
+            old_width = self.max_width
+            self._read_width()
+            if self.max_width != old_width:
+                return None
+        return region_start, region_stop
+
+    def _rebuild(self):
+        self.rows = len(self._text)
+        self.blocks = 0
+        self.labels = 0
+        self._heights.clear()
+        self._starts, self._segments = self._scan(0, self.rows)
+        for segment in self._segments:
+            self._count(segment, 1)
+        self._read_width()
+
+    def _read_width(self):
+        header = self._segments[0]
+        self.max_width = None
+        self.width_error = None
+        if header.width_offset is not None:
+            width = self._text[header.width_offset].strip()
+            if width.isdigit():
+                self.max_width = int(width)
+            else:
+                self.width_error = header.width_offset
+
+    def _scan(self, row, stop):
+        # Segments for rows row..stop-1; row is always a segment start
+        cells = get_metrics().cells
+        starts = [row]
+        segment = _Segment(None if row == 0 else int(self._text[row].strip()))
+        segments = [segment]
+        if row:
+            row += 1
+        for row in range(row, stop):
+            line = self._text[row].strip()
+            if not line:
+                continue
+            if segment.count is None and segment.width_offset is None:
+                segment.width_offset = row
+            elif line.isdigit():
+                starts.append(row)
+                segment = _Segment(int(line))
+                segments.append(segment)
+            else:
+                segment.lines.append(line)
+                segment.offsets.append(row - starts[-1])
+                segment.longest = max(segment.longest, cells(line))
+        return starts, segments
+
+    def _count(self, segment, sign):
+        if segment.is_block():
+            self.blocks += sign
+            self.labels += sign * segment.count
+            height = len(segment.lines)
+            self._heights[height] += sign
+            if not self._heights[height]:
+                del self._heights[height]
+
+    def _segment_at(self, row):
+        return max(0, bisect_right(self._starts, row) - 1)
+
+    def _segment_end(self, index):
+        return self._starts[index + 1] if index + 1 < len(self._starts) else self.rows
+
+    # ---------- Results ----------
+    def errors(self, first=0, last=None):
+        # (row, message) for every error in rows first..last-1, in row order
+        if last is None:
+            last = self.rows
+        if self.width_error is not None and first <= self.width_error < last:
+            yield self.width_error, "first line must be the maximum label width"
+        for index in range(self._segment_at(first), len(self._starts)):
+            start = self._starts[index]
+            if start >= last:
+                break
+            segment = self._segments[index]
+            if segment.count is not None and (self.max_width is None or segment.longest <= self.max_width):
+                continue
+            for line, offset in zip(segment.lines, segment.offsets):
+                row = start + offset
+                if not first <= row < last:
+                    continue
+                if segment.count is None:
+                    yield row, "label line before the first count"
+                elif self.max_width is not None:
+                    width = get_metrics().cells(line)
+                    if width > self.max_width:
+                        yield row, f"line is {width:g} characters wide, the maximum is {self.max_width}"
+
+    def first_error(self):
+        return next(self.errors(), None)
+
+    def lines_per_label(self):
+        return max(self._heights, default=0)
+
+    def totals(self, profile=None):
+        return layout_totals(self.max_width, self.lines_per_label(), self.blocks, self.labels, profile)
+
+    def label_blocks(self):
+        return [LabelBlock(tuple(segment.lines), segment.count)
+                for segment in self._segments if segment.is_block()]
+
+    def block_rows(self):
+        # 1-based row of the count line of each block, in label_blocks() order
+        return [start + 1 for start, segment in zip(self._starts, self._segments) if segment.is_block()]
+
+    def text(self):
+        return "\n".join(self._text)
+
+# Block, label and page totals; pages are counted on profile (a
+# label_stock.StockProfile, default a4)
+def layout_totals(max_width, lines_per_label, blocks, labels, profile=None):
+    totals = {"blocks": blocks, "labels": labels, "pages": 0, "layout_error": None}
+    if max_width is not None and lines_per_label:
+        try:
+            labels_per_page = compute_layout(max_width, lines_per_label, profile)["labels_per_page"]
+            totals["pages"] = -(-labels // labels_per_page)
+        except ValueError as e:
+            totals["layout_error"] = str(e)
+    return totals
+
+# The check for a file too big for the editor (see label_source): one
+# streaming pass with LabelFileReader, stopping at the first error. Returns
+# what LabelBuffer would give for it; rows are 0-based file lines.
+# progress(file_line), if given, is called every CHECK_PROGRESS_BLOCKS blocks.
+# Pages are counted on profile; layout_totals recounts them for another one.
+CHECK_PROGRESS_BLOCKS = 1000
+
+def check_label_file(path, progress=None, profile=None):
+    result = {"max_width": None, "label_blocks": [], "block_rows": [], "error": None, "lines_per_label": 0,
+              "totals": layout_totals(None, 0, 0, 0)}
+    try:
+        reader = LabelFileReader(path)
+    except ValueError:
+        result["error"] = (0, "first line must be the maximum label width")
+        return result
+    label_blocks, rows = result["label_blocks"], result["block_rows"]
+    for block in reader:
+        label_blocks.append(block)
+        rows.append(reader.block_line)
+        if progress is not None and len(label_blocks) % CHECK_PROGRESS_BLOCKS == 0:
+            progress(reader.file_line)
+    result["max_width"] = reader.max_width
+    if reader.error_line == 1:
+        result["error"] = (reader.file_line - 1, "label line before the first count")
+    elif reader.error_line != -1:
+        result["error"] = (reader.file_line - 1, f"line is wider than the maximum of {reader.max_width} characters")
+
+    lines_per_label = result["lines_per_label"] = max((len(block.lines) for block in label_blocks), default=0)
+    result["totals"] = layout_totals(reader.max_width, lines_per_label, len(label_blocks),
+                                     sum(block.count for block in label_blocks), profile)
+    return result
+
+# Every label line of a file wider than its max width or using characters
+# the label font lacks (they print as empty boxes), where LabelFileReader
+# stops at the first error. Returns (max_width, [(file line, cells, missing
+# characters)]), max_width None if the first line is not a width. The lines
+# are measured WIDTH_CHECK_BATCH at a time with GlyphMetrics.check_lines.
+WIDTH_CHECK_BATCH = 10000
+
+def check_line_widths(path):
+    check = get_metrics().check_lines
+    issues = []
+    max_width = None
+    batch, rows = [], []
+
+    def flush():
+        for i, cells, missing in check(batch, max_width):
+            issues.append((rows[i], cells, missing))
+        batch.clear()
+        rows.clear()
+
+    with open(path, encoding=text_encoding(path), errors="replace") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if max_width is None:
+                if not line.isdigit():
+                    return None, []
+                max_width = int(line)
+            elif not line.isdigit():
+                batch.append(line)
+                rows.append(number)
+                if len(batch) == WIDTH_CHECK_BATCH:
+                    flush()
+    flush()
+    return max_width, issues
+
+# (block index, line, missing characters) for the label lines that use
+# characters the label font lacks, checked in one pass over all the lines
+def glyph_warnings(label_blocks):
+    lines, owners = [], []
+    for index, block in enumerate(label_blocks):
+        lines.extend(block["lines"])
+        owners.extend([index] * len(block["lines"]))
+    return [(owners[i], lines[i], missing) for i, _, missing in get_metrics().check_lines(lines) if missing]
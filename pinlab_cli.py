@@ -0,0 +1,518 @@
+# Headless batch mode: validate and render many label files at once.
+#
+#   python pinlab_cli.py labels/                  # every .txt in a directory
+#   python pinlab_cli.py "season/*.txt" -j 8 -o pdfs/
+#   python pinlab_cli.py labels/ --estimate        # quote pages, render nothing
+#   python pinlab_cli.py labels/ --compact         # smallest PDFs for slow links
+#   python pinlab_cli.py big.txt --stats stats.json # phase timings per file
+#   python pinlab_cli.py labels/ --dedup --group-by 1  # merge repeated blocks,
+#                                                      # report by locality line
+#   python pinlab_cli.py labels/ --stock letter        # lay out on another paper stock
+#   python pinlab_cli.py labels/ --compare-stock       # labels per page on every stock
+#   python pinlab_cli.py labels/ --merge -o pdfs/      # one PDF per layout, pages shared
+#   python pinlab_cli.py labels/ --server :8765        # render on the local render server
+#   python pinlab_cli.py labels/ --check-widths --estimate  # every too-wide line, and
+#                                                           # characters that print as boxes
+#   python pinlab_cli.py export.csv --template specimens.json  # labels from a CSV/TSV export
+#   python pinlab_cli.py labels/ --serial NHM- --serial-start 1201 --code datamatrix
+#                                                   # a catalog number and code on every label
+#   python pinlab_cli.py huge.txt --resume             # pick up a crashed run where it stopped
+#
+# Each file is parsed and rendered in its own worker process. A summary line
+# is printed per file and the exit status is 1 if any file failed. With
+# --merge the files are parsed in the workers, then the files with the same
+# layout are laid out one after the other into one PDF per layout (see
+# label_merge), each with a .manifest.json of where every file's labels went.
+# With --server the files are sent to a running label_server instead, which
+# keeps its workers (and their font and caches) warm between runs. With
+# --template the inputs are CSV/TSV tables streamed through a label_import
+# template instead of label files. With --serial the numbers run on from
+# one file to the next in the order the files are listed, so the labels are
+# counted before any file is rendered. With --resume each PDF is drawn in
+# checkpointed segments (label_checkpoint), so running the same command
+# again after a crash only draws the pages that were not finished.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from label_import import (TABLE_EXTENSIONS, TableImport, estimate_table_pages, generate_label_pdf_from_table,
+                          load_template)
+from label_checkpoint import generate_label_pdf_resumable
+from label_codes import CODE_TYPES, LabelSerials
+from label_index import index_label_file
+from label_layout import LayoutPlan, max_lines_per_label
+from label_maker import LabelFileReader, parse_label_file, generate_label_pdf_stream, output_size_report
+from label_merge import generate_merged_pdf, group_label_files, write_manifest
+from label_server import RenderClient, RenderError
+from label_stats import RenderStats
+from label_stock import load_profiles, rank_profiles
+from label_validate import check_line_widths
+
+def find_label_files(inputs, extensions=(".txt",)):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = [path for extension in extensions for path in glob.glob(os.path.join(item, "*" + extension))]
+        else:
+            matches = glob.glob(item) or [item]
+        for path in sorted(matches):
+            if path not in files:
+                files.append(path)
+    return files
+
+def output_path_for(input_path, output_dir):
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    folder = output_dir if output_dir else os.path.dirname(input_path)
+    return os.path.join(folder, f"{base_name}_output.pdf")
+
+# Runs in a worker process; returns a plain dict so it pickles cheaply
+# pdf_options are passed on to generate_label_pdf_stream (subset_glyphs, ...).
+# With collect_stats, result["stats"] holds the RenderStats of the file.
+# With block_report, result["block_report"] is the label_index report of the
+# repeated blocks (grouped by label line group_line if given); merge_repeated
+# renders each repeated block once with its total count.
+# profile is the label_stock.StockProfile to lay out on; with compare_stock
+# (a {name: profile} dict), result["stock"] ranks them by labels per page.
+# With check_widths, result["width_issues"] lists every label line that is
+# too wide or has characters the font lacks (label_validate.check_line_widths).
+# With resume the PDF is drawn by label_checkpoint, resuming an interrupted
+# run of the same file; pdf_options may then only hold serials.
+def process_label_file(input_path, output_dir=None, use_forms=False, estimate_only=False, pdf_options=None,
+                       collect_stats=False, merge_repeated=False, block_report=False, group_line=None,
+                       profile=None, compare_stock=None, check_widths=False, resume=False):
+    result = {"file": input_path, "output": None, "blocks": 0, "labels": 0,
+              "pages": 0, "bytes": 0, "error_line": -1, "error": None, "seconds": 0.0}
+    stats = RenderStats() if collect_stats else None
+    start = time.perf_counter()
+    try:
+        if merge_repeated or block_report:
+            max_width, label_blocks, index, error_line = index_label_file(input_path)
+            if error_line == -1:
+                result["block_report"] = index.report(group_line=group_line)
+                if merge_repeated:
+                    label_blocks = index.merged_blocks()
+        else:
+            max_width, label_blocks, error_line = parse_label_file(input_path)
+        if stats is not None:
+            stats.add_time("parse", time.perf_counter() - start)
+        if check_widths:
+            result["max_width"], result["width_issues"] = check_line_widths(input_path)
+        result["blocks"] = len(label_blocks)
+        result["labels"] = sum(block["count"] for block in label_blocks)
+        result["error_line"] = error_line
+        if error_line == -1 and label_blocks and compare_stock:
+            result["stock"] = rank_profiles(max_width, max_lines_per_label(label_blocks), compare_stock)
+        if error_line == -1 and label_blocks and estimate_only:
+            serials = (pdf_options or {}).get("serials")
+            result["pages"] = LayoutPlan(max_width, label_blocks, profile=profile, serials=serials).total_pages
+        elif error_line == -1 and label_blocks:
+            output_path = output_path_for(input_path, output_dir)
+            if resume:
+                result["pages"] = generate_label_pdf_resumable(output_path, max_width, label_blocks, stats=stats,
+                                                               profile=profile, **(pdf_options or {}))
+            else:
+                result["pages"] = generate_label_pdf_stream(output_path, max_width, label_blocks,
+                                                            use_forms=use_forms, stats=stats, profile=profile,
+                                                            **(pdf_options or {}))
+            result["output"] = output_path
+            result["bytes"] = os.path.getsize(output_path)
+        elif error_line == -1:
+            result["error"] = "no label blocks found"
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    if stats is not None:
+        result["stats"] = stats.to_dict()
+    return result
+
+# --template, in a worker: one CSV/TSV table through a label_import template;
+# result["rows"] and result["truncated"] count the table rows and the lines
+# cut to fit
+def process_table_file(input_path, template, output_dir=None, estimate_only=False, pdf_options=None, profile=None):
+    result = {"file": input_path, "output": None, "blocks": 0, "labels": 0, "rows": 0, "truncated": 0,
+              "pages": 0, "bytes": 0, "error_line": -1, "error": None, "seconds": 0.0}
+    start = time.perf_counter()
+    table = None
+    output_path = output_path_for(input_path, output_dir)
+    try:
+        if estimate_only:
+            result["pages"], table = estimate_table_pages(input_path, template, profile,
+                                                          (pdf_options or {}).get("serials"))
+        else:
+            result["pages"], table = generate_label_pdf_from_table(output_path, input_path, template, profile=profile,
+                                                                   **(pdf_options or {}))
+            result["output"] = output_path
+            result["bytes"] = os.path.getsize(output_path)
+        if not table.labels:
+            result["error"] = "no labels in the table"
+    except Exception as e:
+        result["error"] = str(e)
+    if table is not None:
+        result["rows"], result["labels"], result["truncated"] = table.rows, table.labels, table.truncated
+    if result["error"] and not estimate_only and os.path.exists(output_path):
+        os.remove(output_path)  # the start of a PDF that was never finished
+        result["output"] = None
+        result["bytes"] = 0
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+# --serial, in a worker: how many labels a file (or table, with template)
+# holds; 0 if it cannot be read, the render pass reports why
+def count_labels(input_path, template=None):
+    try:
+        if template is not None:
+            table = TableImport(input_path, template)
+            for _ in table:
+                pass
+            return table.labels
+        reader = LabelFileReader(input_path)
+        return sum(block.count for block in reader)
+    except Exception:
+        return 0
+
+def file_serials(serials, counts):
+    # One LabelSerials per file, each starting after the labels of the files
+    # before it
+    offset = 0
+    for count in counts:
+        yield serials.after(offset)
+        offset += count
+
+# --merge, in a worker: parse one file; returns (result, max_width, label_blocks)
+# with the blocks None if the file cannot be merged
+def parse_for_merge(input_path, merge_repeated=False):
+    result = {"file": input_path, "output": None, "blocks": 0, "labels": 0,
+              "pages": 0, "bytes": 0, "error_line": -1, "error": None, "seconds": 0.0}
+    start = time.perf_counter()
+    max_width, label_blocks = 0, None
+    try:
+        if merge_repeated:
+            max_width, label_blocks, index, error_line = index_label_file(input_path)
+            if error_line == -1:
+                label_blocks = index.merged_blocks()
+        else:
+            max_width, label_blocks, error_line = parse_label_file(input_path)
+        result["blocks"] = len(label_blocks)
+        result["labels"] = sum(block["count"] for block in label_blocks)
+        result["error_line"] = error_line
+        if error_line == -1 and not label_blocks:
+            result["error"] = "no label blocks found"
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    if failed(result):
+        label_blocks = None
+    return result, max_width, label_blocks
+
+def merged_output_path(name, group, groups, output_dir):
+    # <name>_output.pdf, or one per layout when the files need several
+    if len(groups) > 1:
+        name = f"{name}_w{group.max_width}x{group.lines_per_label}"
+    return os.path.join(output_dir or ".", f"{name}_output.pdf")
+
+# --merge, in a worker: render one MergeGroup and write its manifest;
+# failed lists (path, error) of the files left out of the job
+def render_merge_group(group, output_path, use_forms=False, pdf_options=None, failed=()):
+    start = time.perf_counter()
+    manifest = merge_manifest(group, output_path, failed)
+    manifest_path = os.path.splitext(output_path)[0] + ".manifest.json"
+    try:
+        pages = generate_merged_pdf(output_path, group, use_forms=use_forms, **(pdf_options or {}))
+        write_manifest(manifest_path, manifest)
+        manifest["bytes"] = os.path.getsize(output_path)
+        manifest["manifest"] = manifest_path
+        manifest["pages"] = pages
+    except Exception as e:
+        manifest["error"] = str(e)
+    manifest["seconds"] = time.perf_counter() - start
+    return manifest
+
+def merge_manifest(group, output_path=None, failed=()):
+    manifest = group.manifest(output_path)
+    if failed:
+        manifest["failed"] = [{"file": path, "error": error} for path, error in failed]
+    return manifest
+
+def format_merge_summary(manifest):
+    files = len(manifest["sources"])
+    status = f"ERROR: {manifest['error']}" if "error" in manifest else f"-> {manifest['output'] or '(estimate only)'}"
+    return (f"width {manifest['max_width']} x {manifest['lines_per_label']} lines: {files} files, "
+            f"{manifest['labels']} labels, {manifest['pages']} pages "
+            f"({manifest['separate_pages']} separately, {manifest['pages_saved']} saved)  {status}")
+
+def merge_label_files(pool, files, args, pdf_options, profile, log):
+    # Returns (failures, pages, bytes)
+    failures = 0
+    parsed = []
+    for future in [pool.submit(parse_for_merge, path, args.dedup) for path in files]:
+        result, max_width, label_blocks = future.result()
+        if label_blocks is None:
+            print(format_summary(result), file=log, flush=True)
+            failures += 1
+        else:
+            parsed.append((result, max_width, label_blocks))
+    groups, left_out = group_label_files([(result["file"], max_width, label_blocks)
+                                          for result, max_width, label_blocks in parsed], profile)
+    # Files whose layout does not fit fail on their own; the rest are merged
+    results = {result["file"]: result for result, _, _ in parsed}
+    for path, error in left_out:
+        result = dict(results[path], error=error)
+        print(format_summary(result), file=log, flush=True)
+        failures += 1
+    if args.estimate:
+        manifests = [merge_manifest(group, failed=left_out) for group in groups]
+    else:
+        futures = [pool.submit(render_merge_group, group,
+                               merged_output_path(args.merge, group, groups, args.output_dir),
+                               args.forms, pdf_options, left_out)
+                   for group in groups]
+        manifests = [future.result() for future in futures]
+    total_pages = total_bytes = 0
+    for manifest in manifests:
+        print(format_merge_summary(manifest), file=log, flush=True)
+        for source in manifest["sources"]:
+            first, last = source["first"], source["last"]
+            print(f"  {source['file']}: {source['labels']} labels, page {first['page']} column {first['column']}"
+                  f" to page {last['page']} column {last['column']}", file=log, flush=True)
+        failures += "error" in manifest
+        total_pages += manifest["pages"]
+        total_bytes += manifest.get("bytes", 0)
+    return failures, total_pages, total_bytes
+
+# --server: one file through a label_server RenderClient, on a client thread
+def render_on_server(client, input_path, output_dir=None, priority=0, profile=None, options=None):
+    result = {"file": input_path, "output": None, "blocks": 0, "labels": 0,
+              "pages": 0, "bytes": 0, "error_line": -1, "error": None, "seconds": 0.0}
+    start = time.perf_counter()
+    output_path = output_path_for(input_path, output_dir)
+    try:
+        with open(output_path, "wb") as out:
+            rendered = client.render_file(input_path, out, priority=priority, profile=profile, options=options)
+        result.update((key, rendered[key]) for key in ("blocks", "labels", "pages"))
+        result["output"] = output_path
+        result["bytes"] = os.path.getsize(output_path)
+    except RenderError as e:
+        result["error_line"] = e.result.get("error_line", -1)
+        result["error"] = e.result.get("error") if result["error_line"] == -1 else None
+    except Exception as e:
+        result["error"] = str(e)
+    if result["output"] is None and os.path.exists(output_path):
+        os.remove(output_path)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def format_width_issues(result, limit=20):
+    issues = result["width_issues"]
+    lines = []
+    for line, cells, missing in issues[:limit]:
+        problems = []
+        if cells > result["max_width"]:
+            problems.append(f"{cells:g} characters wide, the maximum is {result['max_width']}")
+        if missing:
+            problems.append("no glyph for " + " ".join(repr(char) for char in missing) + " (prints as a box)")
+        lines.append(f"  line {line}: " + ", ".join(problems))
+    if len(issues) > limit:
+        lines.append(f"  ... and {len(issues) - limit} more")
+    return "\n".join(lines)
+
+def format_summary(result):
+    if result["error_line"] != -1:
+        status = f"ERROR at line {result['error_line']}"
+    elif result["error"]:
+        status = f"ERROR: {result['error']}"
+    elif result["output"] is None:
+        status = "OK (estimate only)"
+    else:
+        size = output_size_report(result["output"], result["pages"], result["labels"])
+        status = (f"OK -> {result['output']} ({size['bytes']} bytes, "
+                  f"{size['bytes_per_page']:.0f} B/page, {size['bytes_per_label']:.1f} B/label)")
+    if "rows" in result:
+        counts = f"{result['rows']} rows, {result['labels']} labels, {result['truncated']} lines truncated"
+    else:
+        counts = f"{result['blocks']} blocks, {result['labels']} labels"
+    return f"{result['file']}: {counts}, {result['pages']} pages, {result['seconds']:.2f}s  {status}"
+
+def failed(result):
+    return result["error_line"] != -1 or result["error"] is not None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate label PDFs for a batch of PinLab .txt files.")
+    parser.add_argument("inputs", nargs="+", help="label files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", help="where to write PDFs (default: next to each input)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--forms", action="store_true", help="draw each unique block once as a PDF form")
+    parser.add_argument("--estimate", action="store_true", help="only count pages from the layout, write no PDFs")
+    parser.add_argument("--subset-glyphs", action="store_true", help="embed only the glyphs the labels use")
+    parser.add_argument("--binary-streams", action="store_true", help="write compressed streams without ASCII85")
+    parser.add_argument("--object-streams", action="store_true", help="pack objects into PDF 1.5 object streams")
+    parser.add_argument("--compact", action="store_true", help="all of the above plus --forms")
+    parser.add_argument("--stats", metavar="FILE", help="write phase timings and counters as JSON ('-' for stdout)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="merge repeated label blocks into one block with the total count, and report them")
+    parser.add_argument("--dedup-report", action="store_true", help="report repeated label blocks without merging")
+    parser.add_argument("--group-by", type=int, metavar="LINE",
+                        help="group the report by this label line, e.g. 1 for the locality (implies --dedup-report)")
+    parser.add_argument("--stock", help="paper stock profile to lay out on (default: the stock file's default, a4)")
+    parser.add_argument("--stock-file", help="JSON file with stock profiles (default: pinlab_stock.json next to the program)")
+    parser.add_argument("--compare-stock", action="store_true",
+                        help="list the labels per page of each file on every stock profile")
+    parser.add_argument("--merge", nargs="?", const="merged", metavar="NAME",
+                        help="lay the files out one after the other into NAME_output.pdf (one PDF per "
+                             "width and label height) with a manifest of where each file went")
+    parser.add_argument("--check-widths", action="store_true",
+                        help="list every label line that is too wide or has characters the font lacks")
+    parser.add_argument("--server", metavar="ADDRESS",
+                        help="render on a running label_server (host:port, :port or unix:/path)")
+    parser.add_argument("--priority", type=int, default=0, help="job priority on the server, higher first")
+    parser.add_argument("--template", metavar="FILE",
+                        help="the inputs are CSV/TSV tables; make labels from their rows with this JSON template")
+    parser.add_argument("--serial", nargs="?", const="", metavar="PREFIX",
+                        help="print a running serial number (PREFIX and the number) under every label")
+    parser.add_argument("--serial-start", type=int, default=1, metavar="N", help="first serial number (default 1)")
+    parser.add_argument("--serial-digits", type=int, default=6, metavar="N",
+                        help="serial numbers are zero-padded to N digits (default 6)")
+    parser.add_argument("--code", choices=CODE_TYPES,
+                        help="also put the serial in a 2D code left of every label (implies --serial)")
+    parser.add_argument("--resume", action="store_true",
+                        help="draw in checkpointed segments; run again after a crash to finish where it stopped")
+    args = parser.parse_args(argv)
+    if args.resume and (args.forms or args.subset_glyphs or args.binary_streams or args.object_streams
+                        or args.compact or args.merge or args.server or args.template):
+        parser.error("--resume cannot be combined with --forms, --subset-glyphs, --binary-streams, "
+                     "--object-streams, --compact, --merge, --server or --template")
+    if args.template and (args.merge or args.server or args.stats or args.dedup or args.dedup_report
+                          or args.compare_stock or args.check_widths):
+        parser.error("--template cannot be combined with --merge, --server, --stats, --dedup, --dedup-report, "
+                     "--group-by, --compare-stock or --check-widths")
+    serials = None
+    if args.code and args.serial is None:
+        args.serial = ""
+    if args.serial is not None:
+        if args.merge or args.server:
+            parser.error("--serial and --code cannot be combined with --merge or --server")
+        try:
+            serials = LabelSerials(args.serial, args.serial_start, args.serial_digits, args.code)
+        except ValueError as e:
+            parser.error(str(e))
+    template = None
+    if args.template:
+        try:
+            template = load_template(args.template)
+        except (OSError, ValueError) as e:
+            parser.error(f"template: {e}")
+    if args.server and (args.estimate or args.merge or args.stats or args.dedup_report or args.compare_stock
+                        or args.check_widths):
+        parser.error("--server only renders; it cannot be combined with --estimate, --merge, --stats, "
+                     "--dedup-report, --group-by, --compare-stock or --check-widths")
+    try:
+        profiles, default_stock = load_profiles(args.stock_file)
+    except (OSError, ValueError) as e:
+        parser.error(f"stock profiles: {e}")
+    stock = args.stock or default_stock
+    if stock not in profiles:
+        parser.error(f"unknown stock {stock!r} (have: {', '.join(profiles)})")
+    if args.group_by is not None:
+        if args.group_by < 1:
+            parser.error("--group-by must be 1 or more")
+        args.dedup_report = True
+    if args.compact:
+        args.forms = args.subset_glyphs = args.binary_streams = args.object_streams = True
+    pdf_options = {"subset_glyphs": args.subset_glyphs, "binary_streams": args.binary_streams,
+                   "object_streams": args.object_streams}
+    if args.resume:
+        pdf_options = {}
+
+    files = find_label_files(args.inputs, TABLE_EXTENSIONS if template else (".txt",))
+    if not files:
+        print("No tables found." if template else "No label files found.", file=sys.stderr)
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # With --stats - the JSON owns stdout, so the summary goes to stderr
+    log = sys.stderr if args.stats == "-" else sys.stdout
+    start = time.perf_counter()
+    failures = 0
+    total_pages = 0
+    total_bytes = 0
+    file_stats = []
+    if args.server:
+        client = RenderClient(args.server)
+        options = dict(pdf_options, use_forms=args.forms, merge_repeated=args.dedup)
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = [pool.submit(render_on_server, client, path, args.output_dir, args.priority,
+                                   profiles[stock], options)
+                       for path in files]
+            for future in futures:
+                result = future.result()
+                print(format_summary(result), file=log, flush=True)
+                failures += failed(result)
+                total_pages += result["pages"]
+                total_bytes += result["bytes"]
+        print(f"\n{len(files)} files, {failures} failed, {total_pages} pages, {total_bytes} bytes, "
+              f"{time.perf_counter() - start:.2f}s total", file=log)
+        return 1 if failures else 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        file_options = [pdf_options] * len(files)
+        if serials is not None:
+            counts = pool.map(count_labels, files, [template] * len(files)) if len(files) > 1 else [0]
+            file_options = [dict(pdf_options, serials=s) for s in file_serials(serials, counts)]
+        if template:
+            futures = [pool.submit(process_table_file, path, template, args.output_dir, args.estimate,
+                                   dict(options, use_forms=args.forms), profiles[stock])
+                       for path, options in zip(files, file_options)]
+            for future in futures:
+                result = future.result()
+                print(format_summary(result), file=log, flush=True)
+                failures += failed(result)
+                total_pages += result["pages"]
+                total_bytes += result["bytes"]
+            print(f"\n{len(files)} files, {failures} failed, {total_pages} pages, {total_bytes} bytes, "
+                  f"{time.perf_counter() - start:.2f}s total", file=log)
+            return 1 if failures else 0
+        if args.merge:
+            failures, total_pages, total_bytes = merge_label_files(pool, files, args, dict(pdf_options),
+                                                                   profiles[stock], log)
+            print(f"\n{len(files)} files, {failures} failed, {total_pages} pages, {total_bytes} bytes, "
+                  f"{time.perf_counter() - start:.2f}s total", file=log)
+            return 1 if failures else 0
+        futures = [pool.submit(process_label_file, path, args.output_dir, args.forms, args.estimate, options,
+                               args.stats is not None, args.dedup, args.dedup_report, args.group_by,
+                               profiles[stock], profiles if args.compare_stock else None, args.check_widths,
+                               args.resume)
+                   for path, options in zip(files, file_options)]
+        for future in futures:
+            result = future.result()
+            print(format_summary(result), file=log, flush=True)
+            if result.get("width_issues"):
+                print(format_width_issues(result), file=log, flush=True)
+            if "block_report" in result:
+                print("  " + result["block_report"].replace("\n", "\n  "), file=log, flush=True)
+            if "stock" in result:
+                for labels_per_page, name in result["stock"]:
+                    pages = -(-result["labels"] // labels_per_page)
+                    marker = " <-" if name == stock else ""
+                    print(f"  {name:>16} {labels_per_page:>5} labels/page {pages:>6} pages{marker}", file=log, flush=True)
+            failures += failed(result)
+            total_pages += result["pages"]
+            total_bytes += result["bytes"]
+            if "stats" in result:
+                file_stats.append({key: result[key] for key in ("file", "labels", "pages", "seconds", "stats")})
+
+    print(f"\n{len(files)} files, {failures} failed, {total_pages} pages, {total_bytes} bytes, "
+          f"{time.perf_counter() - start:.2f}s total", file=log)
+    if args.stats == "-":
+        json.dump(file_stats, sys.stdout, indent=2)
+        print()
+    elif args.stats:
+        with open(args.stats, "w", encoding="utf-8") as f:
+            json.dump(file_stats, f, indent=2)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,36 +4,73 @@
 # _______________________________________________
 # _______________________________________________
 
+import time
+_startup_t0 = time.perf_counter()
+
 import tkinter as tk
-from tkinter import filedialog, scrolledtext
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from tkinter import filedialog, messagebox, scrolledtext
+from tkinter import font as tkfont
 import sys
 import os
 import tempfile
-import win32api
-import win32print
-import winreg  # Add at the top if not already imported
-
-# Helper to support PyInstaller font packaging
-def resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
 
-# Register font
-pdfmetrics.registerFont(TTFont("LiberationMonoRegular", resource_path("LiberationMono-Regular.ttf")))
+# The PDF engine (ReportLab, the font) and the Windows printing modules are
+# imported on first use, so the window comes up without loading them.
 
 # Globals
 selected_file = None
+selected_encoding = "utf-8"  # the file's encoding as opened, so Save keeps it
 label_blocks = []
+label_rows = []  # file line of each block's count, for reports
 max_width = 0
 error_line = -1
+render_cache = None  # pages unchanged since the last Generate are reused
+label_buffer = None  # validated copy of the editor text, see label_validate
+label_source = None  # a file too big for the editor, see open_large_file
+stock_profiles = {}  # paper stock profiles by name (label_stock), loaded after startup
+current_job = None   # the render running in the background, if any
+collect_stats = "--stats" in sys.argv  # save a .stats.json next to each job
+render_client = None  # label_server.RenderClient, when a render server is configured
+job_handlers = None  # (on_done, on_error, on_cancel) for current_job
+VALIDATE_DELAY_MS = 300
+LARGE_FILE_BYTES = 4 * 2**20  # bigger files open in the read-only view
+
+def get_render_cache():
+    global render_cache
+    if render_cache is None:
+        from label_cache import RenderCache
+        render_cache = RenderCache()
+    return render_cache
+
+# Run with --server ADDRESS (or PINLAB_SERVER=ADDRESS) to render on the
+# workstation's label_server instead of in this process
+SERVER_PRIORITY = 10  # someone is waiting at the bench; ahead of batch runs
+SERVER_TIMEOUT = 2.0  # seconds to wait for the server to answer before rendering locally
+
+def server_address():
+    if "--server" in sys.argv[:-1]:
+        return sys.argv[sys.argv.index("--server") + 1]
+    return os.environ.get("PINLAB_SERVER")
+
+# The server's client, or None to render here (no server configured, or it
+# does not answer)
+def get_render_client():
+    global render_client
+    address = server_address()
+    if not address:
+        return None
+    if render_client is None:
+        from label_server import RenderClient
+        render_client = RenderClient(address, priority=SERVER_PRIORITY)
+    try:
+        render_client.timeout = SERVER_TIMEOUT
+        render_client.status()
+    except (OSError, ValueError) as e:
+        status_bar.config(text=f"⚠️ Render server {address} not available ({e}), rendering locally")
+        return None
+    finally:
+        render_client.timeout = None
+    return render_client
 
 # ---------- Utility ----------
 def center_window(window, width, height):
@@ -43,92 +80,35 @@ def center_window(window, width, height):
     y = int((screen_height / 2) - (height / 2))
     window.geometry(f"{width}x{height}+{x}+{y}")
 
-def parse_label_file(filepath):
-    with open(filepath, "r", encoding="utf-8") as file:
-        lines = [line.strip() for line in file if line.strip() != ""]
-
-    max_width = int(lines[0])
-    label_blocks = []
-    current_block = []
-    i = 1
-    count = -1
-
-    while i < len(lines):
-        if lines[i].isdigit():
-            if current_block:
-                label_blocks.append({"lines": current_block, "count": count})
-                current_block = []
-            count = int(lines[i])
-        else:
-            if count == -1:
-                return max_width, label_blocks, 1
-            if len(lines[i]) > max_width:
-                return max_width, label_blocks, i + 1
-            current_block.append(lines[i])
-        i += 1
-
-    if current_block:
-        label_blocks.append({"lines": current_block, "count": count})
-    return max_width, label_blocks, -1
-
-def generate_label_pdf(output_path, max_width, label_blocks):
-    font_size = 2.9
-    line_spacing = font_size + 0.6
-    column_width = max_width * (font_size * 0.6) + 10
-    page_width, page_height = A4
-    top_margin = 10.3 * mm
-    bottom_margin = 11.3 * mm
-    left_margin = 0 * mm
-    usable_height = page_height - top_margin - bottom_margin
-    lines_per_label = max(len(block["lines"]) for block in label_blocks)
-    height_per_label = lines_per_label * line_spacing + 2.5
-    labels_per_column = int(usable_height // height_per_label)
-    num_columns = int((page_width - left_margin) // column_width)
-
-    c = canvas.Canvas(output_path, pagesize=A4)
-    c.setFont("LiberationMonoRegular", font_size + 0.5)
-
-    current_x = left_margin
-    current_y = page_height - top_margin
-    column = 0
-    label_counter = 0
-
-    def draw_label(label_lines, x, y):
-        for i, line in enumerate(label_lines):
-            c.saveState()
-            c.translate(x, y - i * line_spacing)
-            c.scale(1.0, 1.3)
-            c.drawString(0, 0, line)
-            c.restoreState()
-
-    for block in label_blocks:
-        for _ in range(block["count"]):
-            if label_counter >= labels_per_column:
-                column += 1
-                current_x = left_margin + column * column_width
-                current_y = page_height - top_margin
-                label_counter = 0
-                if column >= num_columns:
-                    c.showPage()
-                    c.setFont("LiberationMonoRegular", font_size + 0.5)
-                    column = 0
-                    current_x = left_margin
-                    current_y = page_height - top_margin
-            draw_label(block["lines"], current_x, current_y - label_counter * height_per_label)
-            label_counter += 1
-    c.save()
-
 # ---------- GUI ----------
 app = tk.Tk()
 app.title("PinLab Label Generator")
 app.configure(bg="#f4f6f9")
-center_window(app, 800, 550)
+center_window(app, 900, 550)
 
 header = tk.Label(app, text="PinLab Label Generator", font=("Segoe UI", 16, "bold"), bg="#0a2036", fg="white", pady=10)
 header.pack(fill=tk.X)
 
-text_display = scrolledtext.ScrolledText(app, wrap=tk.WORD, height=20, state=tk.DISABLED, font=("Consolas", 10))
-text_display.pack(fill=tk.BOTH, expand=True, padx=15, pady=10)
+text_display = scrolledtext.ScrolledText(app, wrap=tk.NONE, height=20, state=tk.DISABLED, font=("Consolas", 10), undo=True)
+text_display.pack(fill=tk.BOTH, expand=True, padx=15, pady=(10, 0))
+text_display.tag_config("error_line", background="#f8d7da")
+
+status_frame = tk.Frame(app, bg="#f4f6f9")
+status_frame.pack(fill=tk.X, padx=15)
+status_bar = tk.Label(status_frame, text="Open a label file to start.", font=("Segoe UI", 9), bg="#f4f6f9", fg="#222222", anchor="w")
+status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+# Paper stock the labels are laid out on; filled in by load_stock_profiles
+stock_var = tk.StringVar(value="a4")
+stock_menu = tk.OptionMenu(status_frame, stock_var, "a4")
+stock_menu.config(font=("Segoe UI", 9), relief=tk.FLAT, highlightthickness=0)
+stock_menu.pack(side=tk.RIGHT)
+tk.Label(status_frame, text="Stock:", font=("Segoe UI", 9), bg="#f4f6f9").pack(side=tk.RIGHT)
+
+# Shown only while a PDF is being rendered
+job_frame = tk.Frame(app, bg="#f4f6f9")
+job_label = tk.Label(job_frame, text="", font=("Segoe UI", 9), bg="#f4f6f9", fg="#222222", anchor="w")
+job_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
 btn_frame = tk.Frame(app, bg="#f4f6f9")
 btn_frame.pack(pady=10)
@@ -146,8 +126,9 @@ btn_style = {
 }
 
 btn_open = tk.Button(btn_frame, text="📂 Open File", **btn_style)
-btn_edit = tk.Button(btn_frame, text="📝 View/Edit", state=tk.DISABLED, **btn_style)
+btn_edit = tk.Button(btn_frame, text="💾 Save", state=tk.DISABLED, **btn_style)
 btn_process = tk.Button(btn_frame, text="⚙️ Process", state=tk.DISABLED, **btn_style)
+btn_preview = tk.Button(btn_frame, text="🔍 Preview", state=tk.DISABLED, **btn_style)
 btn_generate = tk.Button(btn_frame, text="📄 Generate PDF", state=tk.DISABLED, **btn_style)
 btn_print = tk.Button(btn_frame, text="🖨️ Print", state=tk.DISABLED, **btn_style)
 btn_help = tk.Button(btn_frame, text="❓ Help", **btn_style)
@@ -157,16 +138,17 @@ btn_exit = tk.Button(btn_frame, text="❌ Exit", command=app.quit, **btn_style)
 btn_open.grid(row=0, column=0, padx=5)
 btn_edit.grid(row=0, column=1, padx=5)
 btn_process.grid(row=0, column=2, padx=5)
-btn_generate.grid(row=0, column=3, padx=5)
-btn_print.grid(row=0, column=4, padx=5)
-btn_about.grid(row=0, column=5, padx=5)
-btn_help.grid(row=0, column=6, padx=5)
-btn_exit.grid(row=0, column=7, padx=5)
+btn_preview.grid(row=0, column=3, padx=5)
+btn_generate.grid(row=0, column=4, padx=5)
+btn_print.grid(row=0, column=5, padx=5)
+btn_about.grid(row=0, column=6, padx=5)
+btn_help.grid(row=0, column=7, padx=5)
+btn_exit.grid(row=0, column=8, padx=5)
 
 # Hover
 def on_enter(e): e.widget["background"] = "#444444"
 def on_leave(e): e.widget["background"] = "#0a2036"
-for b in [btn_open, btn_edit, btn_process, btn_generate, btn_print, btn_help, btn_about, btn_exit]:
+for b in [btn_open, btn_edit, btn_process, btn_preview, btn_generate, btn_print, btn_help, btn_about, btn_exit]:
     b.bind("<Enter>", on_enter)
     b.bind("<Leave>", on_leave)
 
@@ -200,37 +182,45 @@ HOW TO USE PINLAB LABEL GENERATOR
      - Following lines → Label content
      - A new number → begins a new label block
 
-2. 📝 View/Edit
-   - This opens the selected file in Notepad.
-   - After editing and saving, the file is automatically reloaded in the app.
+2. 💾 Save
+   - Edit the labels directly in the window; lines with errors turn red
+     and the status bar below keeps the block, label and page totals.
+   - Save (or Ctrl+S) writes your changes back to the file.
 
 3. ⚙️ Process
    - Validates the content:
      - Checks for overly long lines
      - Ensures label blocks are correctly formatted
    - You'll see an error if there's any formatting issue, or a success message if it's clean.
+   - The same checks also run by themselves a moment after you stop typing.
+
+4. 🔍 Preview
+   - Shows a quick low-resolution picture of any page, drawn straight from
+     the layout, to check alignment before generating the whole job.
 
-4. 📄 Generate PDF
+5. 📄 Generate PDF
    - Saves your processed labels in a PDF format.
    - You’ll be asked where to save the file.
    - Great for previewing or sharing your labels.
+   - Large jobs render in the background: a progress line shows pages done,
+     labels per second and time left, and Cancel stops after the current page.
 
-5. \U0001F5A8 Print
+6. \U0001F5A8 Print
    - Sends labels directly to your **default connected printer**.
    - To use this successfully:
      - Ensure your printer is **connected and set as default**.
      - Install **Adobe Acrobat Reader** and set it as the **default PDF viewer**.
    - If something is missing, the app will guide you with an error message.
 
-6. ℹ️ About
+7. ℹ️ About
    - Shows you the history of the software:
      - Original version 1.0 built around 20 years ago by Daniel L. Gustafson, Ph.D.
      - This new version 2.0 redesigned in Python in 2025 by Ahmad Jajja.
 
-7. ❓ Help
+8. ❓ Help
    - Displays this guide any time you need it.
 
-8. ❌ Exit
+9. ❌ Exit
    - Closes the app.
 
 💡 Tip: Avoid blank lines in your input file. Keep formatting consistent for best results.
@@ -340,35 +330,491 @@ Built with \u2764 for the scientific research community
     txt.config(state=tk.DISABLED)
 
 
+# ---------- Live validation ----------
+# Every insert/delete on the editor goes through edit_proxy, which only
+# widens the range of rows changed since the last check. After the user
+# stops typing for VALIDATE_DELAY_MS, just those rows are handed to the
+# LabelBuffer, and only the rows it reports back are re-marked.
+dirty_head = None  # rows before this one are unchanged
+dirty_tail = None  # this many rows at the end are unchanged
+validate_job = None
+
+def editor_rows():
+    return int(text_display.index("end-1c").split(".")[0])
+
+def edit_proxy(command, *args):
+    global dirty_head, dirty_tail
+    if command not in ("insert", "delete", "replace"):
+        return app.tk.call((editor_command, command) + args)
+    if command == "insert":
+        last = args[0]
+    elif command == "delete" and len(args) == 1:
+        last = f"{args[0]}+1c"  # the deleted character may be a newline
+    else:
+        last = args[1]
+    first = app.tk.call(editor_command, "index", args[0])
+    last = app.tk.call(editor_command, "index", last)
+    tail_before = max(0, editor_rows() - int(str(last).split(".")[0]))
+    result = app.tk.call((editor_command, command) + args)
+    if label_buffer is not None:
+        head = int(str(first).split(".")[0]) - 1
+        dirty_head = head if dirty_head is None else min(dirty_head, head)
+        dirty_tail = tail_before if dirty_tail is None else min(dirty_tail, tail_before)
+        schedule_validation()
+    return result
+
+editor_command = text_display._w + "_editor"
+app.tk.call("rename", text_display._w, editor_command)
+app.tk.createcommand(text_display._w, edit_proxy)
+
+def schedule_validation():
+    global validate_job
+    if validate_job is not None:
+        app.after_cancel(validate_job)
+    validate_job = app.after(VALIDATE_DELAY_MS, validate_edits)
+
+def validate_edits():
+    global validate_job, dirty_head, dirty_tail
+    validate_job = None
+    if label_buffer is None or dirty_head is None:
+        return
+    rows = editor_rows()
+    head, tail = dirty_head, dirty_tail
+    dirty_head = dirty_tail = None
+    new_lines = text_display.get(f"{head + 1}.0", f"{rows - tail}.end").split("\n")
+    changed = label_buffer.replace_lines(head, label_buffer.rows - tail, new_lines)
+    mark_errors(changed)
+    update_status()
+
+def mark_errors(changed):
+    if changed is None:
+        first, last = 0, label_buffer.rows
+    else:
+        first, last = changed
+    text_display.tag_remove("error_line", f"{first + 1}.0", f"{last + 1}.0")
+    for row, _ in label_buffer.errors(first, last):
+        text_display.tag_add("error_line", f"{row + 1}.0", f"{row + 2}.0")
+
+def update_status():
+    from label_validate import layout_totals
+
+    profile = current_profile()
+    if label_buffer is not None:
+        totals, error = label_buffer.totals(profile), label_buffer.first_error()
+    elif source_result is not None:
+        r = source_result
+        totals = layout_totals(r["max_width"], r["lines_per_label"], r["totals"]["blocks"], r["totals"]["labels"],
+                               profile)
+        error = r["error"]
+    else:
+        return
+    text = f"{totals['blocks']} label blocks, {totals['labels']} labels → {totals['pages']} pages"
+    if error is not None:
+        text += f"   ❌ Line {error[0] + 1}: {error[1]}"
+    elif totals["layout_error"]:
+        text += f"   ❌ {totals['layout_error']}"
+    status_bar.config(text=text)
+    valid = error is None and not totals["layout_error"] and totals["blocks"] > 0
+    ready = valid and current_job is None
+    btn_preview.config(state=tk.NORMAL if valid else tk.DISABLED)
+    btn_generate.config(state=tk.NORMAL if ready else tk.DISABLED)
+    btn_print.config(state=tk.NORMAL if ready else tk.DISABLED)
+
+# Hands the validated editor contents (or the checked large file) to
+# Generate and Print
+def take_label_data():
+    global max_width, label_blocks, label_rows, error_line
+    if label_buffer is None:
+        error = source_result["error"]
+        max_width = source_result["max_width"]
+        label_blocks = source_result["label_blocks"]
+        label_rows = source_result["block_rows"]
+    else:
+        validate_edits()
+        error = label_buffer.first_error()
+        max_width = label_buffer.max_width
+        label_blocks = label_buffer.label_blocks()
+        label_rows = label_buffer.block_rows()
+    error_line = -1 if error is None else error[0] + 1
+
+# Repeated blocks (label_index) are shown before a job; the user can merge them
+# so each block is rendered once with its total count. False means cancel.
+def merge_repeated_blocks():
+    from label_index import BlockIndex
+
+    global label_blocks
+    index = BlockIndex(label_blocks, label_rows)
+    if not index.duplicates():
+        return True
+    answer = messagebox.askyesnocancel(
+        "Repeated label blocks",
+        index.report(limit=10) + "\n\nMerge them, so the copies of each block print together?")
+    if answer is None:
+        return False
+    if answer:
+        label_blocks = index.merged_blocks()
+    return True
+
+# ---------- Large files ----------
+# Files over LARGE_FILE_BYTES are not loaded into the editor. The text widget
+# only holds the rows that fit in it, read from a LabelSource (label_source)
+# whenever the view moves, and the scrollbar stands for the whole file. The
+# view is read-only; the file is checked with the editor's rules on a worker
+# thread, so it can be scrolled while the check runs.
+view_top = 0          # file row shown at the top of the view
+source_check = None   # BackgroundJob running check_label_file
+source_result = None  # what check_label_file returned
+line_height = None
+
+def view_rows():
+    global line_height
+    if line_height is None:
+        line_height = tkfont.Font(font=text_display.cget("font")).metrics("linespace")
+    height = text_display.winfo_height()
+    return max(1, height // line_height if height > 1 else int(text_display.cget("height")))
+
+def set_large_view(on):
+    if on:
+        text_display.config(yscrollcommand="", undo=False)
+        text_display.vbar.config(command=scroll_view)
+    else:
+        text_display.config(yscrollcommand=text_display.vbar.set, undo=True)
+        text_display.vbar.config(command=text_display.yview)
+
+def show_view(top):
+    global view_top
+    rows = view_rows()
+    view_top = max(0, min(top, label_source.line_count - rows))
+    lines = label_source.lines(view_top, view_top + rows)
+    text_display.config(state=tk.NORMAL)
+    text_display.delete("1.0", tk.END)
+    text_display.insert("1.0", "\n".join(lines))
+    if source_result is not None and source_result["error"] is not None:
+        row = source_result["error"][0] - view_top
+        if 0 <= row < len(lines):
+            text_display.tag_add("error_line", f"{row + 1}.0", f"{row + 2}.0")
+    text_display.config(state=tk.DISABLED)
+    total = label_source.line_count
+    text_display.vbar.set(view_top / total, (view_top + len(lines)) / total)
+
+def show_row(row):
+    # Brings a 0-based file row into view, in either mode
+    if label_source is not None:
+        show_view(row - view_rows() // 2)
+    else:
+        text_display.see(f"{row + 1}.0")
+
+def scroll_view(action, amount, unit=None):
+    # Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" or "pages")
+    if action == "moveto":
+        show_view(int(float(amount) * label_source.line_count))
+    else:
+        step = view_rows() if unit == "pages" else 1
+        show_view(view_top + int(amount) * step)
+
+def on_view_wheel(event):
+    if label_source is None:
+        return None
+    if event.num == 4 or event.delta > 0:
+        show_view(view_top - 3)
+    else:
+        show_view(view_top + 3)
+    return "break"
+
+def on_view_key(event):
+    if label_source is None:
+        return None
+    moves = {"Prior": -view_rows(), "Next": view_rows(), "Up": -1, "Down": 1}
+    if event.keysym in moves:
+        show_view(view_top + moves[event.keysym])
+    elif event.keysym == "Home":
+        show_view(0)
+    elif event.keysym == "End":
+        show_view(label_source.line_count)
+    else:
+        return None
+    return "break"
+
+for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+    text_display.bind(sequence, on_view_wheel)
+for sequence in ("<Prior>", "<Next>", "<Up>", "<Down>", "<Control-Home>", "<Control-End>"):
+    text_display.bind(sequence, on_view_key)
+text_display.bind("<Configure>", lambda e: show_view(view_top) if label_source is not None else None)
+
+def open_large_file():
+    from label_jobs import BackgroundJob
+    from label_source import LabelSource
+    from label_validate import check_label_file
+
+    global label_buffer, label_source, source_check, source_result, dirty_head, dirty_tail
+    label_buffer = None
+    dirty_head = dirty_tail = None
+    label_source = LabelSource(selected_file)
+    source_result = None
+    set_large_view(True)
+    show_view(0)
+    btn_edit.config(state=tk.DISABLED)  # read-only
+    btn_process.config(state=tk.NORMAL)
+    for button in (btn_preview, btn_generate, btn_print):
+        button.config(state=tk.DISABLED)
+    status_bar.config(text=f"{label_source.line_count} lines, {label_source.size / 2**20:.0f} MB "
+                           f"({label_source.encoding}), read-only. Checking...")
+    path = selected_file
+    source_check = BackgroundJob(lambda progress: check_label_file(path, progress))
+    source_check.start()
+    app.after(JOB_POLL_MS, poll_source_check, source_check)
+
+def poll_source_check(job):
+    global source_check, source_result
+    if job is not source_check:
+        return  # another file was opened since
+    for kind, value in job.poll():
+        if kind == "progress":
+            status_bar.config(text=f"Checking line {value} of {label_source.line_count}...")
+            continue
+        source_check = None
+        if kind == "done":
+            source_result = value
+            show_view(view_top)  # marks the error row if it is in view
+            update_status()
+        elif kind == "error":
+            status_bar.config(text=f"❌ The file could not be read: {value}")
+        return
+    app.after(JOB_POLL_MS, poll_source_check, job)
+
+def close_label_source():
+    global label_source, source_check, source_result
+    if source_check is not None:
+        source_check.cancel()
+        source_check = None
+    if label_source is not None:
+        label_source.close()
+        label_source = None
+    source_result = None
+
+# ---------- Paper stock ----------
+# Profiles come from pinlab_stock.json next to the program (see label_stock);
+# the selected one is used for the page totals, Preview, Generate and Print.
+def load_stock_profiles():
+    from label_stock import BUILTIN_PROFILES, DEFAULT_PROFILE_NAME, load_profiles
+
+    global stock_profiles
+    try:
+        stock_profiles, default = load_profiles()
+    except (OSError, ValueError) as e:
+        stock_profiles, default = dict(BUILTIN_PROFILES), DEFAULT_PROFILE_NAME
+        status_bar.config(text=f"⚠️ Stock profiles not loaded: {e}")
+    menu = stock_menu["menu"]
+    menu.delete(0, tk.END)
+    for name in stock_profiles:
+        menu.add_command(label=name, command=lambda name=name: select_stock(name))
+    stock_var.set(default)
+
+def select_stock(name):
+    stock_var.set(name)
+    update_status()
+
+def current_profile():
+    return stock_profiles.get(stock_var.get())
+
 # ---------- Actions ----------
 def open_file():
-    global selected_file
+    from label_source import text_encoding
+    from label_validate import LabelBuffer
+
+    global selected_file, selected_encoding, label_buffer, dirty_head, dirty_tail
     selected_file = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
     if selected_file:
-        btn_edit.config(state=tk.NORMAL)
-        btn_process.config(state=tk.NORMAL)
-        btn_generate.config(state=tk.DISABLED)
-        btn_print.config(state=tk.DISABLED)
+        close_label_source()
+        if os.path.getsize(selected_file) > LARGE_FILE_BYTES:
+            open_large_file()
+            return
+        selected_encoding = text_encoding(selected_file)
+        with open(selected_file, "r", encoding=selected_encoding) as f:
+            content = f.read()
+        label_buffer = None  # the load below is not an edit
+        set_large_view(False)
         text_display.config(state=tk.NORMAL)
         text_display.delete("1.0", tk.END)
-        with open(selected_file, "r", encoding="utf-8") as f:
-            text_display.insert(tk.END, f.read())
-        text_display.config(state=tk.DISABLED)
+        text_display.insert(tk.END, content)
+        text_display.edit_reset()
+        label_buffer = LabelBuffer(text_display.get("1.0", "end-1c").split("\n"))
+        dirty_head = dirty_tail = None
+        btn_edit.config(state=tk.NORMAL)
+        btn_process.config(state=tk.NORMAL)
+        mark_errors(None)
+        update_status()
+
+def save_file(event=None):
+    if not selected_file or label_buffer is None:
+        return
+    validate_edits()
+    with open(selected_file, "w", encoding=selected_encoding) as f:
+        f.write(label_buffer.text())
+    status_bar.config(text=status_bar.cget("text") + "   (saved)")
 
 def process_file():
-    global max_width, label_blocks, error_line
-    max_width, label_blocks, error_line = parse_label_file(selected_file)
-    text_display.config(state=tk.NORMAL)
-    text_display.delete("1.0", tk.END)
-    if error_line != -1:
-        text_display.insert(tk.END, f"❌ ERROR: Check line {error_line} in input file.\n")
-        btn_generate.config(state=tk.DISABLED)
-        btn_print.config(state=tk.DISABLED)
+    from label_index import BlockIndex
+    from label_layout import LayoutPlan
+    from label_stock import rank_profiles
+    from label_validate import glyph_warnings
+
+    if label_buffer is None and source_result is None:
+        show_popup("Validation", "⏳ The file is still being checked. Try again in a moment.")
+        return
+    take_label_data()
+    if error_line != -1 or not label_blocks:
+        message = "❌ ERROR: No label blocks found." if error_line == -1 else f"❌ ERROR: Check line {error_line} in input file."
+        show_popup("Validation", message)
+        show_row(max(error_line, 1) - 1)
     else:
-        text_display.insert(tk.END, f"✅ No errors found. Ready to generate PDF or print.\n")
-        btn_generate.config(state=tk.NORMAL)
-        btn_print.config(state=tk.NORMAL)
-    text_display.config(state=tk.DISABLED)
+        try:
+            summary = LayoutPlan(max_width, label_blocks, profile=current_profile()).summary()
+        except ValueError as e:
+            show_popup("Validation", f"❌ ERROR: {e}")
+            return
+        repeated = BlockIndex(label_blocks).summary()["merged_blocks"]
+        best = rank_profiles(max_width, summary["lines_per_label"], stock_profiles)[:1]
+        boxes = glyph_warnings(label_blocks)
+        box_note = ""
+        if boxes:
+            shown = "\n".join(f"   block at line {label_rows[block]}: {line}  ({' '.join(repr(c) for c in missing)})"
+                              for block, line, missing in boxes[:5])
+            box_note = (f"\n\n⚠️ {len(boxes)} label lines use characters the label font does not have; "
+                        f"they print as empty boxes:\n{shown}" + ("\n   ..." if len(boxes) > 5 else ""))
+        show_popup("Validation", f"✅ No errors found. Ready to generate PDF or print.\n\n"
+                                 f"{summary['blocks']} label blocks, {summary['labels']} labels "
+                                 f"→ {summary['pages']} pages ({summary['labels_per_page']} labels per page)"
+                                 + (f"\n\n{repeated} blocks repeat an earlier block; you can merge them "
+                                    f"when you generate or print." if repeated else "")
+                                 + (f"\n\nThe '{best[0][1]}' stock fits the most: {best[0][0]} labels per page."
+                                    if best and best[0][0] > summary["labels_per_page"] else "")
+                                 + box_note)
+
+def show_preview():
+    from PIL import ImageTk
+    from label_layout import LayoutPlan
+    from label_preview import render_preview_page
+
+    take_label_data()
+    plan = LayoutPlan(max_width, label_blocks, profile=current_profile())
+
+    win = tk.Toplevel(app)
+    win.title("Preview")
+    center_window(win, 760, 640)
+    win.configure(bg="white")
+
+    controls = tk.Frame(win, bg="white")
+    controls.pack(fill=tk.X, padx=10, pady=5)
+    page_var = tk.IntVar(value=1)
+    page_label = tk.Label(controls, text="", font=("Segoe UI", 10), bg="white")
+
+    frame = tk.Frame(win)
+    frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+    canvas = tk.Canvas(frame, bg="#888888", highlightthickness=0)
+    yscroll = tk.Scrollbar(frame, orient=tk.VERTICAL, command=canvas.yview)
+    xscroll = tk.Scrollbar(frame, orient=tk.HORIZONTAL, command=canvas.xview)
+    canvas.config(yscrollcommand=yscroll.set, xscrollcommand=xscroll.set)
+    yscroll.pack(side=tk.RIGHT, fill=tk.Y)
+    xscroll.pack(side=tk.BOTTOM, fill=tk.X)
+    canvas.pack(fill=tk.BOTH, expand=True)
+
+    def show_page(page):
+        page = max(1, min(page, plan.total_pages))
+        page_var.set(page)
+        start = time.perf_counter()
+        photo = ImageTk.PhotoImage(render_preview_page(plan, page - 1))
+        elapsed = time.perf_counter() - start
+        canvas.delete("all")
+        canvas.create_image(0, 0, image=photo, anchor="nw")
+        canvas.image = photo  # keep a reference or Tk drops the image
+        canvas.config(scrollregion=(0, 0, photo.width(), photo.height()))
+        page_label.config(text=f"Page {page} of {plan.total_pages}  ({elapsed * 1000:.0f} ms)")
+
+    tk.Button(controls, text="◀", width=3, command=lambda: show_page(page_var.get() - 1)).pack(side=tk.LEFT)
+    page_entry = tk.Spinbox(controls, from_=1, to=plan.total_pages, textvariable=page_var, width=6,
+                            command=lambda: show_page(page_var.get()))
+    page_entry.bind("<Return>", lambda e: show_page(page_var.get()))
+    page_entry.pack(side=tk.LEFT, padx=5)
+    tk.Button(controls, text="▶", width=3, command=lambda: show_page(page_var.get() + 1)).pack(side=tk.LEFT)
+    page_label.pack(side=tk.LEFT, padx=10)
+    show_page(1)
+
+# ---------- Background jobs ----------
+# Renders run on a worker thread (label_jobs.RenderJob); this side polls its
+# queue every JOB_POLL_MS and is the only one touching Tk widgets.
+JOB_POLL_MS = 100
+
+def run_job(work, on_done, on_error, on_cancel=None):
+    from label_jobs import RenderJob
+    from label_layout import LayoutPlan
+
+    global current_job, job_handlers
+    if current_job is not None:
+        show_popup("Busy", "⏳ A PDF is already being generated.\n\nWait for it to finish or press Cancel first.")
+        return
+    plan = LayoutPlan(max_width, label_blocks, profile=current_profile())
+    current_job = RenderJob(work, plan.total_labels, plan.labels_per_page)
+    job_handlers = (on_done, on_error, on_cancel)
+    btn_generate.config(state=tk.DISABLED)
+    btn_print.config(state=tk.DISABLED)
+    btn_cancel.config(state=tk.NORMAL)
+    job_label.config(text=f"Rendering {plan.total_labels} labels on {plan.total_pages} pages...")
+    job_frame.pack(fill=tk.X, padx=15, before=btn_frame)
+    current_job.start()
+    app.after(JOB_POLL_MS, poll_job)
+
+def poll_job():
+    global current_job
+    job = current_job
+    for kind, value in job.poll():
+        if kind == "progress":
+            eta = "" if value["eta_seconds"] is None else f", about {value['eta_seconds']:.0f}s left"
+            job_label.config(text=f"Page {value['pages']}/{value['total_pages']}, "
+                                  f"{value['labels']}/{value['total_labels']} labels, "
+                                  f"{value['labels_per_second']:.0f} labels/s{eta}")
+            continue
+        current_job = None
+        job_frame.pack_forget()
+        update_status()
+        on_done, on_error, on_cancel = job_handlers
+        if kind == "done":
+            on_done(value)
+        elif kind == "error":
+            on_error(value)
+        elif on_cancel is not None:
+            on_cancel()
+        return
+    app.after(JOB_POLL_MS, poll_job)
+
+def cancel_job():
+    if current_job is not None:
+        current_job.cancel()
+        btn_cancel.config(state=tk.DISABLED)
+        job_label.config(text="Cancelling after the current page...")
+
+btn_cancel = tk.Button(job_frame, text="Cancel", command=cancel_job, **dict(btn_style, width=8))
+btn_cancel.pack(side=tk.RIGHT)
+
+# Timings and counters of a job (label_stats), only when run with --stats
+def new_job_stats():
+    if not collect_stats:
+        return None
+    from label_stats import RenderStats
+    return RenderStats()
+
+def save_job_stats(stats, path):
+    if stats is None:
+        return ""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(stats.to_json())
+    return f"\n\nRender details saved to:\n{path}"
+
+def remove_partial_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 def generate_pdf_file():
     if not selected_file:
@@ -380,8 +826,33 @@ def generate_pdf_file():
         filetypes=[("PDF files", "*.pdf")]
     )
     if output_file:
-        generate_label_pdf(output_file, max_width, label_blocks)
-        show_popup("Success", f"✅ PDF saved to:\n{output_file}")
+        from label_cache import generate_label_pdf_cached
+        take_label_data()
+        if not merge_repeated_blocks():
+            return
+        job_max_width, job_blocks, cache = max_width, label_blocks, get_render_cache()
+        profile = current_profile()
+        stats = new_job_stats()
+        client = get_render_client()
+
+        def render(progress):
+            if client is not None:
+                with open(output_file, "wb") as out:
+                    return client.render_blocks(job_max_width, job_blocks, out, profile=profile,
+                                                progress=progress)["pages"]
+            return generate_label_pdf_cached(output_file, job_max_width, job_blocks, cache, progress, stats, profile)
+
+        def on_error(e):
+            remove_partial_file(output_file)
+            show_popup("Error", f"❌ The PDF could not be generated.\n\n(Error: {e})")
+
+        run_job(
+            render,
+            lambda pages: show_popup("Success", f"✅ PDF saved to:\n{output_file}"
+                                                + save_job_stats(stats, output_file + ".stats.json")),
+            on_error,
+            lambda: remove_partial_file(output_file),
+        )
 
 
 # def print_pdf_file():
@@ -405,10 +876,7 @@ def generate_pdf_file():
 
 # ---------------- Second working print function---------------------------
 
-import subprocess
 import tempfile
-import threading
-import win32print
 import os
 
 def find_adobe_executable():
@@ -447,42 +915,67 @@ def find_adobe_executable():
 #         return False
 
 def print_pdf_file():
-    print("adobe_path : ", find_adobe_executable())
-    def do_print():
-        try:
-            printer_name = win32print.GetDefaultPrinter()
-            hPrinter = win32print.OpenPrinter(printer_name)
-            info = win32print.GetPrinter(hPrinter, 2)
-            win32print.ClosePrinter(hPrinter)
-
-            # Check status
-            status = info["Status"]
-            PRINTER_STATUS_OFFLINE = 0x00000080
-            PRINTER_STATUS_ERROR = 0x00000002
-            PRINTER_STATUS_PAUSED = 0x00000001
-
-            if status & (PRINTER_STATUS_OFFLINE | PRINTER_STATUS_ERROR | PRINTER_STATUS_PAUSED):
-                raise Exception(f"Printer '{printer_name}' is not ready (paused, offline, or error state).")
-
-            adobe_path = find_adobe_executable()
-            print("adobe_path : ", adobe_path)
-            if not adobe_path:
-                raise Exception("Adobe Reader or Acrobat not found in known locations.")
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-                generate_label_pdf(temp_pdf.name, max_width, label_blocks)
-
-            subprocess.run([adobe_path, "/p", "/h", temp_pdf.name], check=False)
-
-            show_popup(
-                "Sent to Printer",
-                f"Print command sent to: {printer_name}\nPlease check the printer output or print queue manually."
-            )
-
-        except Exception as e:
-            show_popup(
-                "Printer Error",
-                f"""Printing Failed!
+    take_label_data()
+    if not merge_repeated_blocks():
+        return
+    job_max_width, job_blocks, cache = max_width, label_blocks, get_render_cache()
+    profile = current_profile()
+    client = get_render_client()
+    title = os.path.basename(selected_file)
+    stats = new_job_stats()
+    stats_path = os.path.splitext(selected_file)[0] + "_print.stats.json"
+
+    # Pages go to the printer backend (label_print) as soon as each is drawn
+    def do_print(progress):
+        from label_print import AcrobatBackend, LpBackend, print_labels
+
+        if os.name != "nt":
+            import shutil
+            if not shutil.which("lp"):
+                raise Exception("The `lp` print command (CUPS) was not found.")
+            result = print_labels(LpBackend(), job_max_width, job_blocks, title, cache, progress, stats, profile,
+                                  client)
+            result["printer"] = "the default printer"
+            return result
+
+        import win32print
+
+        printer_name = win32print.GetDefaultPrinter()
+        hPrinter = win32print.OpenPrinter(printer_name)
+        info = win32print.GetPrinter(hPrinter, 2)
+        win32print.ClosePrinter(hPrinter)
+
+        # Check status
+        status = info["Status"]
+        PRINTER_STATUS_OFFLINE = 0x00000080
+        PRINTER_STATUS_ERROR = 0x00000002
+        PRINTER_STATUS_PAUSED = 0x00000001
+
+        if status & (PRINTER_STATUS_OFFLINE | PRINTER_STATUS_ERROR | PRINTER_STATUS_PAUSED):
+            raise Exception(f"Printer '{printer_name}' is not ready (paused, offline, or error state).")
+
+        adobe_path = find_adobe_executable()
+        if not adobe_path:
+            raise Exception("Adobe Reader or Acrobat not found in known locations.")
+
+        result = print_labels(AcrobatBackend(adobe_path), job_max_width, job_blocks, title, cache, progress, stats,
+                              profile, client)
+        result["printer"] = printer_name
+        return result
+
+    def on_done(result):
+        show_popup(
+            "Sent to Printer",
+            f"Print command sent to: {result['printer']}\nPlease check the printer output or print queue manually.\n\n"
+            + ("First page reached the spooler" if result["streamed"] else "First page rendered")
+            + f" after {result['first_page_seconds']:.1f}s (whole job {result['seconds']:.1f}s)."
+            + save_job_stats(stats, stats_path)
+        )
+
+    def on_error(e):
+        show_popup(
+            "Printer Error",
+            f"""Printing Failed!
 
 Steps to fix:
 1. Select the correct printer as your default printer.
@@ -492,31 +985,58 @@ Steps to fix:
 
 (Error: {str(e)})
 """
-            )
+        )
 
-    threading.Thread(target=do_print, daemon=True).start()
+    run_job(do_print, on_done, on_error)
 
 
 
-def edit_file():
-    if not selected_file: return
-    os.system(f'notepad "{selected_file}"')
-    text_display.config(state=tk.NORMAL)
-    text_display.delete("1.0", tk.END)
-    with open(selected_file, "r", encoding="utf-8") as f:
-        text_display.insert(tk.END, f.read())
-    text_display.config(state=tk.DISABLED)
-
 # ---------- Bind ----------
 btn_open.config(command=open_file)
-btn_edit.config(command=edit_file)
+btn_edit.config(command=save_file)
+app.bind("<Control-s>", save_file)
 btn_process.config(command=process_file)
+btn_preview.config(command=show_preview)
 btn_generate.config(command=generate_pdf_file)
 btn_print.config(command=print_pdf_file)
 btn_help.config(command=show_help)
 btn_about.config(command=show_about)
 
+# ---------- Startup timing ----------
+# Run with --measure-startup to see how long the window took to appear and
+# what the first and second renders cost (the first one loads the engine and
+# the font).
+def report_startup_timing():
+    window_ready = time.perf_counter() - _startup_t0
+
+    start = time.perf_counter()
+    from label_maker import LabelBlock, generate_label_pdf
+    engine_import = time.perf_counter() - start
+
+    sample = [LabelBlock(("MONT: Lincoln Co.", "Scenery Mountain Trail", "48.4160°N,115.7173°W"), 10)]
+    renders = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("first.pdf", "second.pdf"):
+            start = time.perf_counter()
+            generate_label_pdf(os.path.join(tmp, name), 25, sample)
+            renders.append(time.perf_counter() - start)
+
+    report = (
+        "Startup timing\n"
+        f"  window ready:   {window_ready * 1000:7.1f} ms\n"
+        f"  engine import:  {engine_import * 1000:7.1f} ms\n"
+        f"  first render:   {renders[0] * 1000:7.1f} ms (includes font load)\n"
+        f"  second render:  {renders[1] * 1000:7.1f} ms\n"
+    )
+    print(report)
+    text_display.config(state=tk.NORMAL)
+    text_display.insert(tk.END, report)
+    text_display.config(state=tk.DISABLED)
+
 # ---------- Start ----------
+app.after(0, load_stock_profiles)
+if "--measure-startup" in sys.argv:
+    app.after(0, report_startup_timing)
 app.mainloop()
 
 
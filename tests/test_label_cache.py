@@ -0,0 +1,42 @@
+# RenderCache entries damaged on disk are redrawn, not fatal.
+#
+#   python -m pytest tests/
+
+import glob
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_cache import RenderCache, generate_label_pdf_cached
+from label_maker import parse_label_file
+
+SAMPLE = os.path.join(ROOT, "Part 2 Summer Labels D.txt")
+
+class DamagedEntryTest(unittest.TestCase):
+    def test_redrawn(self):
+        max_width, blocks, error_line = parse_label_file(SAMPLE)
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_label_pdf_cached(io.BytesIO(), max_width, blocks, RenderCache(tmp))
+            expected = io.BytesIO()
+            generate_label_pdf_cached(expected, max_width, blocks, RenderCache(tmp))
+            pages = sorted(glob.glob(os.path.join(tmp, "*.page")))
+            open(pages[0], "wb").close()  # zero-length
+            with open(pages[1], "r+b") as f:
+                f.truncate(10)
+
+            cache = RenderCache(tmp)
+            out = io.BytesIO()
+            generate_label_pdf_cached(out, max_width, blocks, cache)
+            self.assertEqual((cache.hits, cache.misses), (len(pages) - 2, 2))
+            self.assertEqual(len(out.getvalue()), len(expected.getvalue()))
+            cache = RenderCache(tmp)
+            generate_label_pdf_cached(io.BytesIO(), max_width, blocks, cache)
+            self.assertEqual(cache.misses, 0)
+
+if __name__ == "__main__":
+    unittest.main()
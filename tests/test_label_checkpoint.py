@@ -0,0 +1,125 @@
+# label_checkpoint: resuming an interrupted job, and redrawing a segment
+# whose file changed, against a straight streamed render.
+#
+#   python -m pytest tests/
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import test_label_maker
+from label_checkpoint import JOURNAL_NAME, generate_label_pdf_resumable, work_dir_for
+from label_codes import LabelSerials
+from label_maker import generate_label_pdf_stream, parse_label_file
+from label_stats import RenderStats
+
+SAMPLE = os.path.join(ROOT, "Part 2 Summer Labels D.txt")
+SEGMENT_PAGES = 2
+
+class Interrupted(Exception):
+    pass
+
+def stop_after(pages_done):
+    def progress(done, pages):
+        if done >= pages_done:
+            raise Interrupted
+    return progress
+
+class ResumableTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.max_width, cls.blocks, error_line = parse_label_file(SAMPLE)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.output = os.path.join(self.tmp.name, "labels.pdf")
+        self.work_dir = work_dir_for(self.output)
+
+    def expected(self, serials=None):
+        path = os.path.join(self.tmp.name, "stream.pdf")
+        pages = generate_label_pdf_stream(path, self.max_width, self.blocks, serials=serials)
+        return pages, test_label_maker.page_contents(path)
+
+    def run_job(self, blocks=None, serials=None, progress=None):
+        stats = RenderStats()
+        pages = generate_label_pdf_resumable(self.output, self.max_width, self.blocks if blocks is None else blocks,
+                                             SEGMENT_PAGES, serials=serials, progress=progress, stats=stats)
+        return pages, stats.counters
+
+    def interrupt(self, pages_done, serials=None):
+        with self.assertRaises(Interrupted):
+            self.run_job(serials=serials, progress=stop_after(pages_done))
+        self.assertFalse(os.path.exists(self.output))
+        with open(os.path.join(self.work_dir, JOURNAL_NAME), encoding="utf-8") as f:
+            return json.load(f)
+
+    def segment_path(self, segment):
+        return os.path.join(self.work_dir, f"{segment:05d}.seg")
+
+    def test_uninterrupted(self):
+        pages, contents = self.expected()
+        self.assertEqual(self.run_job(), (pages, {"segments_resumed": 0, "segments_rehashed": 0,
+                                                  "segments_drawn": 3}))
+        self.assertEqual(test_label_maker.page_contents(self.output), contents)
+        self.assertFalse(os.path.exists(self.work_dir))
+
+    def test_resume_after_interrupt(self):
+        for serials in (None, LabelSerials("NHM-", 7, code="datamatrix")):
+            with self.subTest(serials=serials is not None):
+                if os.path.exists(self.output):
+                    os.remove(self.output)  # the first pass's
+                pages, contents = self.expected(serials)
+                journal = self.interrupt(2 * SEGMENT_PAGES, serials)
+                self.assertEqual(sorted(journal["segments"]), ["0", "1"])
+                self.assertEqual(journal["pages_done"], 2 * SEGMENT_PAGES)
+                done = []
+                result = self.run_job(serials=serials, progress=lambda done_pages, total: done.append(done_pages))
+                self.assertEqual(result[0], pages)
+                self.assertEqual(result[1]["segments_resumed"], 2)
+                self.assertEqual(result[1]["segments_drawn"], -(-pages // SEGMENT_PAGES) - 2)
+                self.assertEqual(done[0], 2 * SEGMENT_PAGES)
+                self.assertEqual(done[-1], pages)
+                self.assertEqual(test_label_maker.page_contents(self.output), contents)
+                self.assertFalse(os.path.exists(self.work_dir))
+
+    def test_corrupted_segment_redrawn(self):
+        pages, contents = self.expected()
+        self.interrupt(2 * SEGMENT_PAGES)
+        with open(self.segment_path(1), "ab") as f:
+            f.write(b"\0garbage")
+        pages_written, counters = self.run_job()
+        self.assertEqual(counters, {"segments_resumed": 1, "segments_rehashed": 1, "segments_drawn": 2})
+        self.assertEqual(test_label_maker.page_contents(self.output), contents)
+
+    def test_touched_segment_kept(self):
+        self.interrupt(2 * SEGMENT_PAGES)
+        st = os.stat(self.segment_path(0))
+        os.utime(self.segment_path(0), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        pages_written, counters = self.run_job()
+        self.assertEqual(counters, {"segments_resumed": 2, "segments_rehashed": 1, "segments_drawn": 1})
+
+    def test_changed_job_starts_over(self):
+        self.interrupt(2 * SEGMENT_PAGES)
+        stale = os.path.join(self.work_dir, "99999.seg")
+        with open(stale, "wb") as f:
+            f.write(b"left over")
+        blocks = list(self.blocks)
+        blocks[0] = type(blocks[0])(blocks[0]["lines"], blocks[0]["count"] + 1)
+        pages_written, counters = self.run_job(blocks=blocks)
+        self.assertEqual(counters["segments_resumed"], 0)
+        self.assertEqual(counters["segments_drawn"], -(-pages_written // SEGMENT_PAGES))
+        self.assertFalse(os.path.exists(self.work_dir))
+
+    def test_bad_segment_size(self):
+        with self.assertRaisesRegex(ValueError, "1 page or more"):
+            generate_label_pdf_resumable(self.output, self.max_width, self.blocks, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+# label_codes: QR and DataMatrix codes against a full encoding and read
+# back, and the symbols shared between jobs.
+#
+#   python -m pytest tests/
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reportlab.graphics.barcode import qrencoder
+
+import label_codes
+from label_codes import DATAMATRIX_SIZES, QR_LEVELS, DataMatrixSymbol, QRSymbol, code_symbol
+
+try:
+    import zxingcpp
+    from PIL import Image
+except ImportError:  # optional: decode with an independent reader
+    zxingcpp = None
+
+PAYLOADS = ["NHM-000123", "000000123456", "nhm-000123", "PinLab 2024/07 #1", "Åland-é"]
+
+def gf_multiply(a, b):
+    # GF(256) modulo 0x12D, as DataMatrix uses
+    product = 0
+    while b:
+        if b & 1:
+            product ^= a
+        a <<= 1
+        if a & 0x100:
+            a ^= 0x12D
+        b >>= 1
+    return product
+
+def gf_power(a, n):
+    result = 1
+    for _ in range(n):
+        result = gf_multiply(result, a)
+    return result
+
+def dm_read_codewords(symbol, rows):
+    # The codewords a reader gets back from the module rows of a symbol
+    codewords = [0] * (symbol.capacity + symbol.error_count)
+    block = symbol.region_size + 2
+    for row in range(symbol.size):
+        region_row, r = divmod(row, block)
+        for col in range(symbol.size):
+            region_col, c = divmod(col, block)
+            if c in (0, block - 1) or r in (0, block - 1):
+                continue
+            place = symbol._placement[region_row * symbol.region_size + r - 1][
+                region_col * symbol.region_size + c - 1]
+            if not isinstance(place, bool) and rows[row][col]:
+                codewords[place[0]] |= place[1]
+    return codewords
+
+def dm_decode_ascii(codewords):
+    text = ""
+    shift = False
+    for value in codewords:
+        if value == 129:
+            break  # pad
+        if shift:
+            text += chr(value + 127)
+            shift = False
+        elif value == 235:
+            shift = True
+        elif value >= 130:
+            text += f"{value - 130:02d}"
+        else:
+            text += chr(value - 1)
+    return text
+
+def render(rows, quiet_zone, scale=4):
+    size = len(rows) + 2 * quiet_zone
+    image = Image.new("L", (size * scale, size * scale), 255)
+    for r, row in enumerate(rows):
+        for c, dark in enumerate(row):
+            if dark:
+                x, y = (c + quiet_zone) * scale, (r + quiet_zone) * scale
+                image.paste(0, (x, y, x + scale, y + scale))
+    return image
+
+class QRTest(unittest.TestCase):
+    def reportlab_rows(self, symbol, payload):
+        qr = qrencoder.QRCode(symbol.version, QR_LEVELS[symbol.level])
+        qr.addData(label_codes._qr_segment(payload))
+        qr.makeImpl(False, symbol.mask)
+        return [[bool(dark) for dark in row] for row in qr.modules]
+
+    def test_matches_reportlab(self):
+        # Many payloads through one symbol, so later codes are built from the
+        # patterns cached for earlier ones
+        for level in QR_LEVELS:
+            symbol = QRSymbol.for_payload("NHM-000000", level)
+            for n in (0, 1, 9, 10, 123, 99999, 123456, 999999):
+                payload = f"NHM-{n:06d}"
+                with self.subTest(level=level, payload=payload):
+                    self.assertEqual(symbol.rows(payload), self.reportlab_rows(symbol, payload))
+        for payload in PAYLOADS:
+            with self.subTest(payload=payload):
+                symbol = QRSymbol.for_payload(payload)
+                self.assertEqual(symbol.rows(payload), self.reportlab_rows(symbol, payload))
+
+    def test_too_long(self):
+        with self.assertRaisesRegex(ValueError, "too long for a QR code"):
+            QRSymbol.for_payload("x" * 1000)
+        with self.assertRaisesRegex(ValueError, "does not fit a version 1"):
+            QRSymbol(1).codewords("x" * 20)
+
+    @unittest.skipUnless(zxingcpp, "zxingcpp not installed")
+    def test_decodes(self):
+        for payload in PAYLOADS:
+            with self.subTest(payload=payload):
+                symbol = QRSymbol.for_payload(payload)
+                results = zxingcpp.read_barcodes(render(symbol.rows(payload), symbol.quiet_zone))
+                self.assertEqual([result.text for result in results], [payload])
+
+class DataMatrixTest(unittest.TestCase):
+    def test_round_trip(self):
+        for size in DATAMATRIX_SIZES:
+            symbol = DataMatrixSymbol(size)
+            payloads = [f"NHM-{n:0{2 * symbol.capacity - 5}d}"[:symbol.capacity] for n in (0, 7, 123456)]
+            for payload in payloads + ["é", "Åland-é"[:symbol.capacity // 2]]:
+                with self.subTest(size=size, payload=payload):
+                    rows = symbol.rows(payload)
+                    self.assertTrue(all(row[0] for row in rows))    # left finder edge
+                    self.assertTrue(all(rows[-1]))                  # bottom finder edge
+                    self.assertEqual(rows[0][:4], [True, False, True, False])  # top clock track
+                    codewords = dm_read_codewords(symbol, rows)
+                    self.assertEqual(bytes(codewords[:symbol.capacity]), symbol.codewords(payload))
+                    self.assertEqual(dm_decode_ascii(codewords[:symbol.capacity]), payload)
+                    # Every syndrome of a good Reed-Solomon codeword is zero
+                    for i in range(1, symbol.error_count + 1):
+                        root = gf_power(2, i)
+                        syndrome = 0
+                        for value in codewords:
+                            syndrome = gf_multiply(syndrome, root) ^ value
+                        self.assertEqual(syndrome, 0)
+
+    def test_digit_pairs(self):
+        self.assertEqual(bytes(DataMatrixSymbol.encode_ascii("NHM-0123")), bytes((79, 73, 78, 46, 131, 153)))
+        self.assertEqual(DataMatrixSymbol.for_payload("012345").size, 10)
+
+    def test_not_latin1(self):
+        with self.assertRaisesRegex(ValueError, "Latin-1 only"):
+            DataMatrixSymbol.encode_ascii("一")
+
+    @unittest.skipUnless(zxingcpp, "zxingcpp not installed")
+    def test_decodes(self):
+        for payload in ["NHM-000123", "000000123456", "nhm-000123", "PinLab 2024/07 #1" * 4]:
+            with self.subTest(payload=payload):
+                symbol = DataMatrixSymbol.for_payload(payload)
+                results = zxingcpp.read_barcodes(render(symbol.rows(payload), symbol.quiet_zone))
+                self.assertEqual([result.text for result in results], [payload])
+
+class CodeSymbolTest(unittest.TestCase):
+    def setUp(self):
+        label_codes._symbols.clear()
+
+    def test_qr_modes_do_not_share_a_symbol(self):
+        # A numeric payload fits version 1; the alphanumeric one of the same
+        # length needs version 2
+        numeric = code_symbol("qr", "1234567" + "9" * 18)
+        alphanumeric = code_symbol("qr", "ABCDEFG" + "9" * 18)
+        self.assertEqual((numeric.version, alphanumeric.version), (1, 2))
+        alphanumeric.image_data("ABCDEFG" + "0" * 17 + "1")
+        self.assertIs(code_symbol("qr", "7654321" + "0" * 18), numeric)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+# label_import: TableImport truncation, merging of repeated rows and the
+# count column, on small CSV/TSV exports.
+#
+#   python -m pytest tests/
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_import import LabelTemplate, TableImport, estimate_table_pages
+
+HEADER = "state,county,locality,copies\n"
+
+class TableImportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, text, name="export.csv"):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        return path
+
+    def read(self, text, template, name="export.csv"):
+        table = TableImport(self.write(text, name), template)
+        return table, [(block["lines"], block["count"]) for block in table]
+
+    def template(self, **options):
+        options.setdefault("count", "copies")
+        return LabelTemplate(["{state}: {county} Co.", "{locality}"], 25, **options)
+
+    def test_count_column(self):
+        table, blocks = self.read(HEADER + "MONT,Lincoln,Libby,3\n"
+                                           "MONT,Flathead,Kalispell,\n"
+                                           "MONT,Sanders,Thompson Falls,0\n"
+                                           "IDA,Boundary,Bonners Ferry,2\n", self.template())
+        self.assertEqual(blocks, [(("MONT: Lincoln Co.", "Libby"), 3),
+                                  (("MONT: Flathead Co.", "Kalispell"), 1),
+                                  (("IDA: Boundary Co.", "Bonners Ferry"), 2)])
+        self.assertEqual((table.rows, table.skipped, table.labels), (4, 1, 6))
+
+    def test_bad_count(self):
+        with self.assertRaisesRegex(ValueError, r"Row 3: count 'two'"):
+            self.read(HEADER + "MONT,Lincoln,Libby,1\nMONT,Lincoln,Libby,two\n", self.template())
+
+    def test_fixed_count(self):
+        table, blocks = self.read(HEADER + "MONT,Lincoln,Libby,9\nIDA,Boundary,Bonners Ferry,9\n",
+                                  self.template(count=2))
+        self.assertEqual([count for _, count in blocks], [2, 2])
+        self.assertEqual(table.labels, 4)
+
+    def test_repeated_rows_merge(self):
+        table, blocks = self.read(HEADER + "MONT,Lincoln,Libby,2\n"
+                                           "MONT,Lincoln,Libby,\n"
+                                           "MONT,Lincoln, Libby ,3\n"
+                                           "IDA,Boundary,Bonners Ferry,1\n"
+                                           "MONT,Lincoln,Libby,1\n", self.template())
+        # Only consecutive rows merge; surrounding spaces do not count
+        self.assertEqual(blocks, [(("MONT: Lincoln Co.", "Libby"), 6),
+                                  (("IDA: Boundary Co.", "Bonners Ferry"), 1),
+                                  (("MONT: Lincoln Co.", "Libby"), 1)])
+        self.assertEqual((table.rows, table.labels), (5, 8))
+
+    def test_empty_lines_dropped(self):
+        table, blocks = self.read(HEADER + "MONT,Lincoln,,1\n,,,1\n", LabelTemplate(["{state}", "{locality}"], 25,
+                                                                                   count="copies"))
+        self.assertEqual(blocks, [(("MONT",), 1)])
+        self.assertEqual((table.rows, table.skipped), (2, 1))
+
+    def test_truncate(self):
+        table, blocks = self.read(HEADER + "MONT,Lincoln,Kootenai Falls Trailhead Parking,1\n"
+                                           "MONT,Lincoln,Libby,1\n", self.template())
+        lines = blocks[0][0]
+        self.assertLessEqual(len(lines[1]), 25)
+        self.assertTrue("Kootenai Falls Trailhead Parking".startswith(lines[1]))
+        self.assertEqual(blocks[1], (("MONT: Lincoln Co.", "Libby"), 1))
+        self.assertEqual(table.truncated, 1)
+
+    def test_combining_marks_fit(self):
+        # Combining marks take no width: this line fits though it is longer
+        # than max_width in code points
+        locality = "Cafe\u0301s" * 5
+        self.assertEqual(len(locality), 30)
+        table, blocks = self.read(HEADER + f"MONT,Lincoln,{locality},1\n", self.template())
+        self.assertEqual(blocks[0][0][1], locality)
+        self.assertEqual(table.truncated, 0)
+
+    def test_overflow_error(self):
+        with self.assertRaisesRegex(ValueError, r"^Row 3: 'Kootenai Falls Trailhead Parking' is 32 characters wide"):
+            self.read(HEADER + "MONT,Lincoln,Libby,1\nMONT,Lincoln,Kootenai Falls Trailhead Parking,1\n",
+                      self.template(overflow="error"))
+
+    def test_tsv(self):
+        text = HEADER.replace(",", "\t") + "MONT\tLincoln\tLibby, Kootenai R.\t2\n"
+        _, blocks = self.read(text, self.template(), name="export.tsv")
+        self.assertEqual(blocks, [(("MONT: Lincoln Co.", "Libby, Kootenai R."), 2)])
+
+    def test_missing_column(self):
+        with self.assertRaisesRegex(ValueError, "not in the file: elevation"):
+            self.read(HEADER + "MONT,Lincoln,Libby,1\n", LabelTemplate(["{elevation}m"], 25))
+
+    def test_estimate_pages(self):
+        rows = "".join(f"MONT,Lincoln,Site {i},3\n" for i in range(500))
+        pages, table = estimate_table_pages(self.write(HEADER + rows), self.template())
+        self.assertEqual(table.labels, 1500)
+        self.assertGreater(pages, 1)
+
+if __name__ == "__main__":
+    unittest.main()
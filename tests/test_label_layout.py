@@ -0,0 +1,74 @@
+# label_layout: LayoutPlan page counts and per-page contents against a walk
+# over every copy.
+#
+#   python -m pytest tests/
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_layout import LayoutPlan, compute_layout, label_position
+from label_maker import LabelBlock
+
+def blocks_with(counts, lines=3):
+    return [LabelBlock(tuple(f"block {i} line {n}" for n in range(lines)), count) for i, count in enumerate(counts)]
+
+def expected_runs(plan):
+    # {page: [(block index, copies), ...]} from every copy's position
+    pages = {}
+    index = 0
+    for i, block in enumerate(plan.label_blocks):
+        for _ in range(block["count"]):
+            runs = pages.setdefault(label_position(plan.layout, index)[0], [])
+            if runs and runs[-1][0] == i:
+                runs[-1] = (i, runs[-1][1] + 1)
+            else:
+                runs.append((i, 1))
+            index += 1
+    return pages
+
+class LayoutPlanTest(unittest.TestCase):
+    def test_total_pages(self):
+        per_page = compute_layout(25, 3)["labels_per_page"]
+        for labels, pages in ((0, 0), (1, 1), (per_page, 1), (per_page + 1, 2), (3 * per_page, 3)):
+            with self.subTest(labels=labels):
+                self.assertEqual(LayoutPlan(25, blocks_with([labels])).total_pages, pages)
+
+    def test_page_runs(self):
+        per_page = compute_layout(25, 3)["labels_per_page"]
+        # Runs that end on, cross and span page breaks, and empty blocks
+        counts = [per_page - 1, 1, 0, 2 * per_page + 5, 3, 0, per_page, 7]
+        plan = LayoutPlan(25, blocks_with(counts))
+        expected = expected_runs(plan)
+        self.assertEqual(plan.total_pages, len(expected))
+        for page in range(plan.total_pages):
+            with self.subTest(page=page):
+                self.assertEqual(plan.page_runs(page), expected[page])
+        self.assertEqual(plan.page_runs(plan.total_pages), [])
+
+    def test_iter_page_matches_placements(self):
+        plan = LayoutPlan(40, blocks_with([500, 3, 900], lines=5))
+        placements = list(plan.iter_placements())
+        for page in range(plan.total_pages):
+            on_page = [(plan.label_blocks[i], x, y) for i, p, x, y in placements if p == page]
+            self.assertEqual(list(plan.iter_page(page)), on_page)
+
+    def test_block_pages(self):
+        per_page = compute_layout(25, 3)["labels_per_page"]
+        plan = LayoutPlan(25, blocks_with([per_page - 1, 2, 0]))
+        self.assertEqual([plan.block_pages(i) for i in range(3)], [(0, 0), (0, 1), None])
+
+    def test_lines_per_label_from_tallest_block(self):
+        plan = LayoutPlan(25, blocks_with([1], lines=2) + blocks_with([1], lines=6))
+        self.assertEqual(plan.lines_per_label, 6)
+        self.assertEqual(plan.layout, compute_layout(25, 6))
+
+    def test_label_too_big(self):
+        with self.assertRaises(ValueError):
+            LayoutPlan(400, blocks_with([1]))
+
+if __name__ == "__main__":
+    unittest.main()
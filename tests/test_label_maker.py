@@ -0,0 +1,136 @@
+# label_maker: reading label files, and drawing them.
+#
+#   python -m pytest tests/
+
+import base64
+import codecs
+import os
+import re
+import sys
+import tempfile
+import unittest
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_maker import LabelBlock, LabelFileReader, generate_label_pdf, generate_label_pdf_stream, parse_label_file
+
+SAMPLE = os.path.join(ROOT, "Part 2 Summer Labels D.txt")
+
+def write_file(directory, text, encoding="utf-8", bom=b""):
+    path = os.path.join(directory, "labels.txt")
+    with open(path, "wb") as f:
+        f.write(bom + text.encode(encoding))
+    return path
+
+class LabelFileReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def read(self, text, **kwargs):
+        return parse_label_file(write_file(self.tmp.name, text, **kwargs))
+
+    def test_blocks(self):
+        max_width, blocks, error_line = self.read("25\n2\nMONT: Lincoln Co.\n48.4160°N\n1\nBull Lake\n")
+        self.assertEqual((max_width, error_line), (25, -1))
+        self.assertEqual(blocks, [LabelBlock(("MONT: Lincoln Co.", "48.4160°N"), 2), LabelBlock(("Bull Lake",), 1)])
+
+    def test_line_too_wide(self):
+        # Line numbers count non-blank lines, the max width being line 1
+        self.assertEqual(self.read("10\n1\nshort\nmuch too wide\n")[2], 4)
+
+    def test_label_line_before_count(self):
+        self.assertEqual(self.read("10\nno count\n")[2], 1)
+
+    def test_blank_lines(self):
+        reader = LabelFileReader(write_file(self.tmp.name, "10\n\n1\nfirst\n\n\n2\nsecond\n\nmuch too wide\n"))
+        # The block the bad line is in is not yielded
+        self.assertEqual(list(reader), [LabelBlock(("first",), 1)])
+        self.assertEqual((reader.error_line, reader.file_line), (6, 10))
+
+    def test_trailing_count_gives_no_block(self):
+        self.assertEqual(self.read("10\n1\nfirst\n3\n")[1:], ([LabelBlock(("first",), 1)], -1))
+
+    def test_combining_marks_take_no_width(self):
+        max_width, blocks, error_line = self.read("5\n1\nCafés\n")
+        self.assertEqual(error_line, -1)
+
+    def test_utf16(self):
+        text = "25\r\n3\r\nMONT: Lincoln Co.\r\n48.4160°N,115.7173°W\r\n"
+        expected = (25, [LabelBlock(("MONT: Lincoln Co.", "48.4160°N,115.7173°W"), 3)], -1)
+        for encoding, bom in (("utf-16-le", codecs.BOM_UTF16_LE), ("utf-16-be", codecs.BOM_UTF16_BE),
+                              ("utf-16-le", b""), ("utf-8", codecs.BOM_UTF8)):
+            with self.subTest(encoding=encoding, bom=bom):
+                self.assertEqual(self.read(text, encoding=encoding, bom=bom), expected)
+
+    def test_utf16_error_line(self):
+        self.assertEqual(self.read("10\n1\nshort\nmuch too wide\n", encoding="utf-16")[2], 4)
+
+    def test_bad_max_width(self):
+        with self.assertRaises(ValueError):
+            self.read("wide\n1\nlabel\n")
+
+def page_contents(path):
+    # The decoded content stream of every page, in order
+    with open(path, "rb") as f:
+        data = f.read()
+    pages = []
+    # Each stream with its object's own dictionary (from "obj" to "stream")
+    for match in re.finditer(rb"\bobj\b((?:(?!endobj).)*?)\bstream\r?\n", data, re.S):
+        header = match.group(1)
+        length = int(re.search(rb"/Length (\d+)", header).group(1))
+        stream = data[match.end():match.end() + length]
+        if b"ASCII85Decode" in header:
+            stream = base64.a85decode(stream, adobe=True)
+        if b"FlateDecode" in header:
+            stream = zlib.decompress(stream)
+        if b"/Form" not in header and stream.startswith(b"1 0 0 1 0 0 cm"):
+            pages.append(stream)
+    return pages
+
+class DrawingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.max_width, cls.blocks, error_line = parse_label_file(SAMPLE)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_streamed_pages_match_canvas(self):
+        for use_forms in (False, True):
+            canvas_path = self.path("canvas.pdf")
+            pages = generate_label_pdf(canvas_path, self.max_width, self.blocks, use_forms=use_forms)
+            expected = page_contents(canvas_path)
+            self.assertEqual(len(expected), pages)
+            for options in ({}, {"binary_streams": True}, {"object_streams": True}):
+                with self.subTest(use_forms=use_forms, **options):
+                    stream_path = self.path("stream.pdf")
+                    self.assertEqual(generate_label_pdf_stream(stream_path, self.max_width, self.blocks,
+                                                               use_forms=use_forms, **options), pages)
+                    self.assertEqual(page_contents(stream_path), expected)
+
+    def test_streamed_from_a_generator(self):
+        generate_label_pdf(self.path("canvas.pdf"), self.max_width, self.blocks)
+        lines_per_label = max(len(block["lines"]) for block in self.blocks)
+        generate_label_pdf_stream(self.path("stream.pdf"), self.max_width, iter(self.blocks), lines_per_label)
+        self.assertEqual(page_contents(self.path("stream.pdf")), page_contents(self.path("canvas.pdf")))
+
+    def test_no_labels(self):
+        self.assertEqual(generate_label_pdf_stream(self.path("empty.pdf"), self.max_width, []), 0)
+
+    def test_one_text_object_per_page(self):
+        # After the canvas's own font setup, all labels of a page are drawn
+        # in a single text object, without saving the graphics state
+        generate_label_pdf(self.path("canvas.pdf"), self.max_width, self.blocks)
+        for page in page_contents(self.path("canvas.pdf")):
+            self.assertEqual(len(re.findall(rb"\bBT\b", page)), 2)
+            self.assertEqual(re.findall(rb"(?m)(?:^| )[qQ]$", page), [])
+
+if __name__ == "__main__":
+    unittest.main()
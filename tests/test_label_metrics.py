@@ -0,0 +1,95 @@
+# label_metrics: line widths and missing glyphs against the font's own
+# advances, on ASCII and on marks, fullwidth and CJK text.
+#
+#   python -m pytest tests/
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reportlab.pdfbase.ttfonts import TTFontFile
+
+from label_metrics import font_path, get_metrics, load_metrics
+
+# Plain, combining acute, fullwidth T, CJK, tab, zero-width space, Latin-1
+CHARACTERS = ["a", "Z", "5", " ", ".", "\u0301", "\uff34", "\u4e00", "\t", "\u200b", "\u00e9", "\u00b0"]
+
+def make_lines(count, seed=5):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        alphabet = CHARACTERS[:5] if rng.random() < 0.5 else CHARACTERS
+        lines.append("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30))))
+    return lines
+
+class GlyphMetricsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.metrics = get_metrics()
+        face = TTFontFile(font_path())
+        cls.widths = face.charWidths
+        cls.default_width = face.defaultWidth
+
+    def reference(self, line):
+        # (cells, missing) straight from the font's advances
+        advance = self.metrics.advance
+        cells = sum(self.widths.get(ord(char), self.default_width) for char in line) / advance
+        return cells, "".join(char for char in line if ord(char) not in self.widths)
+
+    def test_cells_and_missing(self):
+        self.assertEqual(self.metrics.cells("Jose\u0301"), 4)
+        self.assertEqual(self.metrics.missing("\uff34okyo"), "\uff34")
+        for line in make_lines(500):
+            with self.subTest(line=line):
+                cells, missing = self.reference(line)
+                self.assertAlmostEqual(self.metrics.cells(line), cells)
+                self.assertEqual(self.metrics.missing(line), missing)
+
+    def test_check_lines(self):
+        lines = make_lines(500)
+        for max_width in (None, 0, 12, 30):
+            with self.subTest(max_width=max_width):
+                expected = []
+                for i, line in enumerate(lines):
+                    cells, missing = self.reference(line)
+                    if missing or (max_width is not None and cells > max_width):
+                        expected.append((i, cells, missing))
+                found = list(self.metrics.check_lines(lines, max_width))
+                self.assertEqual([(i, missing) for i, _, missing in found],
+                                 [(i, missing) for i, _, missing in expected])
+                for (_, cells, _), (_, expected_cells, _) in zip(found, expected):
+                    self.assertAlmostEqual(cells, expected_cells)
+        ascii_lines = [line for line in lines if line.isascii() and line.isprintable()]
+        self.assertEqual(list(self.metrics.check_lines(ascii_lines)), [])
+        self.assertEqual(list(self.metrics.check_lines([])), [])
+
+    def test_truncate(self):
+        self.assertEqual(self.metrics.truncate("Cafe\u0301s", 4), "Cafe\u0301")
+        for line in make_lines(500):
+            for max_cells in (0, 5, 12):
+                with self.subTest(line=line, max_cells=max_cells):
+                    cut = self.metrics.truncate(line, max_cells)
+                    self.assertTrue(line.startswith(cut))
+                    self.assertLessEqual(self.reference(cut)[0], max_cells + 1e-9)
+                    if cut != line:
+                        # One more character would not fit
+                        self.assertGreater(self.reference(line[:len(cut) + 1])[0], max_cells)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            measured = load_metrics(cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            cached = load_metrics(cache_dir=cache_dir)
+            self.assertEqual(cached.table, measured.table)
+            for name in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, name), "w") as f:
+                    f.write("{not json")
+            self.assertEqual(load_metrics(cache_dir=cache_dir).table, measured.table)
+
+if __name__ == "__main__":
+    unittest.main()
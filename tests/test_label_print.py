@@ -0,0 +1,63 @@
+# Print backends (label_print) against stand-in printers: a file, and a
+# process that copies the piped stream to a file.
+#
+#   python -m pytest tests/
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_cache import generate_label_pdf_cached
+from label_maker import parse_label_file
+from label_print import AcrobatBackend, FileBackend, PipeBackend, print_labels
+
+SAMPLE = os.path.join(ROOT, "Part 2 Summer Labels D.txt")
+COPY_STDIN = "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open(sys.argv[1], 'wb'))"
+
+class PrintBackendTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.max_width, cls.blocks, error_line = parse_label_file(SAMPLE)
+        expected = io.BytesIO()
+        cls.pages = generate_label_pdf_cached(expected, cls.max_width, cls.blocks)
+        cls.expected = expected.getvalue()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.sink = os.path.join(self.tmp.name, "printer.pdf")
+
+    def print_to(self, backend):
+        progress = []
+        result = print_labels(backend, self.max_width, self.blocks, progress=progress.append)
+        self.assertEqual(result["pages"], self.pages)
+        self.assertEqual(progress, list(range(1, self.pages + 1)))
+        self.assertLessEqual(result["first_page_seconds"], result["seconds"])
+        with open(self.sink, "rb") as f:
+            self.assertEqual(len(f.read()), len(self.expected))
+        return result
+
+    def test_file_backend(self):
+        result = self.print_to(FileBackend(self.sink))
+        self.assertEqual((result["backend"], result["streamed"]), ("file", True))
+
+    def test_pipe_backend(self):
+        result = self.print_to(PipeBackend([sys.executable, "-c", COPY_STDIN, self.sink]))
+        self.assertEqual((result["backend"], result["streamed"]), ("pipe", True))
+        self.assertEqual(result["message"], f"Sent to {sys.executable}")
+
+    def test_pipe_command_fails(self):
+        backend = PipeBackend([sys.executable, "-c", "import sys; sys.stderr.write('no printer'); sys.exit(3)"])
+        with self.assertRaisesRegex(RuntimeError, "no printer"):
+            print_labels(backend, self.max_width, self.blocks)
+
+    def test_acrobat_does_not_stream(self):
+        self.assertFalse(AcrobatBackend.streams)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+# The render server's request handling and LocalRenderClient, the in-process
+# stand-in for a RenderClient.
+#
+#   python -m pytest tests/
+
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_cache import RenderCache
+from label_server import LocalRenderClient, RenderError, RenderServer, parse_address
+
+LABEL_FILE = b"25\n2\nMONT: Lincoln Co.\nScenery Mtn. Trail\n09 JULY 2024\n\n1\nIDAH: Boundary Co.\nPack River\n"
+
+class LocalRenderClientTest(unittest.TestCase):
+    def test_render(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            client = LocalRenderClient(RenderCache(tmp))
+            out = io.BytesIO()
+            result = client.render(LABEL_FILE, out)
+            self.assertEqual((result["blocks"], result["labels"], result["pages"]), (2, 3, 1))
+            self.assertTrue(out.getvalue().startswith(b"%PDF-"))
+            self.assertEqual(client.status()["done"], 1)
+
+    def test_error_line(self):
+        client = LocalRenderClient()
+        with self.assertRaises(RenderError) as caught:
+            client.render(b"25\nnot a count\nline\n", io.BytesIO())
+        self.assertNotEqual(caught.exception.result["error_line"], -1)
+        self.assertEqual(client.status()["failed"], 1)
+
+class MalformedRequestTest(unittest.TestCase):
+    REQUESTS = [
+        b"[1, 2]\n",
+        b"\"render\"\n",
+        b"not json\n",
+        b'{"op": "render", "length": null}\n',
+        b'{"op": "render", "length": "12"}\n',
+        b'{"op": "render", "length": 5, "priority": null}\nabcde',
+    ]
+
+    def test_error_reply(self):
+        async def send_all():
+            server = RenderServer(workers=1)
+            family, address = parse_address(await server.start(port=0))
+            replies = []
+            try:
+                for request in self.REQUESTS:
+                    reader, writer = await asyncio.open_connection(*address)
+                    writer.write(request)
+                    await writer.drain()
+                    replies.append(await asyncio.wait_for(reader.readline(), 30))
+                    writer.close()
+            finally:
+                await server.close()
+            return replies
+
+        for request, reply in zip(self.REQUESTS, asyncio.run(send_all())):
+            with self.subTest(request=request):
+                self.assertTrue(reply, "no reply")
+                self.assertEqual(json.loads(reply)["event"], "error")
+
+if __name__ == "__main__":
+    unittest.main()
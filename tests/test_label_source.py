@@ -0,0 +1,77 @@
+# label_source: LabelSource line counts and lines() on UTF-8 and UTF-16
+# files larger than one index chunk.
+#
+#   python -m pytest tests/
+
+import codecs
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_source import LabelSource, detect_encoding
+
+# "ਿĀ" is 3F 0A 00 01 in UTF-16-LE: a newline's bytes straddling two code
+# units, which must not count as one
+WORDS = ["MONT: Lincoln Co.", "48.4160°N,115.7173°W", "25", "J.Vega", "Café", "ਿĀ", "一二", "", "x" * 200]
+
+def make_rows(count, seed=3):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 4))) for _ in range(count)]
+
+class LabelSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def open(self, data):
+        path = os.path.join(self.tmp.name, "labels.txt")
+        with open(path, "wb") as f:
+            f.write(data)
+        source = LabelSource(path)
+        self.addCleanup(source.close)
+        return source
+
+    def check(self, source, rows):
+        self.assertEqual(source.line_count, len(rows))
+        rng = random.Random(5)
+        for _ in range(30):
+            start = rng.randrange(len(rows))
+            stop = start + rng.randint(1, 300)
+            self.assertEqual(source.lines(start, stop), rows[start:stop])
+        self.assertEqual(source.lines(0, 3), rows[:3])
+        self.assertEqual(source.lines(len(rows) - 2, len(rows) + 5), rows[-2:])
+        self.assertEqual(source.lines(len(rows), len(rows) + 1), [])
+
+    def test_encodings(self):
+        rows = make_rows(20000)  # several index chunks
+        for encoding, bom in (("utf-8", b""), ("utf-8", codecs.BOM_UTF8),
+                              ("utf-16-le", codecs.BOM_UTF16_LE), ("utf-16-be", codecs.BOM_UTF16_BE)):
+            for newline in ("\n", "\r\n"):
+                with self.subTest(encoding=encoding, bom=bom, newline=newline):
+                    source = self.open(bom + newline.join(rows).encode(encoding))
+                    self.assertEqual(source.encoding, encoding)
+                    self.check(source, rows)
+
+    def test_utf16_without_bom(self):
+        rows = ["25", "3", "MONT: Lincoln Co.", "Scenery Mtn. Trail"] * 5000
+        for encoding in ("utf-16-le", "utf-16-be"):
+            with self.subTest(encoding=encoding):
+                data = "\n".join(rows).encode(encoding)
+                self.assertEqual(detect_encoding(data[:4096]), (encoding, 0))
+                self.check(self.open(data), rows)
+
+    def test_final_newline(self):
+        source = self.open(b"25\n1\nlabel\n")
+        self.assertEqual(source.lines(0, 10), ["25", "1", "label", ""])
+
+    def test_empty_file(self):
+        source = self.open(b"")
+        self.assertEqual((source.line_count, source.lines(0, 5)), (1, [""]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# label_validate: LabelBuffer after incremental edits against a buffer built
+# from the edited text in one go.
+#
+#   python -m pytest tests/
+
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from label_validate import LabelBuffer
+
+LINES = ["", "  ", "25", "12", "3", "1", "0", "MONT: Lincoln Co.", "Scenery Mtn. Trail", "48.4160°N,115.7173°W",
+         "J.Vega,J.Vargas, net", "Café 2101m", "a line much too wide for a 25 cell label", "x"]
+
+def state(buffer):
+    return {
+        "rows": buffer.rows,
+        "max_width": buffer.max_width,
+        "width_error": buffer.width_error,
+        "blocks": buffer.blocks,
+        "labels": buffer.labels,
+        "errors": list(buffer.errors()),
+        "label_blocks": buffer.label_blocks(),
+        "block_rows": buffer.block_rows(),
+        "lines_per_label": buffer.lines_per_label(),
+        "totals": buffer.totals(),
+        "text": buffer.text(),
+    }
+
+class LabelBufferTest(unittest.TestCase):
+    def test_edits_match_rebuild(self):
+        rng = random.Random(7)
+        for run in range(40):
+            text = ["25"] + [rng.choice(LINES) for _ in range(rng.randint(0, 40))]
+            buffer = LabelBuffer(text)
+            for edit in range(25):
+                start = rng.randint(0, len(text))
+                stop = rng.randint(start, min(len(text), start + 5))
+                new_lines = [rng.choice(LINES) for _ in range(rng.randint(0, 4))]
+                before = list(buffer.errors())
+                changed = buffer.replace_lines(start, stop, new_lines)
+                text[start:stop] = new_lines
+                with self.subTest(run=run, edit=edit):
+                    self.assertEqual(state(buffer), state(LabelBuffer(text)))
+                    if changed is not None:
+                        # Errors outside the rows reported as changed only move
+                        first, last = changed
+                        delta = len(new_lines) - (stop - start)
+                        after = list(buffer.errors())
+                        self.assertEqual([e for e in after if e[0] < first], [e for e in before if e[0] < first])
+                        self.assertEqual([e for e in after if e[0] >= last],
+                                         [(row + delta, message) for row, message in before if row + delta >= last])
+
+    def test_errors(self):
+        buffer = LabelBuffer(["", "10", "before count", "2", "ok", "", "much too wide", "3", "fine"])
+        self.assertEqual(buffer.first_error(), (2, "label line before the first count"))
+        self.assertEqual([row for row, _ in buffer.errors()], [2, 6])
+        self.assertEqual([row for row, _ in buffer.errors(3, 9)], [6])
+        self.assertEqual((buffer.blocks, buffer.labels, buffer.block_rows()), (2, 5, [4, 8]))
+
+    def test_width_line(self):
+        buffer = LabelBuffer(["wide", "1", "label"])
+        self.assertEqual((buffer.max_width, buffer.width_error), (None, 0))
+        self.assertIsNone(buffer.replace_lines(0, 1, ["8"]))  # every row re-marked
+        self.assertEqual((buffer.max_width, buffer.first_error()), (8, None))
+
+if __name__ == "__main__":
+    unittest.main()